@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from ...schemas.chat import ChatMessage, ChatResponse
 from ...services.chat_service import ChatService
 from ...services.llm_service import LLMService
@@ -26,6 +27,18 @@ async def chat_with_ai(message: ChatMessage) -> ChatResponse:
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to process chat message")
 
+@router.post("/stream")
+async def stream_chat_with_ai(message: ChatMessage) -> StreamingResponse:
+    """Chat with AI assistant; the reply arrives as server-sent events while it is generated"""
+    if not message.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    return StreamingResponse(
+        chat_service.stream_chat_message(message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/models")
 async def get_available_models():
     """Get available LLM models"""
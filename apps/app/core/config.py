@@ -25,6 +25,12 @@ class Settings:
     ALIBABA_LLM_KEY: str = os.getenv('ALIBABA_LLM_KEY', '')
     ALIBABA_LLM_KEY_KG: str = os.getenv('ALIBABA_LLM_KEY_KG', '')  
     GEMINI_API_KEY: str = os.getenv('GEMINI_API_KEY', '')
+
+    # Provider endpoints; point them at llm_stub_server.py to load-test offline
+    OPENAI_BASE_URL: str = os.getenv('OPENAI_BASE_URL') or 'https://newapi.maxuhe.com/v1'
+    ALIBABA_BASE_URL: str = os.getenv('ALIBABA_BASE_URL') or 'https://dashscope-intl.aliyuncs.com/compatible-mode/v1'
+    GEMINI_BASE_URL: str = os.getenv('GEMINI_BASE_URL') or 'https://generativelanguage.googleapis.com/v1beta'
+    PERPLEXITY_BASE_URL: str = os.getenv('PERPLEXITY_BASE_URL') or 'https://api.perplexity.ai'
     
     # CORS Configuration
     ALLOWED_ORIGINS: list = ["*"]  # In production, replace with specific origins
@@ -1,5 +1,6 @@
+import json
 import logging
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from ..schemas.chat import ChatMessage, ChatContext, ChatResponse
 from .llm_service import LLMService
 from .news_service import NewsService
@@ -37,65 +38,107 @@ RESPONSE STYLE:
         
         return base_prompt
     
+    def _prepare_messages(self, message: ChatMessage) -> Tuple[str, str, List[Dict]]:
+        """(session id, user message, LLM messages) for a non-empty chat message"""
+        user_message = message.message.strip()
+        context = message.context
+
+        # Build context for AI response
+        current_date = context.currentDate if context and context.currentDate else "2025-06-14"
+        current_group_id = context.currentGroupId if context and context.currentGroupId else None
+        
+        # Get conversation history
+        session_id = f"{current_group_id}_{current_date}" if current_group_id else "general"
+        if session_id not in self.conversation_memory:
+            self.conversation_memory[session_id] = []
+        
+        # Get article and RAG context
+        article_context = ""
+        rag_context = ""
+        
+        if current_group_id and current_date:
+            article_context = self.news_service.get_article_context(current_group_id, current_date)
+            rag_context = self.news_service.get_rag_context(current_group_id, current_date, user_message)
+        
+        # Create system prompt
+        system_prompt = self.create_system_prompt(article_context, rag_context)
+        
+        # Prepare messages for LLM
+        messages = [
+            {"role": "system", "content": system_prompt}
+        ]
+
+        # Add conversation history in chronological order
+        for msg in self.conversation_memory[session_id][-3:]:  # Last 3 exchanges
+            messages.append({"role": "user", "content": msg["user"]})
+            messages.append({"role": "assistant", "content": msg["assistant"]})
+
+        # Add current user message last
+        messages.append({"role": "user", "content": user_message})
+        return session_id, user_message, messages
+
+    def _remember(self, session_id: str, user_message: str, ai_response: str) -> None:
+        # Store conversation in memory
+        self.conversation_memory[session_id].append({
+            "user": user_message,
+            "assistant": ai_response
+        })
+
+        # Keep only last 10 exchanges to prevent memory bloat
+        if len(self.conversation_memory[session_id]) > 10:
+            self.conversation_memory[session_id] = self.conversation_memory[session_id][-10:]
+
+    async def stream_chat_message(self, message: ChatMessage) -> AsyncIterator[str]:
+        """Server-sent events for a chat reply: {"delta": ...} as text arrives, then a final
+        {"done": true, "model_used", "provider_used", "usage"} event, with "error" as well when
+        the reply broke off; such a partial reply is not remembered"""
+        preferred_model = message.model if hasattr(message, 'model') else None
+        try:
+            session_id, user_message, messages = self._prepare_messages(message)
+            parts = []
+            async for event in self.llm_service.stream_response(messages, preferred_model):
+                if "delta" in event:
+                    parts.append(event["delta"])
+                    yield f"data: {json.dumps({'delta': event['delta']})}\n\n"
+                    continue
+                final = {
+                    "done": True,
+                    "model_used": event.get("model"),
+                    "provider_used": event.get("provider"),
+                    "usage": event.get("usage"),
+                }
+                if "error" in event:
+                    # The stream broke off mid-reply: keep the partial answer out of the history
+                    logger.error(f"Chat stream for session {session_id} failed after partial reply: {event['error']}")
+                    final["error"] = event["error"]
+                else:
+                    self._remember(session_id, user_message, "".join(parts))
+                    logger.info(f"Chat streamed for session {session_id} using {event.get('provider', 'Unknown')} {event.get('model', 'Unknown')}")
+                yield "data: " + json.dumps(final) + "\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming chat message: {e}")
+            yield "data: " + json.dumps({
+                "delta": "I'm sorry, but I encountered an error while processing your request. Please try again.",
+            }) + "\n\n"
+            yield "data: " + json.dumps({"done": True, "model_used": None, "provider_used": None, "usage": None}) + "\n\n"
+
     async def process_chat_message(self, message: ChatMessage) -> ChatResponse:
         """Process a chat message and return AI response"""
         try:
-            user_message = message.message.strip()
-            context = message.context
             preferred_model = message.model if hasattr(message, 'model') else None
             
-            if not user_message:
+            if not message.message.strip():
                 return ChatResponse(
                     response="Please provide a message to chat with me.",
                     chart_data=None
                 )
             
-            # Build context for AI response
-            current_date = context.currentDate if context and context.currentDate else "2025-06-14"
-            current_group_id = context.currentGroupId if context and context.currentGroupId else None
-            
-            # Get conversation history
-            session_id = f"{current_group_id}_{current_date}" if current_group_id else "general"
-            if session_id not in self.conversation_memory:
-                self.conversation_memory[session_id] = []
-            
-            # Get article and RAG context
-            article_context = ""
-            rag_context = ""
-            
-            if current_group_id and current_date:
-                article_context = self.news_service.get_article_context(current_group_id, current_date)
-                rag_context = self.news_service.get_rag_context(current_group_id, current_date, user_message)
-            
-            # Create system prompt
-            system_prompt = self.create_system_prompt(article_context, rag_context)
-            
-            # Prepare messages for LLM
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-
-            # Add conversation history in chronological order
-            for msg in self.conversation_memory[session_id][-3:]:  # Last 3 exchanges
-                messages.append({"role": "user", "content": msg["user"]})
-                messages.append({"role": "assistant", "content": msg["assistant"]})
-
-            # Add current user message last
-            messages.append({"role": "user", "content": user_message})
+            session_id, user_message, messages = self._prepare_messages(message)
             
             # Get LLM response with preferred model
             llm_response = await self.llm_service.get_response(messages, preferred_model)
             ai_response = llm_response.get("response", "I'm sorry, I couldn't process your request.")
-            
-            # Store conversation in memory
-            self.conversation_memory[session_id].append({
-                "user": user_message,
-                "assistant": ai_response
-            })
-            
-            # Keep only last 10 exchanges to prevent memory bloat
-            if len(self.conversation_memory[session_id]) > 10:
-                self.conversation_memory[session_id] = self.conversation_memory[session_id][-10:]
+            self._remember(session_id, user_message, ai_response)
             
             logger.info(f"Chat processed successfully for session {session_id} using {llm_response.get('provider', 'Unknown')} {llm_response.get('model', 'Unknown')}")
             
@@ -1,6 +1,7 @@
 import aiohttp
+import json
 import logging
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from ..core.config import settings
 
 # Add dashscope import with error handling
@@ -14,18 +15,62 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+class HTTPCompletionStream:
+    """Async iterator over the text deltas of a streamed chat completion.
+
+    After the last delta, `content` holds the whole reply and `usage` the
+    token totals if the provider sent them.
+    """
+
+    def __init__(self, url: str, headers: Dict[str, str], payload: Dict):
+        self.url = url
+        self.headers = headers
+        self.payload = payload
+        self.content = ""
+        self.usage: Optional[Dict] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas()
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        parts = []
+        async with aiohttp.ClientSession() as session:
+            async with session.post(self.url, headers=self.headers, json=self.payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise RuntimeError(f"API error {response.status}: {error_text}")
+                # Server-sent events: one "data: {chunk}" line per chunk, then "data: [DONE]"
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        self.usage = chunk["usage"]
+                    for choice in chunk.get("choices") or []:
+                        text = (choice.get("delta") or {}).get("content")
+                        if text:
+                            parts.append(text)
+                            yield text
+        self.content = "".join(parts)
+
+
 class HTTPLLMClient:
     def __init__(self, base_url: str, api_key: str):
         self.base_url = base_url
         self.api_key = api_key
-    
-    async def generate(self, prompt_content: str, system_content: str, temperature: float = 0.7, model: str = "gpt-4o-mini"):
-        headers = {
+
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
-        payload = {
+
+    def _payload(self, prompt_content: str, system_content: str, temperature: float, model: str) -> Dict:
+        return {
             "model": model,
             "messages": [
                 {"role": "system", "content": system_content},
@@ -34,12 +79,13 @@ class HTTPLLMClient:
             "temperature": temperature,
             "max_tokens": 1000
         }
-        
+    
+    async def generate(self, prompt_content: str, system_content: str, temperature: float = 0.7, model: str = "gpt-4o-mini"):
         async with aiohttp.ClientSession() as session:
             async with session.post(
                 f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload
+                headers=self._headers(),
+                json=self._payload(prompt_content, system_content, temperature, model)
             ) as response:
                 if response.status == 200:
                     data = await response.json()
@@ -48,6 +94,14 @@ class HTTPLLMClient:
                     error_text = await response.text()
                     raise RuntimeError(f"API error {response.status}: {error_text}")
 
+    def generate_stream(self, prompt_content: str, system_content: str, temperature: float = 0.7,
+                        model: str = "gpt-4o-mini") -> HTTPCompletionStream:
+        """Like generate(), but yields the reply's text deltas as they arrive (`async for`)."""
+        payload = self._payload(prompt_content, system_content, temperature, model)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        return HTTPCompletionStream(f"{self.base_url}/chat/completions", self._headers(), payload)
+
 class LLMService:
     def __init__(self):
         self.openai_client = None
@@ -63,7 +117,7 @@ class LLMService:
         try:
             if settings.OPENAI_API_KEY:
                 self.openai_client = HTTPLLMClient(
-                    base_url="https://newapi.maxuhe.com/v1",
+                    base_url=settings.OPENAI_BASE_URL,
                     api_key=settings.OPENAI_API_KEY
                 )
                 self._available_models["OpenAI"] = [
@@ -76,7 +130,7 @@ class LLMService:
         try:
             if settings.ALIBABA_LLM_KEY:
                 self.alibaba_client = HTTPLLMClient(
-                    base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
+                    base_url=settings.ALIBABA_BASE_URL,
                     api_key=settings.ALIBABA_LLM_KEY
                 )
                 self._available_models["Alibaba"] = [
@@ -89,7 +143,7 @@ class LLMService:
         try:
             if settings.GEMINI_API_KEY:
                 self.gemini_client = HTTPLLMClient(
-                    base_url="https://generativelanguage.googleapis.com/v1beta",
+                    base_url=settings.GEMINI_BASE_URL,
                     api_key=settings.GEMINI_API_KEY
                 )
                 self._available_models["Gemini"] = [
@@ -102,7 +156,7 @@ class LLMService:
         try:
             if settings.PERPLEXITY_API_KEY:
                 self.perplexity_client = HTTPLLMClient(
-                    base_url="https://api.perplexity.ai",
+                    base_url=settings.PERPLEXITY_BASE_URL,
                     api_key=settings.PERPLEXITY_API_KEY
                 )
                 self._available_models["Perplexity"] = [
@@ -224,9 +278,8 @@ class LLMService:
                 "model": "knowledge-graph"
             }
     
-    async def get_response(self, messages: List[Dict], preferred_model: Optional[str] = None) -> Dict[str, str]:
-        """Get response using specified model or fallback to available models"""
-        
+    def _build_prompt(self, messages: List[Dict]) -> Tuple[str, str, str]:
+        """(system message, current user message, prompt with the conversation so far)"""
         # Extract system message and conversation
         system_message = ""
         conversation_messages = []
@@ -252,6 +305,12 @@ class LLMService:
             full_prompt = f"Previous conversation:\n{conversation_context}\nCurrent question: {current_message}"
         else:
             full_prompt = current_message
+
+        return system_message, current_message, full_prompt
+
+    async def get_response(self, messages: List[Dict], preferred_model: Optional[str] = None) -> Dict[str, str]:
+        """Get response using specified model or fallback to available models"""
+        system_message, current_message, full_prompt = self._build_prompt(messages)
         
         # Handle knowledge graph request
         if preferred_model == "knowledge-graph":
@@ -324,6 +383,52 @@ class LLMService:
             "model": "None"
         }
     
+    async def stream_response(self, messages: List[Dict], preferred_model: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Streaming get_response(): yields {"delta": text} events, then one final event.
+
+        The final event has "done", "provider", "model" and "usage". A client
+        that fails before its first delta is skipped for the next one, as in
+        get_response(); once text has been sent there is no switching.
+        """
+        system_message, current_message, full_prompt = self._build_prompt(messages)
+
+        if preferred_model == "knowledge-graph":
+            result = await self._call_knowledge_graph(current_message, system_message)
+            yield {"delta": result["response"]}
+            yield {"done": True, "provider": result["provider"], "model": result["model"], "usage": None}
+            return
+
+        clients_to_try = []
+        if preferred_model:
+            client_info = self._get_client_for_model(preferred_model)
+            if client_info:
+                clients_to_try.append(client_info)
+        clients_to_try += [info for info in self._get_available_clients() if info not in clients_to_try]
+
+        for client_name, client, model in clients_to_try:
+            stream = client.generate_stream(
+                prompt_content=full_prompt,
+                system_content=system_message,
+                temperature=0.7,
+                model=model
+            )
+            started = False
+            try:
+                async for delta in stream:
+                    started = True
+                    yield {"delta": delta}
+            except Exception as e:
+                logger.error(f"Error streaming from {client_name}: {str(e)}")
+                if started:
+                    yield {"done": True, "provider": client_name, "model": model, "usage": None, "error": str(e)}
+                    return
+                continue
+            yield {"done": True, "provider": client_name, "model": model, "usage": stream.usage}
+            return
+
+        yield {"delta": "I'm sorry, but I'm having trouble connecting to the AI services right now. Please try again later."}
+        yield {"done": True, "provider": "None", "model": "None", "usage": None}
+
     def _get_client_for_model(self, model_value: str) -> Optional[Tuple[str, HTTPLLMClient, str]]:
         """Get client and model info for a specific model value"""
         # Check OpenAI models
@@ -0,0 +1,90 @@
+"""Time `import llm_client` in fresh interpreters.
+
+    python benchmarks/llm_client_import.py                # current tree
+    python benchmarks/llm_client_import.py --compare HEAD~1
+
+--compare also times llm_client.py as it was at a git revision, e.g. the one
+that still built four OpenAI clients at import. Dummy API keys are set so the
+old version can be imported without real ones.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+DUMMY_KEYS = {
+    "OPENAI_API_KEY": "benchmark",
+    "PERPLEXITY_API_KEY": "benchmark",
+    "ALIBABA_LLM_KEY": "benchmark",
+    "GEMINI_API_KEY": "benchmark",
+}
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import llm_client; "
+    "print(time.perf_counter() - start)"
+)
+
+FIRST_USE_SNIPPET = (
+    "import time; import llm_client; start = time.perf_counter(); "
+    "llm_client.get_client('ALIBABA').client; print(time.perf_counter() - start)"
+)
+
+
+def time_snippet(snippet: str, module_dir: Path, runs: int) -> list[float]:
+    """Seconds reported by `snippet`, each run in a new interpreter with module_dir on sys.path."""
+    env = dict(os.environ, **DUMMY_KEYS, PYTHONPATH=str(module_dir), PYTHONDONTWRITEBYTECODE="1")
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", snippet],
+            cwd=module_dir, env=env, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def report(label: str, timings: list[float]) -> None:
+    print(
+        f"{label:<28} median {statistics.median(timings) * 1000:8.1f} ms   "
+        f"min {min(timings) * 1000:8.1f} ms   ({len(timings)} runs)"
+    )
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure how long importing llm_client takes.")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per measurement (default: 10)")
+    parser.add_argument("--compare", metavar="REV", help="Also time llm_client.py from this git revision")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+
+    # One untimed run first so every measurement sees a warm file cache.
+    time_snippet(IMPORT_SNIPPET, ROOT_DIR, 1)
+    current = time_snippet(IMPORT_SNIPPET, ROOT_DIR, args.runs)
+    report("import llm_client", current)
+    report("first get_client().client", time_snippet(FIRST_USE_SNIPPET, ROOT_DIR, args.runs))
+
+    if args.compare:
+        source = subprocess.run(
+            ["git", "show", f"{args.compare}:llm_client.py"],
+            cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        with tempfile.TemporaryDirectory() as tmp:
+            Path(tmp, "llm_client.py").write_text(source, encoding="utf-8")
+            time_snippet(IMPORT_SNIPPET, Path(tmp), 1)
+            previous = time_snippet(IMPORT_SNIPPET, Path(tmp), args.runs)
+        report(f"import llm_client @ {args.compare}", previous)
+        print(f"Import speed-up: {statistics.median(previous) / statistics.median(current):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Time matching article links to publishers: linear substring scan vs hostname index.
+
+    python benchmarks/publisher_lookup.py                       # synthetic publishers and links
+    python benchmarks/publisher_lookup.py --publishers-csv data/raw/trust_score/publishers_bias.csv
+
+The scan is the loop card/event/process.py used before PublisherIndex: every
+link is tested against every Source URL with `in`. Links are generated from
+the publisher domains (with subdomains, paths and query strings) plus a share
+of unknown hosts, and the two methods' answers are compared.
+"""
+import argparse
+import csv
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from card.event.publisher_index import PublisherIndex
+
+TLDS = ['com', 'org', 'net', 'co.uk', 'com.au', 'ca', 'com.tw', 'com.my', 'news']
+SUBDOMAINS = ['', 'www.', 'edition.', 'news.', 'm.']
+
+
+def random_label(rng: random.Random) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+
+
+def synthetic_publishers(count: int, rng: random.Random) -> List[str]:
+    return [f"{random_label(rng)}.{rng.choice(TLDS)}" for _ in range(count)]
+
+
+def synthetic_links(publishers: List[str], count: int, unknown_share: float, rng: random.Random) -> List[str]:
+    links = []
+    for _ in range(count):
+        domain = f"{random_label(rng)}.{rng.choice(TLDS)}" if rng.random() < unknown_share else rng.choice(publishers)
+        path = '/'.join(random_label(rng) for _ in range(rng.randint(1, 4)))
+        links.append(f"https://{rng.choice(SUBDOMAINS)}{domain}/{path}?utm_source={random_label(rng)}")
+    return links
+
+
+def linear_scan(source_urls: List[str], links: List[str]) -> List[Optional[str]]:
+    """The substring loop PublisherIndex replaced"""
+    resolved = []
+    for link in links:
+        match = None
+        for source_url in source_urls:
+            if isinstance(source_url, str) and source_url in link:
+                match = source_url
+                break
+        resolved.append(match)
+    return resolved
+
+
+def indexed(source_urls: List[str], links: List[str]) -> List[Optional[str]]:
+    return PublisherIndex(source_urls).resolve(links)
+
+
+def best_of(func, runs: int, *args):
+    timings, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings), statistics.median(timings)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--publishers", type=int, default=4000, help="Synthetic publishers (default 4000)")
+    parser.add_argument("--publishers-csv", help="Use the Source URL column of this publishers_bias.csv instead")
+    parser.add_argument("--links", type=int, default=2000, help="Article links to resolve (default 2000)")
+    parser.add_argument("--unknown-share", type=float, default=0.2, help="Share of links with unknown hosts")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    if args.publishers_csv:
+        with open(args.publishers_csv, newline='', encoding='utf-8') as f:
+            source_urls = [row['Source URL'] for row in csv.DictReader(f)]
+    else:
+        source_urls = synthetic_publishers(args.publishers, rng)
+    known = [url for url in source_urls if isinstance(url, str) and url.strip()]
+    links = synthetic_links(known, args.links, args.unknown_share, rng)
+
+    scanned, scan_best, scan_median = best_of(linear_scan, args.runs, source_urls, links)
+    looked_up, index_best, index_median = best_of(indexed, args.runs, source_urls, links)
+
+    differ = sum(a != b for a, b in zip(scanned, looked_up))
+    print(f"{len(source_urls)} publishers, {len(links)} links, best / median of {args.runs} runs")
+    print(f"  substring scan  {scan_best * 1000:9.1f} ms  {scan_median * 1000:9.1f} ms")
+    print(f"  hostname index  {index_best * 1000:9.1f} ms  {index_median * 1000:9.1f} ms  (includes building it)")
+    print(f"  speed-up        {scan_best / index_best:9.1f}x")
+    print(f"  matched: scan {sum(m is not None for m in scanned)}, index {sum(m is not None for m in looked_up)}; "
+          f"{differ} links resolved differently")
+    for link, a, b in [(l, a, b) for l, a, b in zip(links, scanned, looked_up) if a != b][:5]:
+        print(f"    {link}\n      scan: {a}  index: {b}")
+
+
+if __name__ == "__main__":
+    main()
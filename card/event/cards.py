@@ -0,0 +1,78 @@
+"""Event card tables written by card/event/process.py.
+
+An article's data (fundus columns, publisher trust scores, country indices,
+the LLM's article-level fields and sentiment scores) is stored once, in
+data/card/event_card/articles/<date>.csv. The events extracted from it go to
+data/card/event_card/<date>.csv with only their own fields and the
+article_id they belong to. Readers that only need events (clustering) read
+the event table alone; load_flat_event_cards() joins the two back into the
+one-row-per-event layout with every article column, as it was written before.
+"""
+import hashlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+EVENT_CARD_DIR = Path('data/card/event_card')
+
+
+def events_path(date: str) -> Path:
+    return EVENT_CARD_DIR / f"{date}.csv"
+
+
+def articles_path(date: str) -> Path:
+    return EVENT_CARD_DIR / 'articles' / f"{date}.csv"
+
+
+def duplicates_report_path(date: str) -> Path:
+    """Near-duplicate families of a date and the LLM calls they saved"""
+    return EVENT_CARD_DIR / 'duplicates' / f"{date}.json"
+
+
+def article_id_for(link: str) -> str:
+    """Stable id of an article, so reruns give its events the same article_id"""
+    return hashlib.sha1(str(link).encode('utf-8')).hexdigest()[:12]
+
+
+def load_events(date: str) -> pd.DataFrame:
+    """The event table of a date: event fields, event_id and article_id"""
+    return pd.read_csv(events_path(date), dtype={'article_id': str})
+
+
+def load_articles(date: str) -> pd.DataFrame:
+    """The article table of a date, one row per article_id"""
+    return pd.read_csv(articles_path(date), dtype={'article_id': str})
+
+
+def flatten_event_cards(events_df: pd.DataFrame, articles_df: pd.DataFrame) -> pd.DataFrame:
+    """One row per event with all of its article's columns, in the original column order.
+
+    That order is the event fields, the article's columns and event_id last.
+    Where an event carries a field that is also an article column, the
+    article's value wins, as it did when the columns were copied into each
+    event.
+    """
+    article_columns = [col for col in articles_df.columns if col != 'article_id']
+    event_columns = [
+        col for col in events_df.columns
+        if col not in ('event_id', 'article_id') and col not in article_columns
+    ]
+    flat = events_df[['event_id', 'article_id'] + event_columns].merge(articles_df, on='article_id', how='inner')
+    return flat[event_columns + article_columns + ['event_id']]
+
+
+def load_flat_event_cards(date: str, event_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """The flat event card layout of a date, optionally only the given events.
+
+    Dates written before the tables were split have no article table; their
+    event CSV already is the flat layout and is returned as it is.
+    """
+    events_df = load_events(date)
+    if event_ids is not None:
+        events_df = events_df[events_df['event_id'].isin(list(event_ids))]
+    if not articles_path(date).exists():
+        return events_df
+    articles_df = load_articles(date)
+    articles_df = articles_df[articles_df['article_id'].isin(events_df['article_id'])]
+    return flatten_event_cards(events_df, articles_df)
@@ -0,0 +1,99 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+from textblob import TextBlob
+from nltk.sentiment.vader import SentimentIntensityAnalyzer
+
+from classifier.fake_news.predict import predict_fake_news
+
+# Articles per task sent to the process pool
+CHUNK_SIZE = 16
+
+_vader_analyzer = None
+
+def get_vader_analyzer():
+    """Create the VADER analyzer once; building it re-reads the lexicon"""
+    global _vader_analyzer
+    if _vader_analyzer is None:
+        _vader_analyzer = SentimentIntensityAnalyzer()
+    return _vader_analyzer
+
+def analyze_sentiment(text):
+    """Perform multi-method sentiment analysis"""
+    if not isinstance(text, str) or not text.strip():
+        return {
+            'textblob_polarity': 0.0,
+            'textblob_subjectivity': 0.0,
+            'vader_neg': 0.0,
+            'vader_neu': 0.0,
+            'vader_pos': 0.0,
+            'vader_compound': 0.0
+        }
+    
+    # TextBlob analysis
+    blob = TextBlob(text)
+    tb_polarity = blob.sentiment.polarity
+    tb_subjectivity = blob.sentiment.subjectivity
+    
+    # VADER analysis
+    vader_scores = get_vader_analyzer().polarity_scores(text)
+    
+    return {
+        'textblob_polarity': tb_polarity,
+        'textblob_subjectivity': tb_subjectivity,
+        'vader_neg': vader_scores['neg'],
+        'vader_neu': vader_scores['neu'],
+        'vader_pos': vader_scores['pos'],
+        'vader_compound': vader_scores['compound']
+    }
+
+def article_features(texts: List[str]) -> List[Dict]:
+    """Sentiment scores and fake news probabilities of each text"""
+    fake_news_results = predict_fake_news(texts) if texts else []
+    features = []
+    for text, fake_news_result in zip(texts, fake_news_results):
+        scores = analyze_sentiment(text)
+        scores['fake_news'] = fake_news_result
+        features.append(scores)
+    return features
+
+class ArticleFeatures:
+    """Sentiment and fake news scores of articles, computed in worker processes.
+
+    The articles are submitted in chunks as soon as this is created, so the
+    CPU-bound work runs while the caller waits on LLM requests. get(index)
+    blocks until that article's chunk is done. With workers <= 1 everything
+    is computed in the calling thread on demand.
+    """
+
+    def __init__(self, texts: Dict[int, str], workers: int = 1):
+        self.texts = texts
+        self._chunks: Dict[int, tuple] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        if workers > 1 and texts:
+            # spawn: the parent runs threads (LLM requests, lease renewal) that fork would copy mid-flight
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+            items = list(texts.items())
+            for start in range(0, len(items), CHUNK_SIZE):
+                chunk = items[start:start + CHUNK_SIZE]
+                future = self._pool.submit(article_features, [text for _, text in chunk])
+                for position, (index, _) in enumerate(chunk):
+                    self._chunks[index] = (future, position)
+
+    def get(self, index: int) -> Dict:
+        if index not in self._chunks:
+            return article_features([self.texts[index]])[0]
+        future, position = self._chunks[index]
+        return future.result()[position]
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,102 @@
+"""Near-duplicate articles (syndicated wire stories, light re-edits) by MinHash.
+
+Each text becomes a set of word shingles and a MinHash signature. Locality
+sensitive hashing over bands of the signatures proposes candidate pairs, and
+a candidate counts as a duplicate when the exact Jaccard similarity of the two
+shingle sets reaches the threshold. Families are formed greedily in input
+order: an article joins the earliest family leader it duplicates, otherwise it
+leads a family of its own, so every member is directly similar to its leader.
+"""
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, Hashable, List, Set, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+DEFAULT_THRESHOLD = 0.8
+# Chance that a pair exactly at the threshold becomes an LSH candidate
+MIN_CANDIDATE_PROBABILITY = 0.99
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> Set[str]:
+    """Lowercased word `size`-grams of a text; a shorter text is one shingle"""
+    words = re.findall(r'\w+', text.lower()) if isinstance(text, str) else []
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def lsh_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows per band) with the fewest candidates that still find pairs at the threshold.
+
+    Candidates are verified exactly, so recall matters more than precision:
+    the largest row count whose candidate probability at the threshold is at
+    least MIN_CANDIDATE_PROBABILITY wins.
+    """
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    good = [
+        (bands, rows) for bands, rows in options
+        if 1 - (1 - threshold ** rows) ** bands >= MIN_CANDIDATE_PROBABILITY
+    ]
+    return max(good, key=lambda option: option[1]) if good else options[0]
+
+
+class MinHasher:
+    """MinHash signatures from `num_perm` universal hash functions over CRC32 shingle hashes"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        # a < 2**31 and hashes < 2**32 keep a * hash + b inside uint64
+        self.a = rng.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+
+    def signature(self, shingle_set: Set[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set),
+            dtype=np.uint64, count=len(shingle_set)
+        )
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+def near_duplicate_families(texts: Dict[Hashable, str], threshold: float = DEFAULT_THRESHOLD,
+                            num_perm: int = NUM_PERM) -> Dict[Hashable, Hashable]:
+    """{key: key of its family leader} for every text; leaders map to themselves.
+
+    Empty texts are never duplicates.
+    """
+    hasher = MinHasher(num_perm)
+    bands, rows = lsh_bands(threshold, num_perm)
+    buckets: List[Dict[bytes, List[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+    shingle_sets: Dict[Hashable, Set[str]] = {}
+    position = {key: i for i, key in enumerate(texts)}
+    leader_of: Dict[Hashable, Hashable] = {}
+
+    for key, text in texts.items():
+        shingle_set = shingles(text)
+        leader_of[key] = key
+        if not shingle_set:
+            continue
+        shingle_sets[key] = shingle_set
+        signature = hasher.signature(shingle_set)
+        band_keys = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+
+        # Earlier leaders sharing a band, checked oldest first
+        candidates = {other for band, band_key in enumerate(band_keys) for other in buckets[band].get(band_key, ())}
+        for other in sorted(candidates, key=position.get):
+            if jaccard(shingle_set, shingle_sets[other]) >= threshold:
+                leader_of[key] = other
+                break
+        else:
+            # Only leaders go into the buckets; members are never compared against
+            for band, band_key in enumerate(band_keys):
+                buckets[band][band_key].append(key)
+    return leader_of
@@ -1,25 +1,27 @@
 import pandas as pd
-import numpy as np
 from pathlib import Path
 import json
 import ast
-import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 import sys
 import os
-from textblob import TextBlob
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import nltk
 import warnings
 import uuid
 import base64
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
-from llm_client import alibaba_client
-from classifier.fake_news.predict import predict_fake_news
-from card.event.prompt import get_event_card_prompt
+from llm_client import get_client, get_max_in_flight, estimate_tokens
+from card.event.features import ArticleFeatures
+from card.event.cards import article_id_for, articles_path, duplicates_report_path, events_path
+from card.event.near_duplicates import DEFAULT_THRESHOLD, near_duplicate_families
+from card.event.trust_scores import load_trust_scores
+from card.event.prompt import get_event_card_prompt, get_packed_article_block, get_packed_event_card_prompt
+from pipeline.work_queue import WorkQueue, atomic_write_json, queue_path
 warnings.filterwarnings('ignore')
 
 nltk.download('vader_lexicon', quiet=True)
@@ -60,134 +62,173 @@ def generate_short_uuid() -> str:
     b64 = base64.urlsafe_b64encode(uuid_bytes).decode('ascii').rstrip('=')
     return b64[:7]
 
-def load_trust_scores():
-    """Load and prepare trust score data"""
-    print("Loading trust score data...")
-    
-    country_df = pd.read_csv(
-        'data/raw/trust_score/country_2025.csv',
-        sep=';',
-        encoding='latin1',
-        decimal=',',
-        na_values=['', '??????'],
-        keep_default_na=True
-    )
-    
-    country_dict = {
-        'United States': 'us',
-        'United Kingdom': 'uk',
-        'Canada': 'ca',
-        'Taiwan': 'tw',
-        'Malaysia': 'my',
-        'Japan': 'jp'
-    }
-    
-    country_df = country_df[country_df['Country_EN'].isin(country_dict.keys())]
-    country_df['Country_code'] = country_df['Country_EN'].map(country_dict)
-    
-    publisher_df = pd.read_csv('data/raw/trust_score/publishers_bias.csv')
+EVENT_CARD_PUBLISHER = 'ALIBABA'
 
-    if 'Unnamed: 9' in publisher_df.columns:
-        publisher_df = publisher_df.drop('Unnamed: 9', axis=1)
-    
-    bias_mapping = {
-        'Left': -0.8,
-        'Left-Center': -0.4,
-        'Least Biased': 0.0,
-        'Right-Center': 0.4,
-        'Right': 0.8,
-        'Conspiracy-Pseudoscience': -0.9,
-        'Questionable': 0.9,
-        'Satire': 0.0,
-        'Pro-Science': -0.3
-    }
-    
-    factual_mapping = {
-        'Very High': 1.0,
-        'High': 0.75,
-        'Mostly Factual': 0.5,
-        'Mixed': 0.0,
-        'Low': -0.5,
-        'Very Low': -1.0,
-        np.nan: 0.0
-    }
-    
-    credibility_mapping = {
-        'High': 1.0,
-        'high': 1.0,
-        'Medium': 0.5,
-        'Low': -1.0,
-        np.nan: 0.0
+def event_card_request(news_content: str, image_captions_with_url: List[Dict], publishing_date: str) -> Dict:
+    """generate() arguments for one article's event card"""
+    return {
+        'prompt_content': get_event_card_prompt(news_content, image_captions_with_url, publishing_date),
+        'system_content': "You are a news analyst extracting structured event data.",
+        'temperature': 0,
+        'model': 'qwen-plus',
+        'response_format': {"type": "json_object"}
     }
-    
-    publisher_df['bias_score'] = publisher_df['Bias'].map(bias_mapping)
-    publisher_df['factual_score'] = publisher_df['Factual Reporting'].map(factual_mapping)
-    publisher_df['credibility_score'] = publisher_df['Credibility'].str.capitalize().map(credibility_mapping)
-    
-    # according to trust score formula: Trust Score = (R / 64 × 0.6) + [ (50 - |B|) / 50 × 0.3] + (C × 0.1)
-    # Converting to 0-1 scale: factual_score is already 0-1 equivalent, bias_score needs scaling
-    publisher_df['composite_score'] = (
-        (publisher_df['factual_score'] + 1) / 2 * 0.6 +  # Convert -1,1 to 0,1 then apply 0.6 weight
-        (1 - publisher_df['bias_score'].abs()) * 0.3 +   # Convert bias to 0-1 scale then apply 0.3 weight  
-        (publisher_df['credibility_score'] + 1) / 2 * 0.1  # Convert -1,1 to 0,1 then apply 0.1 weight
+
+def parse_event_card(response) -> Dict:
+    if hasattr(response, 'choices'):
+        return json.loads(response.choices[0].message.content)
+    return json.loads(response)
+
+def generate_event_card(news_content: str, image_captions_with_url: List[Dict], publishing_date: str) -> Dict:
+    """Generate event card using LLM.
+
+    Errors propagate so the work queue records the article as failed rather
+    than checkpointing an empty card, and the next run asks again.
+    """
+    response = get_client(EVENT_CARD_PUBLISHER).generate(
+        **event_card_request(news_content, image_captions_with_url, publishing_date)
     )
-    
-    return country_df, publisher_df
+    return parse_event_card(response)
 
-def analyze_sentiment(text):
-    """Perform multi-method sentiment analysis"""
-    if not isinstance(text, str) or not text.strip():
-        return {
-            'textblob_polarity': 0.0,
-            'textblob_subjectivity': 0.0,
-            'vader_neg': 0.0,
-            'vader_neu': 0.0,
-            'vader_pos': 0.0,
-            'vader_compound': 0.0
-        }
-    
-    # TextBlob analysis
-    blob = TextBlob(text)
-    tb_polarity = blob.sentiment.polarity
-    tb_subjectivity = blob.sentiment.subjectivity
-    
-    # VADER analysis
-    sid = SentimentIntensityAnalyzer()
-    vader_scores = sid.polarity_scores(text)
-    
-    return {
-        'textblob_polarity': tb_polarity,
-        'textblob_subjectivity': tb_subjectivity,
-        'vader_neg': vader_scores['neg'],
-        'vader_neu': vader_scores['neu'],
-        'vader_pos': vader_scores['pos'],
-        'vader_compound': vader_scores['compound']
+def article_inputs(row) -> tuple:
+    """(news content, image captions with URL, publishing date) of one article row"""
+    return f"Title: {row['title']}\nContent: {row['content']}", row['media_links'], row['publish_time']
+
+# Most articles a packed request may hold; the answer grows with every one
+PACK_MAX_ARTICLES = 8
+
+def pack_articles(sizes: List[tuple], token_budget: int, max_articles: int = PACK_MAX_ARTICLES) -> List[List]:
+    """Group (key, tokens) items into packs of at most token_budget tokens.
+
+    Items keep their order (next fit), so the articles of a pack sit next to
+    each other in the work queue. An item larger than the budget gets a pack
+    of its own.
+    """
+    packs, pack, pack_tokens = [], [], 0
+    for key, tokens in sizes:
+        if pack and (pack_tokens + tokens > token_budget or len(pack) >= max_articles):
+            packs.append(pack)
+            pack, pack_tokens = [], 0
+        pack.append(key)
+        pack_tokens += tokens
+    if pack:
+        packs.append(pack)
+    return packs
+
+def packed_event_card_request(articles: List[tuple]) -> Dict:
+    """generate() arguments for the event cards of several articles, each given as article_inputs()"""
+    request = event_card_request(*articles[0])
+    request['prompt_content'] = get_packed_event_card_prompt(
+        [get_packed_article_block(position, *inputs) for position, inputs in enumerate(articles)]
+    )
+    return request
+
+def parse_packed_event_cards(response, count: int) -> Dict[int, Dict]:
+    """{position: event card} of the slots of a packed answer that parsed; missing or broken slots are left out"""
+    data = parse_event_card(response)
+    slots = data.get('articles', []) if isinstance(data, dict) else data
+    cards = {}
+    for slot in slots if isinstance(slots, list) else []:
+        try:
+            position = int(slot['article_index'])
+            card = slot['card']
+        except (KeyError, TypeError, ValueError):
+            continue
+        if 0 <= position < count and isinstance(card, dict) and isinstance(card.get('events'), list):
+            # an index answered twice is ambiguous, so neither answer is used
+            cards[position] = None if position in cards else card
+    return {position: card for position, card in cards.items() if card is not None}
+
+class PackedEventCards:
+    """Event cards of short articles, requested several articles at a time.
+
+    The articles are packed under `token_budget` prompt tokens per request and
+    every pack is sent as soon as this is created, `workers` at a time. get(index)
+    blocks until that article's pack is answered and returns its card, or None
+    when the article was not packed or its slot failed to parse; the caller then
+    asks for that article alone.
+    """
+
+    def __init__(self, articles: Dict[int, tuple], token_budget: int, workers: int = 1):
+        self._packs: Dict[int, tuple] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        overhead = estimate_tokens([{'content': get_packed_event_card_prompt([])}])
+        sizes = [
+            (index, estimate_tokens([{'content': get_packed_article_block(0, *inputs)}]))
+            for index, inputs in articles.items()
+        ]
+        packs = [pack for pack in pack_articles(sizes, token_budget - overhead) if len(pack) > 1]
+        if not packs:
+            return
+        print(f"Packing {sum(len(pack) for pack in packs)} articles into {len(packs)} event card requests...")
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        for pack in packs:
+            future = self._pool.submit(self._request, [articles[index] for index in pack])
+            for position, index in enumerate(pack):
+                self._packs[index] = (future, position)
+
+    @staticmethod
+    def _request(articles: List[tuple]) -> Dict[int, Dict]:
+        try:
+            response = get_client(EVENT_CARD_PUBLISHER).generate(**packed_event_card_request(articles))
+            cards = parse_packed_event_cards(response, len(articles))
+        except Exception as e:
+            print(f"Failed to generate packed event cards: {e}")
+            return {}
+        if len(cards) < len(articles):
+            print(f"Packed event cards: {len(articles) - len(cards)} of {len(articles)} slots will be retried alone")
+        return cards
+
+    def get(self, index: int) -> Optional[Dict]:
+        if index not in self._packs:
+            return None
+        future, position = self._packs[index]
+        return future.result().get(position)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def generate_event_cards_in_batch(final_df: pd.DataFrame, queue: WorkQueue, date: str) -> Dict[str, object]:
+    """Send the articles the queue has not finished as one provider batch job.
+
+    Returns {link: response or exception}. Slower than one call per article,
+    but it is billed at the batch rate and is not held back by rate limits.
+    """
+    finished = {key for key, _ in queue.results()} | {key for key, _ in queue.results(status='failed')}
+    requests = {
+        row['link']: event_card_request(*article_inputs(row))
+        for _, row in final_df.iterrows() if row['link'] not in finished
     }
+    if not requests:
+        return {}
+    print(f"Submitting {len(requests)} event card requests as a batch job...")
+    return get_client(EVENT_CARD_PUBLISHER).generate_batch(
+        requests,
+        state_dir=str(Path('data/pipeline/batch/event_card') / date),
+        poll_interval=float(os.getenv('LLM_BATCH_POLL_SECONDS') or 30)
+    )
 
-def generate_event_card(news_content: str, image_captions_with_url: List[Dict], publishing_date: str) -> Dict:
-    """Generate event card using LLM"""
-    prompt = get_event_card_prompt(news_content, image_captions_with_url, publishing_date)
-    
-    try:
-        response = alibaba_client.generate(
-            prompt_content=prompt,
-            system_content="You are a news analyst extracting structured event data.",
-            temperature=0,
-            model='qwen-plus',
-            response_format={"type": "json_object"}
-        )
-        
-        if hasattr(response, 'choices'):
-            response_data = json.loads(response.choices[0].message.content)
-        else:
-            response_data = json.loads(response)
-        return response_data
-    except Exception as e:
-        print(f"Failed to generate event card: {e}")
-        return {"summary": "", "events": []}
-
-def process_fundus_data(date: str):
-    """Process fundus data for a given date"""
+def process_fundus_data(date: str, batch: bool = False, llm_workers: int = 1, cpu_workers: int = 1,
+                        pack_tokens: int = 0, dedup_threshold: float = DEFAULT_THRESHOLD, restart: bool = False):
+    """Process fundus data for a given date.
+
+    With batch=True the event card prompts go to the provider as one batch job
+    instead of one request per article. Otherwise `llm_workers` articles are
+    sent at a time (still under the shared rate limits), while sentiment and
+    fake news scores are computed in `cpu_workers` processes. A `pack_tokens`
+    budget packs short articles into shared requests of up to that many prompt
+    tokens. Articles whose title and content have a shingle Jaccard similarity
+    of at least `dedup_threshold` (0 turns this off) share one event card.
+    Event cards of an earlier run for the date are kept unless `restart` is set.
+    """
     print(f"Processing fundus data for date: {date}")
     
     # Find all fundus data files for the date
@@ -223,28 +264,13 @@ def process_fundus_data(date: str):
     print("Removing duplicates...")
     combined_df = combined_df.drop_duplicates(subset=['link'])
     
-    # Load trust scores
-    country_df, publisher_df = load_trust_scores()
+    # Load the compiled trust scores (rebuilt only when the raw CSVs changed)
+    print("Loading trust score data...")
+    trust_scores = load_trust_scores()
+    country_df, publisher_df = trust_scores.country_df, trust_scores.publisher_df
   
-    # Extract domain from links with more defensive programming
-    def extract_domain(link):
-        if not isinstance(link, str):
-            print(f"Found non-string link: {link} (type: {type(link)})")
-            return None
-        try:
-            for source_url in publisher_df['Source URL']:
-                if not isinstance(source_url, str):
-                    print(f"Found non-string source_url: {source_url} (type: {type(source_url)})")
-                    continue
-                if source_url in link:
-                    return source_url
-            return None
-        except Exception as e:
-            print(f"Error processing link {link}: {e}")
-            return None
-    
-
-    combined_df['domain'] = combined_df['link'].apply(extract_domain)    
+    # Match each link to its publisher's Source URL by hostname
+    combined_df['domain'] = trust_scores.publisher_index.resolve(combined_df['link'])
     # Merge with publisher bias data
     merged_df = pd.merge(
         combined_df,
@@ -263,17 +289,6 @@ def process_fundus_data(date: str):
         how='left'
     )
     
-    # Calculate sentiment scores
-    sentiment_scores = []
-    for _, row in final_df.iterrows():
-        full_content = f"{row['title']} {row['content']}"
-        scores = analyze_sentiment(full_content)
-        sentiment_scores.append(scores)
-    
-    sentiment_df = pd.DataFrame(sentiment_scores)
-    for col in sentiment_df.columns:
-        final_df[col] = sentiment_df[col]
-    
     # Process media links
     def process_media_links(x):
         if pd.isna(x):
@@ -300,83 +315,213 @@ def process_fundus_data(date: str):
             return []
     
     final_df['media_links'] = final_df['media_links'].apply(process_media_links) 
-    # Generate event cards
-    all_events = []
-    total_rows = len(final_df)
-    
-    for idx, row in final_df.iterrows():
-        # Progress update
-        progress = (idx + 1) / total_rows * 100
-        print(f"\rProcessing: {idx + 1}/{total_rows} ({progress:.1f}%) | "
-              f"Total events: {len(all_events)}", end="", flush=True)
-        
-        # Generate event card
-        image_captions_with_url = row['media_links']
-        news_content = f"Title: {row['title']}\nContent: {row['content']}"
-        publishing_date = row['publish_time']
-        
-        result = generate_event_card(news_content, image_captions_with_url, publishing_date)
+    final_df = final_df.reset_index(drop=True)
+
+    # Near-duplicate articles (syndicated wire copies, light re-edits) form
+    # families that share one event card request: the leader's card is copied
+    # to every member, each keeping its own article data and scores
+    leader_of = near_duplicate_families(
+        {row['link']: f"{row['title']} {row['content']}" for _, row in final_df.iterrows()},
+        threshold=dedup_threshold
+    ) if dedup_threshold > 0 else {}
+    members_of = defaultdict(list)
+    for link, leader in leader_of.items():
+        if link != leader:
+            members_of[leader].append(link)
+    calls_saved = sum(len(members) for members in members_of.values())
+    if calls_saved:
+        print(f"Near-duplicates: {calls_saved} articles in {len(members_of)} families reuse their "
+              f"family's event card ({calls_saved} LLM calls saved)")
+    leaders_df = final_df[[leader_of.get(link, link) == link for link in final_df['link']]]
+
+    # Generate event cards. Each family leader is one work item whose result is
+    # its family's articles and events, checkpointed as soon as it is done, so
+    # an interrupted run resumes without repeating LLM calls and several
+    # processes can work through the same date. Articles whose request failed
+    # are retried by the next run; the others keep their checkpointed events,
+    # and only articles scraped since are sent.
+    queue = WorkQueue(queue_path('event_card', date), name='articles')
+    queue.start(((row['link'], idx) for idx, row in leaders_df.iterrows()), restart=restart, retry_failed=True)
+    # Rows are found by link: a resumed queue keeps the row numbers of the run
+    # that enqueued it, which shift if more articles were scraped since
+    row_of_link = {link: idx for idx, link in final_df['link'].items()}
+    total_rows = len(leaders_df)
+    batch_responses = generate_event_cards_in_batch(leaders_df, queue, date) if batch else {}
+
+    # Sentiment and fake news scores of the unfinished articles, computed in
+    # worker processes while the LLM requests are out
+    finished = {key for key, _ in queue.results()} | {key for key, _ in queue.results(status='failed')}
+    features = ArticleFeatures(
+        {
+            idx: f"{row['title']} {row['content']}" for idx, row in final_df.iterrows()
+            if leader_of.get(row['link'], row['link']) not in finished
+        },
+        workers=cpu_workers
+    )
+    # Short articles share one request; the batch job already covers its own articles
+    packed = PackedEventCards(
+        {
+            idx: article_inputs(row) for idx, row in leaders_df.iterrows()
+            if row['link'] not in finished and row['link'] not in batch_responses
+        } if pack_tokens else {},
+        token_budget=pack_tokens,
+        workers=llm_workers
+    )
+
+    def process_article(item):
+        if item.key not in row_of_link:
+            # enqueued by an earlier run from input that no longer has this article
+            return None
+        index = row_of_link[item.key]
+        row = final_df.iloc[index]
+        counts = queue.counts()
+        finished = counts['done'] + counts['failed']
+        progress = (finished + 1) / total_rows * 100
+        print(f"\rProcessing: {finished + 1}/{total_rows} ({progress:.1f}%)", end="", flush=True)
+
+        # Generate event card from the batch job or the article's pack; otherwise ask for it alone
+        result = None
+        batch_response = batch_responses.get(row['link'])
+        if batch_response is not None and not isinstance(batch_response, Exception):
+            try:
+                result = parse_event_card(batch_response)
+            except Exception as e:
+                print(f"Failed to parse batch event card: {e}")
+        if result is None:
+            result = packed.get(index)
+        if result is None:
+            result = generate_event_card(*article_inputs(row))
+
+        # The leader and its near-duplicates each get their own article row and events
+        article, article_events = article_card(index, result)
+        duplicates = [
+            article_card(row_of_link[member], result, duplicate_of=article['article_id'])
+            for member in members_of.get(item.key, [])
+        ]
+        return {
+            'article': article,
+            'events': article_events,
+            'duplicates': [{'article': member, 'events': events} for member, events in duplicates]
+        }
+
+    def article_card(index, result, duplicate_of=None):
+        """(article row, event rows) of one article from its event card"""
+        row = final_df.iloc[index]
         events = result.get('events', [])
 
-        # Calculate fake news probabilities for the article
-        combined_text = f"{row['title']} {row['content']}"
-        fake_news_results = predict_fake_news([combined_text])
-        fake_news_result = fake_news_results[0] if fake_news_results else {'real_probability': 0.5, 'fake_probability': 0.5}
+        # Fake news probabilities and sentiment scores of the article
+        article_scores = dict(features.get(index))
+        fake_news_result = article_scores.pop('fake_news', None) or {'real_probability': 0.5, 'fake_probability': 0.5}
         # Calculate confidence score
         max_probability = max(fake_news_result['real_probability'], fake_news_result['fake_probability'])
         confidence_score = calculate_confidence_score(max_probability)
-        # Add metadata to each event
+        # The article row: event card data, original article data and its sentiment scores
+        article_id = article_id_for(row['link'])
+        article = {
+            'article_id': article_id,
+            'summary': result.get('summary', ''),
+            'news_category': result.get('news_category', []),
+            'content_sentiment': result.get('content_sentiment', ''),
+            'fake_news_score': result.get('fake_news_score', ''),
+            'ai_generated_score': result.get('ai_generated_score', ''),
+            'list_of_keywords': result.get('list_of_keywords', []),
+            'fake_news_probability': fake_news_result['fake_probability'],
+            'real_news_probability': fake_news_result['real_probability'],
+            'confidence_score': confidence_score
+        }
+        for col in final_df.columns:
+            article[col] = row[col]
+        article.update(article_scores)
+        # article_id of the family leader whose event card this article shares
+        article['near_duplicate_of'] = duplicate_of
+
+        # Event rows only point at their article
+        article_events = []
         for event in events:
             try:
                 event_data = event.copy()
             except Exception as e:
                 print(f"Warning: Skipping event due to error: {e} (event: {event})")
                 continue
-            # Add event card data
-            event_data.update({
-                'summary': result.get('summary', ''),
-                'news_category': result.get('news_category', []),
-                'content_sentiment': result.get('content_sentiment', ''),
-                'fake_news_score': result.get('fake_news_score', ''),
-                'ai_generated_score': result.get('ai_generated_score', ''),
-                'list_of_keywords': result.get('list_of_keywords', []),
-                'fake_news_probability': fake_news_result['fake_probability'],
-                'real_news_probability': fake_news_result['real_probability'],
-                'confidence_score': confidence_score
-            })
-            
-            # Add original article data
-            for col in final_df.columns:
-                event_data[col] = row[col]
-            
-            all_events.append(event_data)
-        
-        # Save intermediate results
-        if (idx + 1) % 10 == 0:  # Save every 10 articles
-            temp_df = pd.DataFrame(all_events)
-            temp_df.to_csv(f'data/card/event_card/temp_{date}.csv', index=False)
+            event_data['article_id'] = article_id
+            article_events.append(event_data)
         
-        time.sleep(1)  # Rate limiting
+        return article, article_events
+
+    with features, packed:
+        queue.process(process_article, workers=llm_workers)
+    if not queue.is_finished():
+        print(f"\nOther workers are still processing articles for {date}; the last one writes the event cards.")
+        return None
     
     print("\nEvent card generation complete!")
-    
-    # Convert to DataFrame and save
+    failed = queue.counts()['failed']
+    if failed:
+        print(f"{failed} articles failed and are left out; run the stage again to retry only those.")
+    
+    # Convert to the article and event tables and save; load_flat_event_cards()
+    # joins them back into one row per event with every article column
+    articles, all_events = [], []
+    seen_articles = set()
+    for _, result in queue.results():
+        if not result:
+            continue
+        for entry in [result] + result.get('duplicates', []):
+            # an article a resumed queue holds both as a leader and as a duplicate is kept once
+            if entry['article']['article_id'] in seen_articles:
+                continue
+            seen_articles.add(entry['article']['article_id'])
+            articles.append(entry['article'])
+            all_events.extend(entry['events'])
+    articles_df = pd.DataFrame(articles)
     events_df = pd.DataFrame(all_events)
-    events_df['event_id'] = [generate_short_uuid() for _ in range(len(events_df))]
-    output_dir = Path('data/card/event_card')
-    output_dir.mkdir(parents=True, exist_ok=True)
-    events_df.to_csv(output_dir / f"{date}.csv", index=False)
-    # Delete temporary file if it exists
-    temp_file = Path(f'data/card/event_card/temp_{date}.csv')
-    if temp_file.exists():
-        temp_file.unlink()
+    events_df.insert(0, 'event_id', [generate_short_uuid() for _ in range(len(events_df))])
+    if 'article_id' in events_df.columns:
+        events_df.insert(1, 'article_id', events_df.pop('article_id'))
+    # articles first: readers take an event CSV without its article table for the old flat layout
+    for path, df in ((articles_path(date), articles_df), (events_path(date), events_df)):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(path, index=False)
+    atomic_write_json(duplicates_report_path(date), {
+        'date': date,
+        'threshold': dedup_threshold,
+        'articles': len(final_df),
+        'llm_calls': len(leaders_df),
+        'llm_calls_saved': calls_saved,
+        'families': {leader: members for leader, members in members_of.items()}
+    }, indent=2)
     return events_df
 
-if __name__ == "__main__":
+def main(argv=None):
     import argparse
     
     parser = argparse.ArgumentParser(description='Process fundus data and generate event cards')
     parser.add_argument('--date', type=str, required=True, help='Date to process (YYYY-MM-DD)')
-    
-    args = parser.parse_args()
-    process_fundus_data(args.date)
+    parser.add_argument('--batch', action='store_true', default=bool(os.getenv('EVENT_CARD_BATCH')),
+                        help='Submit all event card prompts as one provider batch job (cheaper, slower); '
+                             'also on when EVENT_CARD_BATCH is set')
+    
+    parser.add_argument('--llm-workers', type=int, default=None,
+                        help='Articles sent to the LLM at the same time '
+                             '(default: LLM_MAX_IN_FLIGHT for the provider, else 4)')
+    parser.add_argument('--cpu-workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='Processes computing sentiment and fake news scores (default: up to 4)')
+    
+    parser.add_argument('--pack-tokens', type=int, default=int(os.getenv('EVENT_CARD_PACK_TOKENS') or 0),
+                        help='Pack short articles into one event card request of up to this many prompt '
+                             'tokens (e.g. 6000; default EVENT_CARD_PACK_TOKENS, 0 sends one request per article)')
+    
+    parser.add_argument('--dedup-threshold', type=float,
+                        default=float(os.getenv('EVENT_CARD_DEDUP_THRESHOLD') or DEFAULT_THRESHOLD),
+                        help='Shingle Jaccard similarity at which articles count as near-duplicates and share '
+                             f'one event card (default EVENT_CARD_DEDUP_THRESHOLD, else {DEFAULT_THRESHOLD}; 0 turns it off)')
+    parser.add_argument('--restart', action='store_true',
+                        help='Discard the event cards of earlier runs for this date and send every article again')
+    
+    args = parser.parse_args(argv)
+    llm_workers = args.llm_workers or get_max_in_flight(EVENT_CARD_PUBLISHER)
+    process_fundus_data(args.date, batch=args.batch, llm_workers=llm_workers, cpu_workers=args.cpu_workers,
+                        pack_tokens=args.pack_tokens, dedup_threshold=args.dedup_threshold, restart=args.restart)
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,5 @@
-def get_event_card_prompt(news_content: str, image_captions_with_url: list, publishing_date: str) -> str:
-    """
-    Generate the prompt for event card generation.
-    
-    Args:
-        news_content: The news content to analyze
-        image_captions_with_url: List of image captions with URLs
-        publishing_date: The publishing date of the news
-        
-    Returns:
-        Formatted prompt string
-    """
-    return f"""
-    <Publishing Date>
-    {publishing_date}
-    </Publishing Date>
-
-    <News Content>
-    {news_content}
-    </News Content>
-
-    Image captions with url format should be like this:{{image_captions: url}}
-    
-    <image captions>
-    {chr(10).join(f"{i+1}. {item}" for i, item in enumerate(image_captions_with_url))}
-    </image captions>
-
-    Rule:
+# Extraction rules shared by the single-article and packed prompts
+EVENT_CARD_RULES = """    Rule:
     1. If the image captions is the evidence of the news, then the image caption and the image url of this caption should be included in the event card.
     2. Some information may be missing in the event card, just fill "Empty" in the field.
     3. The order should be ordered by the event_date and event_time. 
@@ -35,8 +9,10 @@ def get_event_card_prompt(news_content: str, image_captions_with_url: list, publ
     7. state out the most important keywords in the list_of_keywords which can represent the news.
     8. news_category is the category of the news, it is a string. You can select more than one category from the following: [technology, politic, social, entertainment] if there is no category selected, then it should be ['other']
     
-    Extract event details in the following JSON format:
-    {{
+"""
+
+# JSON layout of one article's event card
+EVENT_CARD_FORMAT = """    {
         "summary": "1-2 sentences summary of the news",
         'news_category': [category1, category2],
         "content_sentiment": "-1 to 1",
@@ -44,7 +20,7 @@ def get_event_card_prompt(news_content: str, image_captions_with_url: list, publ
         "ai_generated_score": "0-1",
         "list_of_keywords": [keyword1, keyword2],
         "events": [
-            {{
+            {
                 "event_type": "e.g., political, disaster, sports",
                 "event_description": "1-2 sentences",
                 "event_date": "YYYY-MM-DD or range",
@@ -59,7 +35,84 @@ def get_event_card_prompt(news_content: str, image_captions_with_url: list, publ
                 "image_caption": "image caption",
                 "image_url": "LINK",
                 "order": 1
-            }}
+            }
+        ]
+    }
+"""
+
+def get_event_card_prompt(news_content: str, image_captions_with_url: list, publishing_date: str) -> str:
+    """
+    Generate the prompt for event card generation.
+    
+    Args:
+        news_content: The news content to analyze
+        image_captions_with_url: List of image captions with URLs
+        publishing_date: The publishing date of the news
+        
+    Returns:
+        Formatted prompt string
+    """
+    return f"""
+    <Publishing Date>
+    {publishing_date}
+    </Publishing Date>
+
+    <News Content>
+    {news_content}
+    </News Content>
+
+    Image captions with url format should be like this:{{image_captions: url}}
+    
+    <image captions>
+    {chr(10).join(f"{i+1}. {item}" for i, item in enumerate(image_captions_with_url))}
+    </image captions>
+
+{EVENT_CARD_RULES}    Extract event details in the following JSON format:
+{EVENT_CARD_FORMAT}    """
+
+def get_packed_article_block(article_index: int, news_content: str, image_captions_with_url: list, publishing_date: str) -> str:
+    """One article of a packed event card prompt"""
+    return f"""
+    <Article index="{article_index}">
+    <Publishing Date>
+    {publishing_date}
+    </Publishing Date>
+
+    <News Content>
+    {news_content}
+    </News Content>
+
+    <image captions>
+    {chr(10).join(f"{i+1}. {item}" for i, item in enumerate(image_captions_with_url))}
+    </image captions>
+    </Article>
+"""
+
+def get_packed_event_card_prompt(article_blocks: list) -> str:
+    """
+    Generate one prompt that asks for the event cards of several articles.
+
+    Args:
+        article_blocks: Articles formatted by get_packed_article_block
+
+    Returns:
+        Formatted prompt string; the answer is {"articles": [card, ...]} where
+        every card carries the article_index of its article
+    """
+    return f"""
+    Each of the following articles is independent. Extract an event card for every one of them.
+    {''.join(article_blocks)}
+    Image captions with url format should be like this:{{image_captions: url}}
+
+{EVENT_CARD_RULES}    9. Answer with one event card per article. Set article_index to the index of the <Article> the card belongs to, and never mix events of different articles.
+
+    Extract event details in the following JSON format:
+    {{
+        "articles": [
+            {{
+                "article_index": 0,
+                "card":
+{EVENT_CARD_FORMAT}            }}
         ]
     }}
     """
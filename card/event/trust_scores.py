@@ -0,0 +1,197 @@
+"""Publisher and country trust scores, compiled once from the raw CSVs.
+
+Parsing country_2025.csv (latin1, `;`, decimal commas) and publishers_bias.csv
+and deriving the bias, factual, credibility and composite scores happens in
+build_trust_scores(), which pickles the result to COMPILED_PATH together with
+the PublisherIndex over its Source URLs. load_trust_scores() reads that file
+and only rebuilds it when a source CSV changed (size or modification time) or
+the compiled layout is out of date. The scrapers under scrapers/trust_score
+rebuild it after downloading new data.
+"""
+import os
+import sys
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from card.event.publisher_index import PublisherIndex, split_url
+from pipeline.work_queue import temp_path_for
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+COUNTRY_CSV = ROOT_DIR / 'data' / 'raw' / 'trust_score' / 'country_2025.csv'
+PUBLISHERS_CSV = ROOT_DIR / 'data' / 'raw' / 'trust_score' / 'publishers_bias.csv'
+COMPILED_PATH = ROOT_DIR / 'data' / 'pipeline' / 'trust_scores.pkl'
+
+# Bump when the compiled layout or the score formulas change
+COMPILED_VERSION = 1
+
+COUNTRY_CODES = {
+    'United States': 'us',
+    'United Kingdom': 'uk',
+    'Canada': 'ca',
+    'Taiwan': 'tw',
+    'Malaysia': 'my',
+    'Japan': 'jp'
+}
+
+BIAS_MAPPING = {
+    'Left': -0.8,
+    'Left-Center': -0.4,
+    'Least Biased': 0.0,
+    'Right-Center': 0.4,
+    'Right': 0.8,
+    'Conspiracy-Pseudoscience': -0.9,
+    'Questionable': 0.9,
+    'Satire': 0.0,
+    'Pro-Science': -0.3
+}
+
+FACTUAL_MAPPING = {
+    'Very High': 1.0,
+    'High': 0.75,
+    'Mostly Factual': 0.5,
+    'Mixed': 0.0,
+    'Low': -0.5,
+    'Very Low': -1.0,
+    np.nan: 0.0
+}
+
+CREDIBILITY_MAPPING = {
+    'High': 1.0,
+    'high': 1.0,
+    'Medium': 0.5,
+    'Low': -1.0,
+    np.nan: 0.0
+}
+
+
+@dataclass
+class TrustScores:
+    country_df: pd.DataFrame
+    # one row per publisher, indexed by its normalized "host/path" key
+    publisher_df: pd.DataFrame
+    publisher_index: PublisherIndex
+
+    def publisher(self, link) -> Optional[pd.Series]:
+        """Trust score row of the publisher of an article link, or None"""
+        source_url = self.publisher_index.lookup(link)
+        return None if source_url is None else self.publisher_df.loc[publisher_key(source_url)]
+
+
+def publisher_key(source_url: str) -> str:
+    """Normalized Source URL: lowercase hostname without www., plus its path if any"""
+    host, path = split_url(source_url)
+    return host + path
+
+
+def source_fingerprint(*paths: Union[str, Path]) -> Dict[str, tuple]:
+    """(size, mtime) of each source file; a compiled table built from other versions is stale"""
+    fingerprint = {}
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint[Path(path).name] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprint
+
+
+def compile_trust_scores(country_csv: Union[str, Path] = COUNTRY_CSV,
+                         publishers_csv: Union[str, Path] = PUBLISHERS_CSV) -> TrustScores:
+    """Parse the raw CSVs and derive the trust scores"""
+    country_df = pd.read_csv(
+        country_csv,
+        sep=';',
+        encoding='latin1',
+        decimal=',',
+        na_values=['', '??????'],
+        keep_default_na=True
+    )
+    country_df = country_df[country_df['Country_EN'].isin(COUNTRY_CODES.keys())]
+    country_df['Country_code'] = country_df['Country_EN'].map(COUNTRY_CODES)
+
+    publisher_df = pd.read_csv(publishers_csv)
+    if 'Unnamed: 9' in publisher_df.columns:
+        publisher_df = publisher_df.drop('Unnamed: 9', axis=1)
+
+    publisher_df['bias_score'] = publisher_df['Bias'].map(BIAS_MAPPING)
+    publisher_df['factual_score'] = publisher_df['Factual Reporting'].map(FACTUAL_MAPPING)
+    publisher_df['credibility_score'] = publisher_df['Credibility'].str.capitalize().map(CREDIBILITY_MAPPING)
+
+    # according to trust score formula: Trust Score = (R / 64 × 0.6) + [ (50 - |B|) / 50 × 0.3] + (C × 0.1)
+    # Converting to 0-1 scale: factual_score is already 0-1 equivalent, bias_score needs scaling
+    publisher_df['composite_score'] = (
+        (publisher_df['factual_score'] + 1) / 2 * 0.6 +  # Convert -1,1 to 0,1 then apply 0.6 weight
+        (1 - publisher_df['bias_score'].abs()) * 0.3 +   # Convert bias to 0-1 scale then apply 0.3 weight
+        (publisher_df['credibility_score'] + 1) / 2 * 0.1  # Convert -1,1 to 0,1 then apply 0.1 weight
+    )
+
+    # Key publishers by normalized Source URL; the first row wins, as the index resolves to it
+    publisher_df = publisher_df[publisher_df['Source URL'].apply(lambda url: isinstance(url, str) and bool(url.strip()))]
+    publisher_df.index = publisher_df['Source URL'].map(publisher_key).rename('publisher_key')
+    publisher_df = publisher_df[~publisher_df.index.duplicated(keep='first')]
+
+    return TrustScores(country_df, publisher_df, PublisherIndex(publisher_df['Source URL']))
+
+
+def build_trust_scores(path: Union[str, Path] = COMPILED_PATH,
+                       country_csv: Union[str, Path] = COUNTRY_CSV,
+                       publishers_csv: Union[str, Path] = PUBLISHERS_CSV) -> TrustScores:
+    """Compile the trust scores and write them to `path`"""
+    fingerprint = source_fingerprint(country_csv, publishers_csv)
+    scores = compile_trust_scores(country_csv, publishers_csv)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, 'wb') as f:
+        # plain fields, not the dataclass, so a table built by running this file as a script still loads
+        pickle.dump({
+            'version': COMPILED_VERSION,
+            'sources': fingerprint,
+            'country_df': scores.country_df,
+            'publisher_df': scores.publisher_df,
+            'publisher_index': scores.publisher_index
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    print(f"Compiled trust scores for {len(scores.publisher_df)} publishers to {path}")
+    return scores
+
+
+def load_trust_scores(path: Union[str, Path] = COMPILED_PATH,
+                      country_csv: Union[str, Path] = COUNTRY_CSV,
+                      publishers_csv: Union[str, Path] = PUBLISHERS_CSV) -> TrustScores:
+    """The compiled trust scores, rebuilt first if the source CSVs changed since they were built"""
+    try:
+        with open(path, 'rb') as f:
+            compiled = pickle.load(f)
+    except FileNotFoundError:
+        compiled = None
+    except Exception as e:
+        print(f"Warning: Rebuilding unreadable trust score table {path}: {e}")
+        compiled = None
+    if compiled is not None and compiled.get('version') == COMPILED_VERSION:
+        try:
+            fingerprint = source_fingerprint(country_csv, publishers_csv)
+        except FileNotFoundError:
+            # shipped without the raw CSVs: the table is all there is
+            fingerprint = compiled.get('sources')
+        if compiled.get('sources') == fingerprint:
+            return TrustScores(compiled['country_df'], compiled['publisher_df'], compiled['publisher_index'])
+    return build_trust_scores(path, country_csv, publishers_csv)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile the publisher and country trust score table')
+    parser.add_argument('--output', default=str(COMPILED_PATH), help='Compiled table (default: %(default)s)')
+    args = parser.parse_args(argv)
+    build_trust_scores(args.output)
+
+
+if __name__ == "__main__":
+    main()
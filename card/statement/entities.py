@@ -0,0 +1,125 @@
+"""Batched GLiNER entity extraction for statement cards.
+
+Texts longer than the model's window are split into overlapping word windows
+instead of being truncated, and entity offsets from each window are shifted
+back onto the full text and merged. All windows of all texts (post titles,
+post contents and comments) go through one queue: identical texts are
+extracted once, and the windows are sorted by length into mini-batches so
+each batch pads to similar sizes.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ENTITY_LABELS = ["person", "date", "organization", "location", "action", "event"]
+
+# GLiNER large v2 reads up to 384 tokens; punctuation counts as tokens too
+WINDOW_WORDS = 256
+OVERLAP_WORDS = 48
+BATCH_SIZE = 8
+THRESHOLD = 0.5
+
+
+def empty_entities() -> Dict[str, List[str]]:
+    return {label: [] for label in ENTITY_LABELS}
+
+
+def set_torch_threads(threads: Optional[int]) -> None:
+    """Let torch use this many CPU threads for inference (None leaves torch's default)"""
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def chunk_text(text: str, window_words: int = WINDOW_WORDS, overlap_words: int = OVERLAP_WORDS) -> List[Tuple[int, str]]:
+    """(character offset, chunk) windows of `window_words` words, each overlapping the last by `overlap_words`"""
+    words = [match.span() for match in re.finditer(r'\S+', text)]
+    if len(words) <= window_words:
+        return [(0, text)]
+    step = max(1, window_words - overlap_words)
+    chunks = []
+    for first in range(0, len(words), step):
+        last = min(first + window_words, len(words)) - 1
+        start, end = words[first][0], words[last][1]
+        chunks.append((start, text[start:end]))
+        if last == len(words) - 1:
+            break
+    return chunks
+
+
+def merge_spans(spans: List[Dict]) -> List[Dict]:
+    """Entities found in overlapping windows, each span kept once.
+
+    The same span found twice keeps its best score; of spans that overlap
+    (a window edge cut an entity short) the higher-scoring one wins. The
+    result is in text order.
+    """
+    kept: List[Dict] = []
+    for span in sorted(spans, key=lambda span: (-span.get('score', 0.0), span['start'])):
+        if all(span['end'] <= other['start'] or span['start'] >= other['end'] for other in kept):
+            kept.append(span)
+    return sorted(kept, key=lambda span: span['start'])
+
+
+class EntityExtractor:
+    """Extract ENTITY_LABELS from many texts with one GLiNER model."""
+
+    def __init__(self, model, labels: List[str] = ENTITY_LABELS, batch_size: int = BATCH_SIZE,
+                 window_words: int = WINDOW_WORDS, overlap_words: int = OVERLAP_WORDS,
+                 threshold: float = THRESHOLD):
+        self.model = model
+        self.labels = labels
+        self.batch_size = batch_size
+        self.window_words = window_words
+        self.overlap_words = overlap_words
+        self.threshold = threshold
+
+    def _predict_batch(self, chunks: List[str]) -> List[List[Dict]]:
+        if len(chunks) > 1 and hasattr(self.model, 'batch_predict_entities'):
+            try:
+                return self.model.batch_predict_entities(chunks, self.labels, threshold=self.threshold)
+            except Exception as e:
+                print(f"Warning: Batched entity extraction failed, retrying one text at a time: {e}")
+        results = []
+        for chunk in chunks:
+            try:
+                results.append(self.model.predict_entities(chunk, self.labels, threshold=self.threshold))
+            except Exception as e:
+                print(f"Warning: Entity extraction failed: {e}")
+                results.append([])
+        return results
+
+    def extract_many(self, texts: Iterable) -> List[Dict[str, List[str]]]:
+        """{label: [entity text, ...]} of each text, in order; non-text or blank inputs get no entities"""
+        texts = list(texts)
+        unique = list(dict.fromkeys(text for text in texts if isinstance(text, str) and text.strip()))
+
+        # (text number, offset, chunk) of every window, shortest first
+        windows = [
+            (number, offset, chunk)
+            for number, text in enumerate(unique)
+            for offset, chunk in chunk_text(text, self.window_words, self.overlap_words)
+        ]
+        windows.sort(key=lambda window: len(window[2]))
+
+        spans: List[List[Dict]] = [[] for _ in unique]
+        total = len(windows)
+        for start in range(0, total, self.batch_size):
+            batch = windows[start:start + self.batch_size]
+            for (number, offset, _), entities in zip(batch, self._predict_batch([chunk for _, _, chunk in batch])):
+                for entity in entities:
+                    spans[number].append(dict(entity, start=entity['start'] + offset, end=entity['end'] + offset))
+            done = min(start + self.batch_size, total)
+            if done == total or done // self.batch_size % 25 == 0:
+                print(f"Entity extraction: {done}/{total} windows ({done / total * 100:.1f}%)")
+
+        by_text = {}
+        for text, text_spans in zip(unique, spans):
+            entities = empty_entities()
+            for span in merge_spans(text_spans):
+                if span['label'] in entities:
+                    entities[span['label']].append(span['text'])
+            by_text[text] = entities
+        return [
+            {label: list(values) for label, values in by_text[text].items()} if text in by_text else empty_entities()
+            for text in texts
+        ]
@@ -0,0 +1,220 @@
+"""Location geocoding for statement cards, cached across rows and runs.
+
+Place names are normalized (Unicode form, case, spacing, surrounding
+punctuation) and every unique name of a batch is resolved once, before any
+row is built. Answers are kept in a SQLite file keyed by backend (a
+gazetteer by its content hash) and normalized name: found places for `ttl_days`, places the backend does not know
+(negative entries) for the shorter `negative_ttl_days`, so a name Nominatim
+learns later is retried. Lookups that fail (timeouts, HTTP errors) are not
+cached, and not retried again in the same run.
+
+Backends: NominatimGeocoder calls OpenStreetMap's Nominatim at most once per
+`min_interval` seconds (their usage policy allows one request per second);
+GazetteerGeocoder reads a local CSV (name,address,latitude,longitude) and needs
+no network, for tests and offline runs.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Iterable, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CACHE_PATH = os.path.join(ROOT_DIR, 'data', 'pipeline', 'geocode_cache.sqlite')
+TTL_DAYS = 180
+NEGATIVE_TTL_DAYS = 7
+
+
+class GeocodeError(RuntimeError):
+    """The backend could not answer (as opposed to not knowing the place)"""
+
+
+def normalize_place(name) -> str:
+    """Cache key of a place name: NFKC, casefolded, single-spaced, without surrounding punctuation"""
+    if not isinstance(name, str):
+        return ''
+    name = unicodedata.normalize('NFKC', name).casefold()
+    name = re.sub(r'\s+', ' ', name)
+    return name.strip(' \t\n.,;:!?"\'()[]{}')
+
+
+class NominatimGeocoder:
+    name = 'nominatim'
+
+    def __init__(self, user_agent: str = 'llm_news_app', timeout: float = 10, min_interval: float = 1.1):
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+        self.min_interval = min_interval
+        self._last_call = 0.0
+
+    def geocode(self, place: str) -> Optional[Dict]:
+        wait = self._last_call + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            location = self.geolocator.geocode(place)
+        except Exception as e:
+            raise GeocodeError(str(e)) from e
+        finally:
+            self._last_call = time.monotonic()
+        if not location:
+            return None
+        return {
+            'address': location.address,
+            'latitude': location.latitude,
+            'longitude': location.longitude
+        }
+
+
+class GazetteerGeocoder:
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            content = f.read()
+        # Cache entries belong to this gazetteer's content: another CSV, or
+        # this one edited, does not see them
+        self.name = f"gazetteer:{hashlib.sha1(content).hexdigest()[:12]}"
+        self.places = {}
+        for row in csv.DictReader(io.StringIO(content.decode('utf-8'), newline='')):
+            self.places[normalize_place(row['name'])] = {
+                'address': row['address'],
+                'latitude': float(row['latitude']),
+                'longitude': float(row['longitude'])
+            }
+
+    def geocode(self, place: str) -> Optional[Dict]:
+        return self.places.get(normalize_place(place))
+
+
+class GeocodeCache:
+    """Geocoding answers in one SQLite file; details is NULL for places the backend does not know"""
+
+    def __init__(self, db_path: str, ttl_days: float = TTL_DAYS, negative_ttl_days: float = NEGATIVE_TTL_DAYS):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_days * 86400
+        self.negative_ttl_seconds = negative_ttl_days * 86400
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS places (backend TEXT NOT NULL, key TEXT NOT NULL, '
+                'details TEXT, created REAL NOT NULL, PRIMARY KEY (backend, key))'
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.isolation_level = None
+        return conn
+
+    def get_many(self, backend: str, keys: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """{key: details or None} of the keys with a fresh entry; keys without one are left out"""
+        now = time.time()
+        found = {}
+        conn = self._connect()
+        try:
+            for key in keys:
+                row = conn.execute(
+                    'SELECT details, created FROM places WHERE backend = ? AND key = ?', (backend, key)
+                ).fetchone()
+                if row is None:
+                    continue
+                details, created = row
+                ttl = self.ttl_seconds if details is not None else self.negative_ttl_seconds
+                if now - created <= ttl:
+                    found[key] = json.loads(details) if details is not None else None
+        finally:
+            conn.close()
+        return found
+
+    def put(self, backend: str, key: str, details: Optional[Dict]) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO places (backend, key, details, created) VALUES (?, ?, ?, ?)',
+                (backend, key, json.dumps(details) if details is not None else None, time.time())
+            )
+        finally:
+            conn.close()
+
+
+class Geocoder:
+    """Resolve place names through a backend, each normalized name at most once per run"""
+
+    def __init__(self, backend, cache: Optional[GeocodeCache] = None):
+        self.backend = backend
+        self.cache = cache
+        self.start_run()
+
+    def start_run(self) -> None:
+        """Forget this process's answers and failures, so a long-lived geocoder
+        goes back to the cache (and its TTLs) and retries failed lookups"""
+        self.known: Dict[str, Optional[Dict]] = {}
+        self.failed = set()
+        self.cache_hits = 0
+        self.lookups = 0
+        self.failures = 0
+
+    def resolve(self, names: Iterable) -> Dict[str, Dict]:
+        """{name: details} of the names the backend found, resolving every unique name in one pass"""
+        names = list(dict.fromkeys(name for name in names if normalize_place(name)))
+        keys = list(dict.fromkeys(normalize_place(name) for name in names))
+        missing = [key for key in keys if key not in self.known and key not in self.failed]
+
+        if self.cache is not None and missing:
+            cached = self.cache.get_many(self.backend.name, missing)
+            self.cache_hits += len(cached)
+            self.known.update(cached)
+            missing = [key for key in missing if key not in cached]
+
+        if missing:
+            print(f"Geocoding {len(missing)} new places ({len(keys) - len(missing)} of {len(keys)} already known)...")
+        for i, key in enumerate(missing):
+            self.lookups += 1
+            try:
+                details = self.backend.geocode(key)
+            except GeocodeError as e:
+                print(f"Warning: Geocoding failed for {key}: {e}")
+                self.failures += 1
+                self.failed.add(key)
+                continue
+            self.known[key] = details
+            if self.cache is not None:
+                self.cache.put(self.backend.name, key, details)
+            if (i + 1) % 25 == 0:
+                print(f"Geocoding: {i + 1}/{len(missing)} ({((i + 1)/len(missing))*100:.1f}%)")
+
+        resolved = {}
+        for name in names:
+            details = self.known.get(normalize_place(name))
+            if details:
+                resolved[name] = details
+        return resolved
+
+    def stats(self) -> str:
+        return (f"Geocoding: {len(self.known)} places known, {self.cache_hits} from cache, "
+                f"{self.lookups} looked up, {self.failures} failed")
+
+
+def build_geocoder(gazetteer: Optional[str] = None, cache_path: Optional[str] = None) -> Geocoder:
+    """Geocoder configured by arguments or GEOCODE_GAZETTEER / GEOCODE_CACHE_DB / GEOCODE_*TTL_DAYS.
+
+    A cache path of 'off' disables the cache.
+    """
+    gazetteer = gazetteer or os.getenv('GEOCODE_GAZETTEER')
+    backend = GazetteerGeocoder(gazetteer) if gazetteer else NominatimGeocoder()
+    cache_path = cache_path or os.getenv('GEOCODE_CACHE_DB') or DEFAULT_CACHE_PATH
+    cache = None
+    if cache_path != 'off':
+        cache = GeocodeCache(
+            cache_path,
+            ttl_days=float(os.getenv('GEOCODE_TTL_DAYS') or TTL_DAYS),
+            negative_ttl_days=float(os.getenv('GEOCODE_NEGATIVE_TTL_DAYS') or NEGATIVE_TTL_DAYS),
+        )
+    return Geocoder(backend, cache)
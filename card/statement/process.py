@@ -10,8 +10,6 @@ import warnings
 import sys
 import os
 from gliner import GLiNER
-from geopy.geocoders import Nominatim
-import time
 import json
 
 # Add the project root directory to Python path
@@ -19,6 +17,8 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 sys.path.append(project_root)
 
 from classifier.fake_news.predict import predict_fake_news
+from card.statement.entities import ENTITY_LABELS, EntityExtractor, set_torch_threads
+from card.statement.geocode import build_geocoder
 warnings.filterwarnings('ignore')
 
 # Download required NLTK data
@@ -27,74 +27,45 @@ nltk.download('vader_lexicon', quiet=True)
 # Initialize GLiNER model
 print("Loading GLiNER model...")
 gliner_model = GLiNER.from_pretrained("urchade/gliner_largev2")
+entity_extractor = EntityExtractor(gliner_model)
 
-# Initialize geocoder with increased timeout and rate limiting
-geolocator = Nominatim(user_agent="llm_news_app", timeout=10)  # Increased from default 1 second to 10 seconds
+# Geocoder (Nominatim, or GEOCODE_GAZETTEER) with its persistent cache, built on first use
+geocoder = None
 
-def extract_entities(text, max_length=512):
+def get_geocoder():
+    global geocoder
+    if geocoder is None:
+        geocoder = build_geocoder()
+    return geocoder
+
+def extract_entities(text):
     """
-    Extract entities from text using GLiNER with length limit
-    
-    Args:
-        text (str): Input text to process
-        max_length (int): Maximum length of text to process (default: 512 tokens)
+    Extract entities from text using GLiNER
+
+    Long texts are read in overlapping windows rather than truncated; use
+    entity_extractor.extract_many() for many texts at once.
     """
-    if not isinstance(text, str) or not text.strip():
-        return {
-            'person': [],
-            'date': [],
-            'organization': [],
-            'location': [],
-            'action': [],
-            'event': []
-        }
-    
-    # Truncate text if it's too long
-    if len(text.split()) > max_length:
-        text = ' '.join(text.split()[:max_length])
-        print(f"Warning: Text truncated to {max_length} tokens")
-    
-    labels = ["person", "date", "organization", "location", "action", "event"]
-    try:
-        entities = gliner_model.predict_entities(text, labels)
-        
-        # Group entities by label
-        entity_dict = {label: [] for label in labels}
-        for entity in entities:
-            entity_dict[entity['label']].append(entity['text'])
-        
-        return entity_dict
-    except Exception as e:
-        print(f"Warning: Entity extraction failed: {e}")
-        return {label: [] for label in labels}
+    return entity_extractor.extract_many([text])[0]
 
 def get_location_details(location_name):
-    """Get detailed location information using geopy"""
-    try:
-        location = geolocator.geocode(location_name)
-        if location:
-            return {
-                'address': location.address,
-                'latitude': location.latitude,
-                'longitude': location.longitude
-            }
-        return None
-    except Exception as e:
-        print(f"Warning: Geocoding failed for {location_name}: {e}")
-        return None
-    finally:
-        # Add delay to respect rate limits (1 request per second)
-        time.sleep(1.1)
+    """Get detailed location information (cached; None if the place is unknown)"""
+    return get_geocoder().resolve([location_name]).get(location_name)
 
-def process_entities(text, max_length=512):
-    """Process text to extract and enrich entities"""
-    # Extract entities with max_length parameter
-    entities = extract_entities(text, max_length=max_length)
+def process_entities(text, entities=None, locations=None):
+    """Process text to extract and enrich entities.
+
+    Pass `entities` when they were extracted already and `locations` (from
+    get_geocoder().resolve) when the places were geocoded already.
+    """
+    if entities is None:
+        entities = extract_entities(text)
+    if locations is None:
+        locations = get_geocoder().resolve(entities['location'])
     
     # Get location details for each location
     location_details = {}
     for loc in entities['location']:
-        details = get_location_details(loc)
+        details = locations.get(loc)
         if details:
             location_details[loc] = details
     
@@ -103,6 +74,15 @@ def process_entities(text, max_length=512):
         'location_details': location_details
     }
 
+_vader_analyzer = None
+
+def get_vader_analyzer():
+    """Create the VADER analyzer once; building it re-reads the lexicon"""
+    global _vader_analyzer
+    if _vader_analyzer is None:
+        _vader_analyzer = SentimentIntensityAnalyzer()
+    return _vader_analyzer
+
 def analyze_sentiment(text):
     """Perform multi-method sentiment analysis"""
     if not isinstance(text, str) or not text.strip():
@@ -121,8 +101,7 @@ def analyze_sentiment(text):
     tb_subjectivity = blob.sentiment.subjectivity
     
     # VADER analysis
-    sid = SentimentIntensityAnalyzer()
-    vader_scores = sid.polarity_scores(text)
+    vader_scores = get_vader_analyzer().polarity_scores(text)
     
     return {
         'textblob_polarity': tb_polarity,
@@ -226,8 +205,11 @@ def calculate_confidence_score(probability):
     
     return round(confidence, 3)
 
-def process_comments(comments_df, date: str):
-    """Process comments DataFrame with various metrics"""
+def process_comments(comments_df, date: str, entities=None):
+    """Process comments DataFrame with various metrics.
+
+    `entities` are the extracted entities of each comment, if already known.
+    """
     print("Processing comments...")
     total_comments = len(comments_df)
     
@@ -247,13 +229,16 @@ def process_comments(comments_df, date: str):
     comments_df['vader_pos'] = [ss['vader_pos'] for ss in sentiment_scores]
     comments_df['vader_compound'] = [ss['vader_compound'] for ss in sentiment_scores]
     
-    # Extract entities with length limit
-    print("Extracting entities from comments...")
-    entity_results = []
-    for i, text in enumerate(comments_df['comment_body']):
-        entity_results.append(process_entities(text, max_length=512))
-        if (i + 1) % 50 == 0:  # Progress every 50 comments due to geocoding delays
-            print(f"Entity extraction: {i + 1}/{total_comments} ({((i + 1)/total_comments)*100:.1f}%)")
+    # Extract entities (in one batched pass unless the caller did) and locate them
+    if entities is None:
+        print("Extracting entities from comments...")
+        entities = entity_extractor.extract_many(comments_df['comment_body'])
+    # Every unique place is geocoded once before the rows are built
+    locations = get_geocoder().resolve(loc for text_entities in entities for loc in text_entities['location'])
+    entity_results = [
+        process_entities(text, text_entities, locations)
+        for text, text_entities in zip(comments_df['comment_body'], entities)
+    ]
     
     # Add entity columns
     comments_df['persons'] = [result['entities']['person'] for result in entity_results]
@@ -295,8 +280,12 @@ def process_comments(comments_df, date: str):
     
     return comments_df
 
-def process_posts(posts_df, date: str):
-    """Process posts DataFrame with various metrics"""
+def process_posts(posts_df, date: str, title_entities=None, content_entities=None):
+    """Process posts DataFrame with various metrics.
+
+    `title_entities` and `content_entities` are the extracted entities of each
+    post's title and content, if already known.
+    """
     print("Processing posts...")
     total_posts = len(posts_df)
     
@@ -326,24 +315,28 @@ def process_posts(posts_df, date: str):
     posts_df['content_vader_pos'] = [ss['vader_pos'] for ss in content_sentiment]
     posts_df['content_vader_compound'] = [ss['vader_compound'] for ss in content_sentiment]
     
-    # Extract entities from title and content with length limits
-    print("Extracting entities from posts...")
-    # For titles, use shorter limit since they're typically shorter
-    title_entities = []
-    content_entities = []
+    # Extract entities from title and content (in one batched pass unless the caller did) and locate them
+    if title_entities is None or content_entities is None:
+        print("Extracting entities from posts...")
+        extracted = entity_extractor.extract_many(list(posts_df['title']) + list(posts_df['content']))
+        title_entities, content_entities = extracted[:total_posts], extracted[total_posts:]
+    # Every unique place is geocoded once before the rows are built
+    locations = get_geocoder().resolve(
+        loc for text_entities in list(title_entities) + list(content_entities) for loc in text_entities['location']
+    )
+    title_results = []
+    content_results = []
     for i, (title, content) in enumerate(zip(posts_df['title'], posts_df['content'])):
-        title_entities.append(process_entities(title, max_length=256))
-        content_entities.append(process_entities(content, max_length=512))
-        if (i + 1) % 25 == 0:  # Progress every 25 posts due to geocoding delays
-            print(f"Entity extraction: {i + 1}/{total_posts} ({((i + 1)/total_posts)*100:.1f}%)")
+        title_results.append(process_entities(title, title_entities[i], locations))
+        content_results.append(process_entities(content, content_entities[i], locations))
     
     # Combine entities from title and content
     combined_entities = []
-    for t_ent, c_ent in zip(title_entities, content_entities):
+    for t_ent, c_ent in zip(title_results, content_results):
         combined = {
             'entities': {
                 label: list(set(t_ent['entities'][label] + c_ent['entities'][label]))
-                for label in ['person', 'date', 'organization', 'location', 'action', 'event']
+                for label in ENTITY_LABELS
             },
             'location_details': {**t_ent['location_details'], **c_ent['location_details']}
         }
@@ -399,17 +392,38 @@ def process_posts(posts_df, date: str):
     
     return posts_df
 
-def main(date='2025-06-14'):
+def process_reddit_data(date='2025-06-14'):
     """Process both posts and comments for a given date"""
     print(f"Processing data for date: {date}")
+    get_geocoder().start_run()
     
-    # Process posts
     posts_dir = f"data/raw/reddit/{date}/posts"
     posts_files = list(Path(posts_dir).glob('*.csv'))
+    comments_dir = f"data/raw/reddit/{date}/comments"
+    comments_files = list(Path(comments_dir).glob('*.csv'))
+    posts_df = pd.concat([pd.read_csv(f) for f in posts_files]) if posts_files else None
+    comments_df = pd.concat([pd.read_csv(f) for f in comments_files]) if comments_files else None
+
+    # Post titles, post contents and comments share one batched entity extraction pass
+    texts = []
+    if posts_df is not None:
+        texts += list(posts_df['title']) + list(posts_df['content'])
+    if comments_df is not None:
+        texts += list(comments_df['comment_body'])
+    print(f"Extracting entities from {len(texts)} post titles, post contents and comments...")
+    entities = entity_extractor.extract_many(texts)
+    # Geocode the places of posts and comments together, each unique name once
+    get_geocoder().resolve(loc for text_entities in entities for loc in text_entities['location'])
+    total_posts = len(posts_df) if posts_df is not None else 0
+
+    # Process posts
     if posts_files:
         print(f"Processing {len(posts_files)} post files...")
-        posts_df = pd.concat([pd.read_csv(f) for f in posts_files])
-        processed_posts = process_posts(posts_df, date)
+        processed_posts = process_posts(
+            posts_df, date,
+            title_entities=entities[:total_posts],
+            content_entities=entities[total_posts:2 * total_posts]
+        )
         
         # Save processed posts
         output_dir = f"data/card/statement_card/posts"
@@ -418,12 +432,9 @@ def main(date='2025-06-14'):
         print(f"Saved processed posts to {output_dir}/{date}.csv")
     
     # Process comments
-    comments_dir = f"data/raw/reddit/{date}/comments"
-    comments_files = list(Path(comments_dir).glob('*.csv'))
     if comments_files:
         print(f"Processing {len(comments_files)} comment files...")
-        comments_df = pd.concat([pd.read_csv(f) for f in comments_files])
-        processed_comments = process_comments(comments_df, date)
+        processed_comments = process_comments(comments_df, date, entities=entities[2 * total_posts:])
         
         # Save processed comments
         output_dir = f"data/card/statement_card/comments"
@@ -431,11 +442,29 @@ def main(date='2025-06-14'):
         processed_comments.to_csv(f"{output_dir}/{date}.csv", index=False)
         print(f"Saved processed comments to {output_dir}/{date}.csv")
 
-if __name__ == "__main__":
+def main(argv=None):
     import argparse
     
     parser = argparse.ArgumentParser(description='Process fundus data and generate event cards')
     parser.add_argument('--date', type=str, required=True, help='Date to process (YYYY-MM-DD)')
-    
-    args = parser.parse_args()
-    main(args.date)
\ No newline at end of file
+    parser.add_argument('--torch-threads', type=int, default=int(os.getenv('GLINER_TORCH_THREADS') or 0),
+                        help='CPU threads torch uses for GLiNER (default GLINER_TORCH_THREADS, else torch decides)')
+    parser.add_argument('--entity-batch-size', type=int, default=entity_extractor.batch_size,
+                        help='Text windows per GLiNER batch (default: %(default)s)')
+    parser.add_argument('--gazetteer', type=str, default=None,
+                        help='Geocode from this CSV (name,address,latitude,longitude) instead of Nominatim')
+    parser.add_argument('--geocode-cache', type=str, default=None,
+                        help="Geocode cache file (default GEOCODE_CACHE_DB or data/pipeline/geocode_cache.sqlite; 'off' disables it)")
+    
+    args = parser.parse_args(argv)
+    set_torch_threads(args.torch_threads)
+    entity_extractor.batch_size = args.entity_batch_size
+    global geocoder
+    if args.gazetteer or args.geocode_cache:
+        geocoder = build_geocoder(args.gazetteer, args.geocode_cache)
+    process_reddit_data(args.date)
+    if geocoder is not None:
+        print(geocoder.stats())
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
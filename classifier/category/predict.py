@@ -56,6 +56,16 @@ def predict(model_path: str, input_path: str, output_path: str = None):
     
     return output_df
 
+# Loaded models by path, so repeated calls in one process reuse the model
+_loaded_models = {}
+
+def load_model(model_path: str):
+    """Load a saved model once per process and reuse it"""
+    if model_path not in _loaded_models:
+        print(f"Loading model from {model_path}...")
+        _loaded_models[model_path] = joblib.load(model_path)
+    return _loaded_models[model_path]
+
 def predict_single_text(text: str, model_path: str = 'classifier/category/models/best_models/best_model.joblib'):
     """
     Predict category probabilities for a single text input
@@ -67,11 +77,9 @@ def predict_single_text(text: str, model_path: str = 'classifier/category/models
     Returns:
         dict: Dictionary of category probabilities {category: probability}
     """
-    print(f"Loading model from {model_path}...")
-    
     try:
         # Load the saved model
-        loaded_model = joblib.load(model_path)
+        loaded_model = load_model(model_path)
         
         # Extract components from the loaded model
         if hasattr(loaded_model, 'vectorizer'):
@@ -58,11 +58,20 @@ class FakeNewsPredictor:
                 })
             return results
 
+# Loaded predictors by model path, so repeated calls in one process reuse the model
+_predictors: Dict[str, FakeNewsPredictor] = {}
+
+def get_predictor(model_path: str = "classifier/fake_news/models/results/random_forest_model.joblib") -> FakeNewsPredictor:
+    """Load a predictor once per process and reuse it"""
+    if model_path not in _predictors:
+        _predictors[model_path] = FakeNewsPredictor(model_path)
+    return _predictors[model_path]
+
 def predict_fake_news(text: Union[str, List[str]], 
                      model_path: str = "classifier/fake_news/models/results/random_forest_model.joblib"
                     ) -> Union[Dict[str, float], List[Dict[str, float]]]:
     """Convenience function for making predictions"""
-    predictor = FakeNewsPredictor(model_path)
+    predictor = get_predictor(model_path)
     return predictor.predict(text)
 
 if __name__ == "__main__":
@@ -417,7 +417,7 @@ class ContentGrouper:
         
         return summary_df
 
-def main(date_str, max_group_size=None, test_range=None):
+def group_content(date_str, max_group_size=None, test_range=None):
     """Main execution function"""
     
     # Use centralized configuration if not specified
@@ -452,7 +452,7 @@ def main(date_str, max_group_size=None, test_range=None):
     
     return summary
 
-if __name__ == "__main__":
+def main(argv=None):
     import sys
     import argparse
     
@@ -465,7 +465,7 @@ if __name__ == "__main__":
     parser.add_argument('--max-clusters', type=int, default=None,
                        help='Maximum number of clusters to test')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     try:
         # Validate date format
@@ -476,11 +476,14 @@ if __name__ == "__main__":
         if args.min_clusters is not None and args.max_clusters is not None:
             test_range = range(args.min_clusters, args.max_clusters + 1)
         
-        main(args.date, args.max_size, test_range)
+        group_content(args.date, args.max_size, test_range)
     except ValueError:
         print("Error: Date must be in YYYY-MM-DD format")
         sys.exit(1)
 
+if __name__ == "__main__":
+    main()
+
 # printing to see something !
 # df = pd.read_csv('data/raw/fundus/2025-06-21/2025-06-21.csv')
 # unique_publishers = df['publisher'].nunique()
@@ -53,7 +53,7 @@ def regroup_existing_data(date_str, max_group_size=50):
     new_summary = grouper.save_grouped_content(max_group_size)
     return True
 
-def main():
+def main(argv=None):
     """Main execution"""
     parser = argparse.ArgumentParser(description='Re-process existing grouped data with size constraints')
     parser.add_argument('--date', type=str, required=True,
@@ -61,7 +61,7 @@ def main():
     parser.add_argument('--max-size', type=int, default=50,
                        help='Maximum group size (default: 50)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate date format
     try:
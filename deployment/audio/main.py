@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import asyncio
 import argparse
@@ -6,6 +7,11 @@ from pathlib import Path
 from datetime import datetime
 from tts import SimpleNewsTTS
 
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from pipeline.work_queue import temp_path_for
+
 def validate_date(date_str):
     """Validate date format YYYY-MM-DD"""
     try:
@@ -14,6 +20,50 @@ def validate_date(date_str):
     except ValueError:
         return False
 
+async def generate_group_audio(tts, json_file: Path, audio_dir: Path):
+    """Generate group_<id>.mp3 for one article file; the mp3 appears only when complete"""
+    # Extract group_id from filename
+    group_id = json_file.stem.replace('group_', '')
+    
+    # Read JSON file
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    # Get summary_speech
+    if 'summary_speech' not in data:
+        print(f"No summary_speech found in {json_file.name}")
+        return None
+    
+    summary_text = data['summary_speech']
+    
+    # Generate output path
+    output_file = audio_dir / f"group_{group_id}.mp3"
+    
+    print(f"\nProcessing group {group_id}")
+    print(f"Text length: {len(summary_text)} characters")
+    
+    # Create a temporary text file with the summary
+    temp_text_file = temp_path_for(audio_dir / f"{group_id}_temp.txt")
+    temp_output_file = temp_path_for(output_file)
+    with open(temp_text_file, 'w', encoding='utf-8') as f:
+        f.write(summary_text)
+    
+    try:
+        # Convert to speech using the temporary text file
+        await tts.convert_file(
+            input_file=str(temp_text_file),
+            output_file=str(temp_output_file),
+            voice_type='us'  # Using US voice
+        )
+        os.replace(temp_output_file, output_file)
+        print(f"Generated audio: {output_file}")
+    finally:
+        # Clean up temporary files
+        for temp_file in (temp_text_file, temp_output_file):
+            if temp_file.exists():
+                temp_file.unlink()
+    return output_file
+
 def process_json_files(date_str: str):
     """Process JSON files for a given date and generate audio files"""
     # Setup paths
@@ -41,44 +91,7 @@ def process_json_files(date_str: str):
     
     async def process_file(json_file):
         try:
-            # Extract group_id from filename
-            group_id = json_file.stem.replace('group_', '')
-            
-            # Read JSON file
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Get summary_speech
-            if 'summary_speech' not in data:
-                print(f"No summary_speech found in {json_file.name}")
-                return
-            
-            summary_text = data['summary_speech']
-            
-            # Generate output path
-            output_file = audio_dir / f"group_{group_id}.mp3"
-            
-            print(f"\nProcessing group {group_id}")
-            print(f"Text length: {len(summary_text)} characters")
-            
-            # Create a temporary text file with the summary
-            temp_text_file = audio_dir / f"{group_id}_temp.txt"
-            with open(temp_text_file, 'w', encoding='utf-8') as f:
-                f.write(summary_text)
-            
-            try:
-                # Convert to speech using the temporary text file
-                await tts.convert_file(
-                    input_file=str(temp_text_file),
-                    output_file=str(output_file),
-                    voice_type='us'  # Using US voice
-                )
-                print(f"Generated audio: {output_file}")
-            finally:
-                # Clean up temporary file
-                if temp_text_file.exists():
-                    temp_text_file.unlink()
-            
+            await generate_group_audio(tts, json_file, audio_dir)
         except Exception as e:
             print(f"Error processing {json_file.name}: {str(e)}")
     
@@ -89,7 +102,7 @@ def process_json_files(date_str: str):
     # Run the processing
     asyncio.run(process_all_files())
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description='Generate audio files from article summaries',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -102,7 +115,7 @@ Example:
     parser.add_argument('--date', type=str, required=True,
                       help='Date in YYYY-MM-DD format')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     if not validate_date(args.date):
         print("Error: Invalid date format. Please use YYYY-MM-DD")
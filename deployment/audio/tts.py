@@ -160,7 +160,7 @@ class SimpleNewsTTS:
         else:
             print("  macOS Say (macOS only)")
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description='Simple Text-to-Speech converter',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -178,7 +178,7 @@ Examples:
     parser.add_argument('--voice', type=str, choices=['us', 'gb', 'au', 'ca'], default='us', help='Voice accent')
     parser.add_argument('--list-methods', action='store_true', help='List available methods')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     tts = SimpleNewsTTS()
     
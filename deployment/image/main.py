@@ -1,14 +1,62 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
 import argparse
 from datetime import datetime
 from sd import StableDiffusionGenerator
 
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from pipeline.work_queue import temp_path_for
+
 def ensure_directory_exists(directory):
     """Create directory if it doesn't exist."""
     os.makedirs(directory, exist_ok=True)
 
+def generate_group_image(generator, article_dir, json_file, image_dir):
+    """Generate group_<id>.jpg for one article file; the jpg appears only when complete."""
+    # Extract group_id from filename
+    group_id = json_file.replace('group_', '').replace('.json', '')
+    
+    # Read JSON file
+    with open(os.path.join(article_dir, json_file), 'r') as f:
+        data = json.load(f)
+    
+    # Get cover image prompt
+    prompt = data.get('cover_image_prompt')
+    if not prompt:
+        print(f"Warning: No cover_image_prompt found in {json_file}")
+        return False
+    
+    # Generate output path
+    output_path = os.path.join(image_dir, f'group_{group_id}.jpg')
+    temp_output_path = str(temp_path_for(output_path))
+    
+    # Generate image
+    print(f"\nProcessing group {group_id}...")
+    print(f"Prompt: {prompt}")
+    
+    success = generator.generate_image(
+        prompt=prompt,
+        output_path=temp_output_path,
+        width=1024,  # Using larger size for better quality
+        height=576,  # 16:9 aspect ratio
+        steps=30,    # More steps for better quality
+        cfg_scale=7.5,
+        sampler_name="DPM++ 2M Karras"
+    )
+    
+    if success:
+        os.replace(temp_output_path, output_path)
+        print(f"Successfully generated image for group {group_id}")
+    else:
+        if os.path.exists(temp_output_path):
+            os.remove(temp_output_path)
+        print(f"Failed to generate image for group {group_id}")
+    return success
+
 def process_group_files(date_str):
     """Process all group JSON files for the given date."""
     # Setup paths
@@ -43,42 +91,8 @@ def process_group_files(date_str):
     
     for json_file in json_files:
         try:
-            # Extract group_id from filename
-            group_id = json_file.replace('group_', '').replace('.json', '')
-            
-            # Read JSON file
-            with open(os.path.join(article_dir, json_file), 'r') as f:
-                data = json.load(f)
-            
-            # Get cover image prompt
-            prompt = data.get('cover_image_prompt')
-            if not prompt:
-                print(f"Warning: No cover_image_prompt found in {json_file}")
-                continue
-            
-            # Generate output path
-            output_path = os.path.join(image_dir, f'group_{group_id}.jpg')
-            
-            # Generate image
-            print(f"\nProcessing group {group_id}...")
-            print(f"Prompt: {prompt}")
-            
-            success = generator.generate_image(
-                prompt=prompt,
-                output_path=output_path,
-                width=1024,  # Using larger size for better quality
-                height=576,  # 16:9 aspect ratio
-                steps=30,    # More steps for better quality
-                cfg_scale=7.5,
-                sampler_name="DPM++ 2M Karras"
-            )
-            
-            if success:
+            if generate_group_image(generator, article_dir, json_file, image_dir):
                 success_count += 1
-                print(f"Successfully generated image for group {group_id}")
-            else:
-                print(f"Failed to generate image for group {group_id}")
-                
         except Exception as e:
             print(f"Error processing {json_file}: {str(e)}")
             continue
@@ -86,13 +100,13 @@ def process_group_files(date_str):
     print(f"\nSummary: Generated {success_count} out of {total_files} images")
     return success_count > 0
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Generate cover images for article groups")
     parser.add_argument("--date", required=True, help="Date in YYYY-MM-DD format")
     parser.add_argument("--api-url", default="http://127.0.0.1:7860",
                        help="Stable Diffusion WebUI API URL (default: http://127.0.0.1:7860)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate date format
     try:
@@ -9,7 +9,7 @@ import sys
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(project_root)
 
-from llm_client import openai_client, perplexity_client, alibaba_client, gemini_client
+from llm_client import get_client
 
 def read_articles_from_directory(date):
     """Read all article JSON files from the specified date directory"""
@@ -107,17 +107,17 @@ def generate_llm_summary(prompt, llm_provider='ALIBABA'):
     try:
         # Select the appropriate LLM client
         if llm_provider.upper() == 'GEMINI':
-            client = openai_client
+            client = get_client('OPENAI')
             model = 'gemini-2.5-pro'
         elif llm_provider.upper() == 'ALIBABA':
-            client = alibaba_client
+            client = get_client('ALIBABA')
             model = 'qwen-max'
         elif llm_provider.upper() == 'PERPLEXITY':
-            client = perplexity_client
+            client = get_client('PERPLEXITY')
             model = 'llama-3.1-8b-instant' # change model here !
         else:
             print(f"Unknown LLM provider: {llm_provider}. Using OpenAI as default.")
-            client = openai_client
+            client = get_client('OPENAI')
             model = 'gpt-4o-mini'
         
         print(f"Generating summary using {llm_provider} with model: {model}")
@@ -146,14 +146,14 @@ def generate_llm_summary(prompt, llm_provider='ALIBABA'):
         # Return a fallback summary
         return f""" error ! """
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Generate summary from articles')
     parser.add_argument('--date', type=str, required=True, help='Date in YYYY-MM-DD format')
     parser.add_argument('--llm-provider', type=str, default='ALIBABA', 
                        choices=['OPENAI', 'PERPLEXITY', 'ALIBABA', 'GEMINI'],
                        help='LLM provider to use for summary generation (default: ALIBABA)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     date = args.date
     llm_provider = args.llm_provider
     
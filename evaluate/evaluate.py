@@ -13,6 +13,7 @@ Usage:
 import os
 import json
 import argparse
+import asyncio
 import glob
 import pandas as pd
 import numpy as np
@@ -63,7 +64,7 @@ project_root = Path(__file__).resolve().parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from llm_client import alibaba_client, perplexity_client, openai_client
+from llm_client import AsyncLLMClient, get_client, run_async
 
 # Import prompt functions using relative import
 import importlib.util
@@ -75,6 +76,15 @@ SYSTEM_PROMPT = prompt_module.SYSTEM_PROMPT
 EVALUATION_PROMPTS = prompt_module.EVALUATION_PROMPTS
 get_evaluation_prompt = prompt_module.get_evaluation_prompt
 
+# Loaded sentence transformers by name, shared by every evaluator in the process
+_sentence_models = {}
+
+def load_sentence_model(model_name: str):
+    """Load a sentence transformer once per process and reuse it."""
+    if model_name not in _sentence_models:
+        _sentence_models[model_name] = SentenceTransformer(model_name)
+    return _sentence_models[model_name]
+
 class ArticleEvaluator:
     """Comprehensive article evaluation using LLM and advanced NLP metrics."""
     
@@ -113,7 +123,7 @@ class ArticleEvaluator:
         # Load semantic similarity model
         if SENTENCE_TRANSFORMER_AVAILABLE:
             try:
-                self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.sentence_model = load_sentence_model('all-MiniLM-L6-v2')
                 print("Loaded sentence transformer model")
             except Exception as e:
                 print(f"Failed to load sentence transformer: {e}")
@@ -618,19 +628,30 @@ class ArticleEvaluator:
     def llm_evaluate_article(self, content: str, article_meta: Dict[str, Any]) -> Dict[str, float]:
         """Use multiple LLMs to evaluate article quality across multiple dimensions for cross-validation."""
         evaluations = {}
+
+        # Send every criterion to both models at once, in one event loop whose
+        # connection pools are reused for the next article
+        criteria = list(self.evaluation_prompts.keys())
+        requests = [{'prompt_content': get_evaluation_prompt(criterion, content)} for criterion in criteria]
+
+        async def evaluate_with_both_models():
+            return await asyncio.gather(
+                AsyncLLMClient('ALIBABA').generate_many(
+                    requests, system_content=SYSTEM_PROMPT, temperature=0.1, model='qwen-max-latest'
+                ),
+                AsyncLLMClient('PERPLEXITY').generate_many(
+                    requests, system_content=SYSTEM_PROMPT, temperature=0.1, model='r1-1776'
+                ),
+            )
+
+        qwen_max_responses, r1_1776_responses = run_async(evaluate_with_both_models())
         
-        for criterion, prompt in self.evaluation_prompts.items():
+        for criterion, qwen_max_response, r1_1776_response in zip(criteria, qwen_max_responses, r1_1776_responses):
             # Qwen-max evaluation
             qwen_max_score = 5.0  # Default score
             try:
-                full_prompt = get_evaluation_prompt(criterion, content)
-                
-                qwen_max_response = alibaba_client.generate(
-                    prompt_content=full_prompt,
-                    system_content=SYSTEM_PROMPT,
-                    temperature=0.1,
-                    model='qwen-max-latest'
-                )
+                if isinstance(qwen_max_response, Exception):
+                    raise qwen_max_response
 
                 # Extract numeric score from Qwen-max response
                 qwen_max_score_text = qwen_max_response.choices[0].message.content.strip()
@@ -646,13 +667,8 @@ class ArticleEvaluator:
             # Perplexity R1-1776 (reasoning model) evaluation  
             r1_1776_score = 5.0  # Default score
             try:
-                # Use same prompt as above
-                r1_1776_response = perplexity_client.generate(
-                    prompt_content=full_prompt,
-                    system_content=SYSTEM_PROMPT,
-                    temperature=0.1,
-                    model='r1-1776'
-                )
+                if isinstance(r1_1776_response, Exception):
+                    raise r1_1776_response
                 
                 # Extract numeric score from R1-1776 response
                 r1_1776_score_text = r1_1776_response.choices[0].message.content.strip()
@@ -803,29 +819,34 @@ class ArticleEvaluator:
         
         all_scores = {criterion: [] for criterion in self.evaluation_prompts.keys()}
         
+        requests = []
+        request_criteria = []
         for article in original_articles:
             if 'content' in article and article['content']:
                 content = f"Title: {article.get('title', '')}\n\nContent: {article['content']}"
                 
                 for criterion in self.evaluation_prompts.keys():
-                    try:
-                        full_prompt = get_evaluation_prompt(criterion, content)
-                        
-                        response = alibaba_client.generate(
-                            prompt_content=full_prompt,
-                            system_content=SYSTEM_PROMPT,
-                            temperature=0.1,
-                            model='qwen-max-latest'
-                        )
-                        
-                        # Extract numeric score from response
-                        score_text = response.choices[0].message.content.strip()
-                        score = float(re.search(r'\d+(?:\.\d+)?', score_text).group())
-                        all_scores[criterion].append(min(10.0, max(1.0, score)))
-                        
-                    except Exception as e:
-                        print(f"Error in LLM evaluation of original article for {criterion}: {e}")
-                        all_scores[criterion].append(5.0)  # Default neutral score
+                    requests.append({'prompt_content': get_evaluation_prompt(criterion, content)})
+                    request_criteria.append(criterion)
+
+        # All articles and criteria go out concurrently; results come back in order
+        responses = get_client('ALIBABA').generate_many(
+            requests, system_content=SYSTEM_PROMPT, temperature=0.1, model='qwen-max-latest'
+        ) if requests else []
+
+        for criterion, response in zip(request_criteria, responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                
+                # Extract numeric score from response
+                score_text = response.choices[0].message.content.strip()
+                score = float(re.search(r'\d+(?:\.\d+)?', score_text).group())
+                all_scores[criterion].append(min(10.0, max(1.0, score)))
+                
+            except Exception as e:
+                print(f"Error in LLM evaluation of original article for {criterion}: {e}")
+                all_scores[criterion].append(5.0)  # Default neutral score
         
         # Calculate average scores for each criterion
         avg_scores = {}
@@ -1604,11 +1625,11 @@ class ArticleEvaluator:
         return "\n".join(report_lines)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Evaluate article quality using LLM and ML approaches')
     parser.add_argument('--date', required=True, help='Date in YYYY-MM-DD format (e.g., 2025-06-14)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate date format - handle both YYYY-MM-DD and YYYY-MM-DD-model formats
     date_to_validate = args.date
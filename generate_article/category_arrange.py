@@ -65,10 +65,10 @@ def map_classifier_category_to_target(classifier_category, probabilities):
         print('type: ', classifier_category)
         return 'unknown'
 
-if __name__ == "__main__":
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Generate news articles from grouped data')
     parser.add_argument('--date', type=str, required=True, help='Date in YYYY-MM-DD format')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     date_str = args.date
     
     groups_dir = Path(f"data/output/article/{date_str}")
@@ -164,4 +164,7 @@ if __name__ == "__main__":
         print(json.dumps(group_categories, indent=2))
 
     else:
-        print("No groups were successfully categorized")
\ No newline at end of file
+        print("No groups were successfully categorized")
+
+if __name__ == "__main__":
+    main()
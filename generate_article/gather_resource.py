@@ -18,11 +18,13 @@ import pandas as pd
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
+from pipeline.work_queue import atomic_write_json
+from card.event.cards import load_flat_event_cards
+
 def get_event_by_id(event_id_list, date):
     """Get events by their IDs"""
     try:
-        df = pd.read_csv(f'data/card/event_card/{date}.csv')
-        return df[df['event_id'].isin(event_id_list)]
+        return load_flat_event_cards(date, event_id_list)
     except FileNotFoundError:
         print(f"Warning: Event card file not found for date {date}")
         return pd.DataFrame()
@@ -173,8 +175,7 @@ def gather_resources(date_str: str):
                 continue
             
             # Save to JSON file
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(detailed_content, f, indent=2, ensure_ascii=False, default=str)
+            atomic_write_json(output_file, detailed_content, indent=2, ensure_ascii=False, default=str)
             
             print(f"Group {group_id} resources saved to {output_file}")
             processed_count += 1
@@ -185,13 +186,13 @@ def gather_resources(date_str: str):
             continue
     
 
-def main():
+def main(argv=None):
     """Main function"""
     parser = argparse.ArgumentParser(description='Gather detailed resources for article groups')
     parser.add_argument('--date', type=str, required=True,
                       help='Date to process (YYYY-MM-DD format)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate date format
     try:
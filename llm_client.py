@@ -1,12 +1,962 @@
 import os
-from openai import OpenAI
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+import asyncio
+import atexit
+import hashlib
 import json
+import sqlite3
 import sys
+import threading
+import time
+import weakref
+from collections import deque
 from dotenv import load_dotenv
 
+# openai (and the httpx/pydantic stack behind it) is imported on first use, so
+# importing this module stays cheap for stages that never call a provider.
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
 load_dotenv()
 
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RATE_LIMIT_DB = os.path.join(PROJECT_ROOT, 'data', 'pipeline', 'llm_rate_limit.sqlite')
+
+# Requests per minute (and optionally tokens per minute) per publisher or
+# publisher/model. They replace the sleeps the stages used to do: 1 s per event
+# card on Alibaba, 6 s after gemini-2.0-flash and 12 s after gemini-2.5-pro.
+# Override with LLM_RATE_LIMITS="ALIBABA=60:1000000,GEMINI/gemini-2.5-pro=5",
+# i.e. KEY=REQUESTS_PER_MINUTE[:TOKENS_PER_MINUTE].
+DEFAULT_RATE_LIMITS = {
+    'ALIBABA': (60, None),
+    'GEMINI/gemini-2.0-flash': (10, None),
+    'GEMINI/gemini-2.5-pro': (5, None),
+}
+
+
+def parse_rate_limits(raw: str) -> Dict[str, str]:
+    """Parse "KEY=VALUE,..." into {KEY: VALUE}, upper-casing the publisher part of KEY."""
+    limits = {}
+    for item in raw.split(','):
+        if not item.strip():
+            continue
+        key, _, value = item.partition('=')
+        publisher, slash, model = key.strip().partition('/')
+        limits[publisher.upper() + slash + model] = value.strip()
+    return limits
+
+
+def load_rate_limits(raw: str) -> Dict[str, tuple]:
+    """DEFAULT_RATE_LIMITS updated with LLM_RATE_LIMITS; values are (requests/min, tokens/min)."""
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for key, value in parse_rate_limits(raw).items():
+        requests, _, tokens = value.partition(':')
+        limits[key] = (float(requests) if requests else None, float(tokens) if tokens else None)
+    return limits
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> int:
+    """Rough request size (4 characters per token) charged before the real usage is known."""
+    return sum(len(message['content']) for message in messages) // 4 + (max_tokens or 0)
+
+
+class SharedRateLimiter:
+    """Token buckets per publisher and publisher/model, shared through one SQLite file.
+
+    Each limit is a bucket holding one minute's worth of requests or tokens
+    that refills continuously. A request waits until every bucket that applies
+    to it (e.g. GEMINI and GEMINI/gemini-2.5-pro, requests and tokens) has
+    room. Every process that points at the same file shares the buckets, so
+    parallel pipeline workers together stay under the provider's limits.
+    """
+
+    MAX_WAIT = 60.0  # re-check at least this often while waiting
+
+    def __init__(self, db_path: str, limits: Dict[str, tuple]):
+        self.db_path = db_path
+        self.limits = limits
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS backoffs (name TEXT PRIMARY KEY, until REAL NOT NULL)')
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.isolation_level = None
+        return conn
+
+    def _buckets(self, publisher: str, model: Optional[str]) -> List[tuple]:
+        """(bucket name, per-minute capacity, kind) of every limit that applies."""
+        buckets = []
+        for key in (publisher, f'{publisher}/{model}' if model else None):
+            requests, tokens = self.limits.get(key, (None, None)) if key else (None, None)
+            if requests:
+                buckets.append((f'{key}|requests', requests, 'requests'))
+            if tokens:
+                buckets.append((f'{key}|tokens', tokens, 'tokens'))
+        return buckets
+
+    def _take(self, conn: sqlite3.Connection, keys: List[str], buckets: List[tuple], costs: Dict[str, float]) -> float:
+        """Refill and, if all buckets have room, charge them. Returns seconds to wait (0 when charged)."""
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        until = conn.execute(f'SELECT MAX(until) FROM backoffs WHERE name IN ({placeholders})', keys).fetchone()[0]
+        if until is not None and until > now:
+            return until - now
+
+        state = {}
+        wait = 0.0
+        for name, capacity, kind in buckets:
+            row = conn.execute('SELECT level, updated FROM buckets WHERE name = ?', (name,)).fetchone()
+            level, updated = row if row else (capacity, now)
+            level = min(capacity, level + (now - updated) * capacity / 60.0)
+            state[name] = level
+            # A single request larger than the whole budget only waits for a full bucket.
+            cost = min(costs[kind], capacity)
+            if level < cost:
+                wait = max(wait, (cost - level) * 60.0 / capacity)
+
+        for name, capacity, kind in buckets:
+            level = state[name] - (min(costs[kind], capacity) if wait == 0 else 0)
+            conn.execute(
+                'INSERT INTO buckets (name, level, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated',
+                (name, level, now)
+            )
+        return wait
+
+    def acquire(self, publisher: str, model: Optional[str] = None, tokens: int = 0) -> None:
+        """Block until one request of about `tokens` tokens fits the publisher's and model's limits."""
+        keys = [publisher, f'{publisher}/{model}']
+        buckets = self._buckets(publisher, model)
+        if not buckets:
+            # Nothing to charge: only honour back-offs, without the write lock
+            self._wait_for_back_off(keys)
+            return
+        costs = {'requests': 1, 'tokens': tokens}
+        while True:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                wait = self._take(conn, keys, buckets, costs)
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+            if wait == 0:
+                return
+            time.sleep(min(wait, self.MAX_WAIT))
+
+    def _wait_for_back_off(self, keys: List[str]) -> None:
+        placeholders = ','.join('?' * len(keys))
+        while True:
+            conn = self._connect()
+            try:
+                until = conn.execute(
+                    f'SELECT MAX(until) FROM backoffs WHERE name IN ({placeholders})', keys
+                ).fetchone()[0]
+            finally:
+                conn.close()
+            wait = until - time.time() if until is not None else 0
+            if wait <= 0:
+                return
+            time.sleep(min(wait, self.MAX_WAIT))
+
+    def record_usage(self, publisher: str, model: Optional[str], estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token buckets once the response reports how many tokens were really used."""
+        if actual_tokens is None or actual_tokens == estimated_tokens:
+            return
+        buckets = [bucket for bucket in self._buckets(publisher, model) if bucket[2] == 'tokens']
+        if not buckets:
+            return
+        conn = self._connect()
+        try:
+            for name, _, _ in buckets:
+                conn.execute(
+                    'UPDATE buckets SET level = level - ? WHERE name = ?',
+                    (actual_tokens - estimated_tokens, name)
+                )
+        finally:
+            conn.close()
+
+    def back_off(self, publisher: str, model: Optional[str], seconds: float) -> None:
+        """Pause every worker's requests to this publisher/model, e.g. after a 503 or 429."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO backoffs (name, until) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET until = MAX(until, excluded.until)',
+                (f'{publisher}/{model}' if model else publisher, time.time() + seconds)
+            )
+        finally:
+            conn.close()
+
+
+_shared_rate_limiter = None
+
+
+def get_shared_rate_limiter() -> Optional[SharedRateLimiter]:
+    """Return the limiter shared through LLM_RATE_LIMIT_DB (default data/pipeline/llm_rate_limit.sqlite).
+
+    LLM_RATE_LIMIT_DB=off turns rate limiting off.
+    """
+    global _shared_rate_limiter
+    db_path = os.getenv('LLM_RATE_LIMIT_DB') or DEFAULT_RATE_LIMIT_DB
+    if db_path == 'off':
+        return None
+    raw_limits = os.getenv('LLM_RATE_LIMITS', '')
+    if (_shared_rate_limiter is None or _shared_rate_limiter.db_path != db_path
+            or _shared_rate_limiter.raw_limits != raw_limits):
+        _shared_rate_limiter = SharedRateLimiter(db_path, load_rate_limits(raw_limits))
+        _shared_rate_limiter.raw_limits = raw_limits
+    return _shared_rate_limiter
+
+
+def usage_tokens(completion) -> Optional[int]:
+    usage = getattr(completion, 'usage', None)
+    return getattr(usage, 'total_tokens', None) if usage else None
+
+# Request options that do not change the response and stay out of the cache key.
+UNCACHED_OPTIONS = {'timeout', 'extra_headers', 'stream', 'stream_options'}
+
+CACHE_MODES = ('readwrite', 'readonly', 'replay')
+
+
+class CacheMiss(RuntimeError):
+    pass
+
+
+class ResponseCache:
+    """On-disk cache of chat completions in one SQLite file.
+
+    Entries are keyed by publisher, model, messages and every sampling option
+    (temperature, top_p, response_format, ...). Entries older than
+    `max_age_days` are dropped, and the least recently used ones go once the
+    file holds more than `max_mb` of responses.
+
+    Modes: 'readwrite' stores new responses; 'readonly' serves hits but never
+    writes; 'replay' serves hits and raises CacheMiss instead of calling the
+    provider, for deterministic reruns.
+    """
+
+    EVICT_EVERY = 50  # stores between eviction passes
+
+    def __init__(self, db_path: str, mode: str = 'readwrite', max_mb: float = 1024, max_age_days: float = 30):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode}. Use one of {', '.join(CACHE_MODES)}")
+        self.db_path = db_path
+        self.mode = mode
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        if mode == 'readwrite':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, '
+                    'size INTEGER NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)'
+                )
+            finally:
+                conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.isolation_level = None
+        return conn
+
+    @staticmethod
+    def make_key(publisher: str, model: str, messages: List[Dict[str, str]], options: Dict[str, Any]) -> str:
+        options = {name: value for name, value in options.items() if name not in UNCACHED_OPTIONS}
+        payload = json.dumps(
+            {'publisher': publisher, 'model': model, 'messages': messages, 'options': options},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional['ChatCompletion']:
+        row = None
+        if os.path.exists(self.db_path):
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    'SELECT response, created FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and time.time() - row[1] > self.max_age_seconds:
+                    row = None
+                if row is not None and self.mode == 'readwrite':
+                    conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+            except sqlite3.OperationalError:
+                row = None
+            finally:
+                conn.close()
+
+        if row is None:
+            self.misses += 1
+            if self.mode == 'replay':
+                raise CacheMiss(f"LLM cache miss in replay mode ({self.db_path})")
+            return None
+        from openai.types.chat import ChatCompletion
+
+        self.hits += 1
+        return ChatCompletion.model_validate_json(row[0])
+
+    def put(self, key: str, completion: 'ChatCompletion') -> None:
+        if self.mode != 'readwrite':
+            return
+        response = completion.model_dump_json()
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, response, len(response), now, now)
+            )
+            self.stores += 1
+            if self.stores % self.EVICT_EVERY == 1:
+                self._evict(conn, now)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute('DELETE FROM responses WHERE created < ?', (now - self.max_age_seconds,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_used').fetchall():
+            conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> str:
+        return f"LLM cache ({self.mode}): {self.hits} hits, {self.misses} misses, {self.stores} stored"
+
+
+_response_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the cache configured by LLM_CACHE_DB, or None when caching is off."""
+    global _response_cache
+    db_path = os.getenv('LLM_CACHE_DB')
+    if not db_path:
+        return None
+    if _response_cache is None or _response_cache.db_path != db_path:
+        _response_cache = ResponseCache(
+            db_path,
+            mode=os.getenv('LLM_CACHE_MODE') or 'readwrite',
+            max_mb=float(os.getenv('LLM_CACHE_MAX_MB') or 1024),
+            max_age_days=float(os.getenv('LLM_CACHE_MAX_AGE_DAYS') or 30),
+        )
+    return _response_cache
+
+
+@atexit.register
+def _print_cache_stats() -> None:
+    if _response_cache is not None and (_response_cache.hits or _response_cache.misses):
+        print(_response_cache.stats())
+
+
+class CircuitOpen(RuntimeError):
+    pass
+
+
+class ProviderHealth:
+    """Latency, error rate and circuit breaker state of one publisher/model in this process.
+
+    Latency and error rate are exponentially weighted moving averages. After
+    `failure_threshold` failures in a row the circuit opens and requests fail
+    at once with CircuitOpen instead of waiting for the timeout. Once
+    `cooldown` seconds have passed it is half-open: one trial request goes
+    through, and the circuit closes if it succeeds or reopens for twice as
+    long (up to `max_cooldown`) if it fails.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown: float = 30.0,
+                 max_cooldown: float = 300.0, alpha: float = 0.2):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.recent_latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def available(self) -> bool:
+        """Whether a request would be let through right now (without reserving it)."""
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self.trial_in_flight)
+
+    def before_request(self) -> None:
+        """Raise CircuitOpen unless a request may go to this provider now."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            retry_in = max(0.0, self.opened_at + self.cooldown - time.monotonic())
+            raise CircuitOpen(f"{self.name} circuit open (provider unavailable), retry in {retry_in:.0f}s")
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.recent_latencies.append(latency)
+            self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+            self.error_rate = (1 - self.alpha) * self.error_rate
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.cooldown = self.base_cooldown
+            self.trial_in_flight = False
+
+    def record_failure(self, latency: float) -> None:
+        with self._lock:
+            # A timeout says as much about latency as a slow success does.
+            self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+            self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+            self.consecutive_failures += 1
+            if self.trial_in_flight:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self.opened_at = time.monotonic()
+            elif self.consecutive_failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def release(self) -> None:
+        """Give back a half-open trial that ended without saying anything about the provider."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def latency_percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """The given percentile of recent successful request latencies, or None with too few samples."""
+        with self._lock:
+            latencies = sorted(self.recent_latencies)
+        if len(latencies) < max(min_samples, 1):
+            return None
+        index = min(len(latencies) - 1, int(round(percentile / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def describe(self) -> str:
+        latency = f"{self.latency:.1f}s" if self.latency is not None else "n/a"
+        return f"{self.name}: {self.state}, latency {latency}, error rate {self.error_rate:.0%}"
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """True for errors that say the provider is unhealthy (timeouts, 5xx, 429, connection errors).
+
+    Other 4xx responses mean the request itself was bad and leave the circuit alone.
+    """
+    status = getattr(error, 'status_code', None)
+    return status is None or status >= 500 or status in (408, 429)
+
+
+_provider_health: Dict[str, ProviderHealth] = {}
+_provider_health_lock = threading.Lock()
+
+
+def get_provider_health(publisher: str, model: str) -> ProviderHealth:
+    """Return this process's health record for publisher/model.
+
+    LLM_CIRCUIT_FAILURES and LLM_CIRCUIT_COOLDOWN set the breaker's threshold
+    and initial open time (defaults 5 failures, 30 s).
+    """
+    name = f'{publisher.upper()}/{model}'
+    with _provider_health_lock:
+        if name not in _provider_health:
+            _provider_health[name] = ProviderHealth(
+                name,
+                failure_threshold=int(os.getenv('LLM_CIRCUIT_FAILURES') or 5),
+                cooldown=float(os.getenv('LLM_CIRCUIT_COOLDOWN') or 30),
+            )
+        return _provider_health[name]
+
+
+def load_fallbacks(raw: str) -> Dict[str, List[tuple]]:
+    """Parse LLM_FALLBACKS, e.g. "ALIBABA/qwen-plus=GEMINI/gemini-2.0-flash>OPENAI/gpt-4o-mini".
+
+    Returns {PUBLISHER/model: [(publisher, model), ...]} in fallback order.
+    """
+    fallbacks = {}
+    for key, value in parse_rate_limits(raw).items():
+        chain = []
+        for target in value.split('>'):
+            publisher, _, model = target.strip().partition('/')
+            if publisher and model:
+                chain.append((publisher.upper(), model))
+        fallbacks[key] = chain
+    return fallbacks
+
+
+def fallback_route(publisher: str, model: str) -> List[tuple]:
+    """publisher/model followed by its LLM_FALLBACKS chain (none by default)."""
+    publisher = publisher.upper()
+    chain = load_fallbacks(os.getenv('LLM_FALLBACKS', '')).get(f'{publisher}/{model}', [])
+    return [(publisher, model)] + [target for target in chain if target != (publisher, model)]
+
+
+# A provider is tried after the others in its route when it is this
+# many times (and at least SLOW_PROVIDER_MARGIN seconds) slower than the fastest
+# one in the route, or when more than DEGRADED_ERROR_RATE of its recent
+# requests failed.
+SLOW_PROVIDER_FACTOR = 3.0
+SLOW_PROVIDER_MARGIN = 5.0
+DEGRADED_ERROR_RATE = 0.5
+
+
+def order_route(route: List[tuple]) -> List[tuple]:
+    """Order a route so that requests go to a healthy, responsive provider first.
+
+    Providers whose circuit is open are left out. The rest keep their route
+    order, except that slow or error-prone ones are moved to the back. A
+    half-open provider keeps its place so its trial request can close the
+    circuit again.
+    """
+    candidates = []
+    for publisher, model in route:
+        health = get_provider_health(publisher, model)
+        if health.available():
+            candidates.append(((publisher, model), health))
+    known = [health.latency for _, health in candidates if health.latency is not None]
+    fastest = min(known) if known else None
+
+    def is_degraded(health):
+        if health.state == ProviderHealth.HALF_OPEN:
+            return False
+        if health.error_rate > DEGRADED_ERROR_RATE:
+            return True
+        return (fastest is not None and health.latency is not None
+                and health.latency > max(SLOW_PROVIDER_FACTOR * fastest, fastest + SLOW_PROVIDER_MARGIN))
+
+    ordered = [target for target, health in candidates if not is_degraded(health)]
+    return ordered + [target for target, health in candidates if is_degraded(health)]
+
+
+def generate_routed(route: List[tuple], prompt_content: str, hedge: Optional['HedgePolicy'] = None,
+                    attempts: Optional[List[Dict[str, Any]]] = None, **kwargs) -> tuple:
+    """Send one request along a route of (publisher, model) pairs, e.g. fallback_route('ALIBABA', 'qwen-plus').
+
+    Providers are tried in order_route() order and the next one is used when
+    a provider fails or its circuit is open. Returns (completion, publisher,
+    model) of the provider that answered; raises the last error if none did.
+    `hedge` and `attempts` are passed on to LLMClient.generate().
+    """
+    last_error: Exception = CircuitOpen(
+        f"All providers circuit open (provider unavailable): {', '.join(f'{p}/{m}' for p, m in route)}"
+    )
+    for publisher, model in order_route(route):
+        try:
+            completion = get_client(publisher).generate(
+                prompt_content, model=model, hedge=hedge, attempts=attempts, **kwargs
+            )
+        except Exception as e:
+            print(f"LLM request to {publisher}/{model} failed: {e}")
+            last_error = e
+            continue
+        winners = [attempt for attempt in attempts or [] if attempt['status'] == 'won']
+        if winners:
+            publisher, model = winners[-1]['publisher'], winners[-1]['model']
+        return completion, publisher, model
+    raise last_error
+
+
+class HedgePolicy:
+    """When to send a duplicate of a slow request, and how often that may happen.
+
+    A request that has not answered after the `percentile` of the provider's
+    recent latencies gets a duplicate, sent to the first available fallback
+    of the same publisher/model (see LLM_FALLBACKS) or else to the same one.
+    The first answer wins and the other request is cancelled. At most
+    `max_fraction` of requests are hedged, and none until the provider has
+    `min_samples` latencies to go by.
+    """
+
+    def __init__(self, percentile: float = 95, max_fraction: float = 0.05, min_samples: int = 20):
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedged = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, publisher: str, model: str) -> Optional[float]:
+        """Seconds to wait for `publisher/model` before hedging, None when there is no basis yet."""
+        return get_provider_health(publisher, model).latency_percentile(self.percentile, self.min_samples)
+
+    def hedge_target(self, publisher: str, model: str) -> tuple:
+        for target in fallback_route(publisher, model)[1:]:
+            if get_provider_health(*target).available():
+                return target
+        return publisher.upper(), model
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """Reserve a hedge if that keeps hedged requests within max_fraction of all requests."""
+        with self._lock:
+            if self.hedged + 1 > self.max_fraction * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+
+_hedge_policy = None
+
+
+def get_hedge_policy() -> Optional[HedgePolicy]:
+    """Return the policy set by LLM_HEDGE_PERCENTILE (and LLM_HEDGE_MAX_FRACTION), or None when unset."""
+    global _hedge_policy
+    raw_percentile = os.getenv('LLM_HEDGE_PERCENTILE')
+    if not raw_percentile:
+        return None
+    percentile = float(raw_percentile)
+    max_fraction = float(os.getenv('LLM_HEDGE_MAX_FRACTION') or 0.05)
+    if (_hedge_policy is None or _hedge_policy.percentile != percentile
+            or _hedge_policy.max_fraction != max_fraction):
+        _hedge_policy = HedgePolicy(percentile, max_fraction)
+    return _hedge_policy
+
+
+@atexit.register
+def _print_hedge_stats() -> None:
+    if _hedge_policy is not None and _hedge_policy.hedged:
+        print(f"LLM hedging: {_hedge_policy.hedged} of {_hedge_policy.requests} requests hedged")
+
+
+@atexit.register
+def _print_provider_health() -> None:
+    unhealthy = [health for health in _provider_health.values() if health.error_rate > 0 or health.opened_at]
+    for health in unhealthy:
+        print(f"LLM provider {health.describe()}")
+
+
+# Publishers with an OpenAI-compatible /v1/files + /v1/batches API for generate_batch().
+BATCH_PUBLISHERS = {'OPENAI', 'ALIBABA'}
+BATCH_ENDPOINT = '/v1/chat/completions'
+BATCH_FINAL_STATES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+class BatchFailed(RuntimeError):
+    pass
+
+
+# Concurrent requests per publisher for AsyncLLMClient / generate_many.
+# Override with LLM_MAX_IN_FLIGHT="ALIBABA=8,PERPLEXITY=2".
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+def get_max_in_flight(publisher: str) -> int:
+    limits = parse_rate_limits(os.getenv('LLM_MAX_IN_FLIGHT', ''))
+    return int(float(limits.get(publisher, DEFAULT_MAX_IN_FLIGHT)))
+
+
+# One pooled AsyncOpenAI client and in-flight semaphore per provider, in-flight
+# limit and event loop (httpx connections cannot be shared between loops).
+_async_pools = weakref.WeakKeyDictionary()
+
+
+async def close_async_pools() -> None:
+    """Close the pooled async clients of the running event loop."""
+    pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for client, _ in pools.values():
+        await client.close()
+
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_loop_lock = threading.Lock()
+
+
+def run_async(coro):
+    """Run a coroutine to completion from synchronous code and return its result.
+
+    Every call shares one event loop, running in a daemon thread for the life
+    of the process, so the pooled AsyncOpenAI clients and in-flight limits of
+    AsyncLLMClient are reused from call to call instead of being built and
+    torn down each time.
+    """
+    global _background_loop
+    with _background_loop_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name='llm-client-loop', daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop).result()
+
+
+@atexit.register
+def _close_background_loop() -> None:
+    if _background_loop is not None:
+        asyncio.run_coroutine_threadsafe(close_async_pools(), _background_loop).result(timeout=10)
+        _background_loop.call_soon_threadsafe(_background_loop.stop)
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def build_messages(prompt_content: str, system_content: str) -> List[Dict[str, str]]:
+    return [
+        {'role': 'system', 'content': system_content},
+        {'role': 'user', 'content': prompt_content}
+    ]
+
+
+def request_body(model: str, messages: List[Dict[str, str]], temperature: float, top_p: float, **kwargs) -> Dict[str, Any]:
+    """The JSON body of a chat completion request, as the provider receives it."""
+    body = {'model': model, 'messages': messages, 'temperature': temperature, 'top_p': top_p}
+    body.update({name: value for name, value in kwargs.items() if name not in UNCACHED_OPTIONS})
+    return body
+
+
+def request_hash(body: Dict[str, Any]) -> str:
+    """Cassette key of a request body; options that do not change the answer are left out."""
+    body = {name: value for name, value in body.items() if name not in UNCACHED_OPTIONS}
+    payload = json.dumps(body, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class CassetteRecorder:
+    """Appends every real request and its response to a JSONL cassette.
+
+    Each line holds the request hash, publisher, request body, response and
+    latency, which llm_stub_server.py --cassette replays offline.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def record(self, publisher: str, body: Dict[str, Any], completion, latency: float) -> None:
+        line = json.dumps({
+            'key': request_hash(body),
+            'publisher': publisher,
+            'request': body,
+            'response': json.loads(completion.model_dump_json()),
+            'latency': round(latency, 3),
+        }, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            # One write per line in append mode, so several processes can share a cassette.
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.recorded += 1
+
+
+def load_cassette(path: str) -> Dict[str, Dict[str, Any]]:
+    """{request hash: cassette entry} of a recorded cassette; later entries win."""
+    entries = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry['key']] = entry
+    return entries
+
+
+_cassette_recorder = None
+
+
+def get_cassette_recorder() -> Optional[CassetteRecorder]:
+    """Return the recorder writing to LLM_RECORD_CASSETTE, or None when recording is off."""
+    global _cassette_recorder
+    path = os.getenv('LLM_RECORD_CASSETTE')
+    if not path:
+        return None
+    if _cassette_recorder is None or _cassette_recorder.path != path:
+        _cassette_recorder = CassetteRecorder(path)
+    return _cassette_recorder
+
+
+@atexit.register
+def _print_recorder_stats() -> None:
+    if _cassette_recorder is not None and _cassette_recorder.recorded:
+        print(f"LLM cassette: recorded {_cassette_recorder.recorded} requests to {_cassette_recorder.path}")
+
+
+class PreparedRequest:
+    """The bookkeeping around one chat completion request, shared by every request path.
+
+    lookup() checks the response cache. begin() checks the provider's circuit
+    breaker, acquire() waits for the rate limits and start() marks when the
+    request goes out. Afterwards failed() records an error and returns the
+    exception to raise, or succeeded() records the latency and store() charges
+    the real token usage, caches the response and records it to the cassette.
+    """
+
+    def __init__(self, publisher: str, model: str, messages: List[Dict[str, str]],
+                 temperature: float, top_p: float, kwargs: Dict[str, Any]):
+        self.publisher = publisher
+        self.model = model
+        self.messages = messages
+        self.temperature = temperature
+        self.top_p = top_p
+        self.kwargs = kwargs
+        self.cache = get_response_cache()
+        self.cache_key = None
+        if self.cache is not None:
+            self.cache_key = ResponseCache.make_key(
+                publisher, model, messages, dict(kwargs, temperature=temperature, top_p=top_p)
+            )
+        self.health: Optional[ProviderHealth] = None
+        self.rate_limiter: Optional[SharedRateLimiter] = None
+        self.estimated_tokens = 0
+        self.started: Optional[float] = None
+        self.latency: Optional[float] = None
+
+    def lookup(self):
+        """The cached response, or None."""
+        return self.cache.get(self.cache_key) if self.cache is not None else None
+
+    def begin(self) -> None:
+        """Raise CircuitOpen unless the provider takes requests now."""
+        self.health = get_provider_health(self.publisher, self.model)
+        self.health.before_request()
+        self.rate_limiter = get_shared_rate_limiter()
+        self.estimated_tokens = estimate_tokens(self.messages, self.kwargs.get('max_tokens'))
+
+    def acquire(self) -> None:
+        """Block until the request fits the shared rate limits."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.publisher, self.model, self.estimated_tokens)
+
+    def start(self) -> float:
+        self.started = time.monotonic()
+        return self.started
+
+    def failed(self, error: BaseException) -> BaseException:
+        """Record a request that raised; returns the exception to raise in its place.
+
+        Errors before the request went out, cancellation and a caller that
+        stops reading a stream early leave the provider's health alone.
+        """
+        if self.started is None or not isinstance(error, Exception):
+            self.health.release()
+            return error
+        if is_provider_failure(error):
+            self.health.record_failure(time.monotonic() - self.started)
+        else:
+            self.health.release()
+        return RuntimeError(f"Error generating response from {self.publisher}: {str(error)}")
+
+    def succeeded(self) -> None:
+        self.latency = time.monotonic() - self.started
+        self.health.record_success(self.latency)
+
+    def store(self, completion) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_usage(self.publisher, self.model, self.estimated_tokens, usage_tokens(completion))
+        if self.cache is not None:
+            self.cache.put(self.cache_key, completion)
+        recorder = get_cassette_recorder()
+        if recorder is not None:
+            body = request_body(self.model, self.messages, self.temperature, self.top_p, **self.kwargs)
+            recorder.record(self.publisher, body, completion, self.latency)
+
+
+class CompletionStream:
+    """The content deltas of a streamed completion, as they arrive.
+
+    Iterate it (or `async for` it, for AsyncLLMClient.generate_stream()) to get
+    text deltas. Once the stream is exhausted, `content` holds the whole
+    message, `usage` the token totals when the provider reported them and
+    `completion` the equivalent ChatCompletion. `time_to_first_delta` is the
+    seconds from the request to the first delta.
+    """
+
+    def __init__(self, publisher: str, model: str):
+        self.publisher = publisher
+        self.model = model
+        self.content = ''
+        self.usage = None
+        self.completion = None
+        self.time_to_first_delta: Optional[float] = None
+        self._parts: List[str] = []
+        self._id = None
+        self._created = None
+        self._finish_reason = None
+        self._started = time.monotonic()
+        self._deltas = None
+
+    def __iter__(self):
+        return self._deltas
+
+    def __aiter__(self):
+        return self._deltas
+
+    def add_chunk(self, chunk) -> str:
+        """Take one ChatCompletionChunk; returns its text delta ('' if none)."""
+        self._id = self._id or chunk.id
+        self._created = self._created or chunk.created
+        if getattr(chunk, 'usage', None):
+            self.usage = chunk.usage
+        delta = ''
+        for choice in chunk.choices:
+            if choice.finish_reason:
+                self._finish_reason = choice.finish_reason
+            if choice.index == 0 and choice.delta and choice.delta.content:
+                delta = choice.delta.content
+        if delta:
+            if self.time_to_first_delta is None:
+                self.time_to_first_delta = time.monotonic() - self._started
+            self._parts.append(delta)
+        return delta
+
+    def replay(self, completion) -> str:
+        """Fill the stream from a complete (e.g. cached) response; returns its content."""
+        self.completion = completion
+        self.usage = completion.usage
+        self.content = completion.choices[0].message.content or ''
+        self.time_to_first_delta = time.monotonic() - self._started
+        return self.content
+
+    def finish(self):
+        """Assemble `content` and `completion` after the last chunk."""
+        from openai.types.chat import ChatCompletion
+
+        self.content = ''.join(self._parts)
+        self.completion = ChatCompletion.model_validate({
+            'id': self._id or '',
+            'object': 'chat.completion',
+            'created': self._created or int(time.time()),
+            'model': self.model,
+            'choices': [{
+                'index': 0,
+                'finish_reason': self._finish_reason or 'stop',
+                'message': {'role': 'assistant', 'content': self.content},
+            }],
+            'usage': self.usage.model_dump() if self.usage is not None else None,
+        })
+        return self.completion
+
+
 class LLMClient:
     "read the notebook!"
     
@@ -14,12 +964,20 @@ class LLMClient:
         self.publisher = publisher.upper()
         self.api_key = api_key or self._get_default_api_key()
         self.base_url = base_url or self._get_default_base_url()
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url,
-            timeout=300  # Default 3 minutes timeout for all requests
-        )
+        self._client = None
+
+    @property
+    def client(self):
+        """The OpenAI client, built on first request."""
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=300  # Default 3 minutes timeout for all requests
+            )
+        return self._client
     
     def _get_default_api_key(self) -> str:
         env_vars = {
@@ -44,7 +1002,8 @@ class LLMClient:
             'ALIBABA': "https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
             'GEMINI': "https://generativelanguage.googleapis.com/v1beta/",
         }
-        return urls.get(self.publisher, "")
+        # <PUBLISHER>_BASE_URL points a provider elsewhere, e.g. at llm_stub_server.py.
+        return os.getenv(f'{self.publisher}_BASE_URL') or urls.get(self.publisher, "")
     
     def generate(
         self,
@@ -53,24 +1012,428 @@ class LLMClient:
         temperature: float = 0, # next need to be 0
         top_p: float = 0.5, # 
         model: str = 'gpt-4o-mini',  
+        hedge: Optional[HedgePolicy] = None,
+        attempts: Optional[List[Dict[str, Any]]] = None,
         **kwargs
     ) -> str:
+        """Send one chat completion request.
+
+        With a `hedge` policy a slow request may be duplicated (see
+        HedgePolicy). `attempts`, if given, gets one entry per request that
+        was sent while hedging: publisher, model, latency and status 'won',
+        'lost' (answered after the winner), 'cancelled' or 'failed'.
+        """
+        if hedge is not None and not _in_event_loop():
+            return self._generate_hedged(
+                hedge, attempts, prompt_content=prompt_content, system_content=system_content,
+                temperature=temperature, top_p=top_p, model=model, **kwargs
+            )
+        messages = build_messages(prompt_content, system_content)
+        request = PreparedRequest(self.publisher, model, messages, temperature, top_p, kwargs)
+        cached = request.lookup()
+        if cached is not None:
+            return cached
+
+        request.begin()
         try:
+            request.acquire()
+            request.start()
             completion = self.client.chat.completions.create(
                 model=model,
-                messages=[
-                    {'role': 'system', 'content': system_content},
-                    {'role': 'user', 'content': prompt_content}
-                ],
+                messages=messages,
                 temperature=temperature,
                 top_p=top_p,
                 **kwargs
             )
-            return completion
-        except Exception as e:
-            raise RuntimeError(f"Error generating response from {self.publisher}: {str(e)}")
-        
-openai_client = LLMClient(publisher='OPENAI')
-perplexity_client = LLMClient(publisher='PERPLEXITY')
-alibaba_client = LLMClient(publisher='ALIBABA')
-gemini_client = LLMClient(publisher='GEMINI')
\ No newline at end of file
+        except BaseException as e:
+            raise request.failed(e)
+        request.succeeded()
+        request.store(completion)
+        return completion
+
+    def _generate_hedged(self, hedge: HedgePolicy, attempts: Optional[List[Dict[str, Any]]], model: str, **request):
+        """generate() that duplicates the request once it is slower than the hedge percentile.
+
+        Both requests run as AsyncLLMClient tasks on the shared run_async()
+        loop, so they reuse its pooled connections and the loser can really be
+        cancelled.
+        """
+        hedge.count_request()
+        delay = hedge.hedge_delay(self.publisher, model)
+        sent = []  # [task, publisher, model, started, finished]
+        winner = []
+
+        def send(client, publisher, target_model):
+            record = [asyncio.ensure_future(client.generate(model=target_model, **request)),
+                      publisher, target_model, time.monotonic(), None]
+            record[0].add_done_callback(lambda _: record.__setitem__(4, time.monotonic()))
+            sent.append(record)
+            return record[0]
+
+        async def run():
+            primary = AsyncLLMClient(self.publisher, self.api_key, self.base_url)
+            pending = {send(primary, self.publisher, model)}
+            if delay is not None:
+                done, pending = await asyncio.wait(pending, timeout=delay)
+                if not done and hedge.try_hedge():
+                    publisher, hedge_model = hedge.hedge_target(self.publisher, model)
+                    client = primary if publisher == self.publisher else AsyncLLMClient(publisher)
+                    print(f"LLM request to {self.publisher}/{model} slower than {delay:.1f}s, "
+                          f"hedging with {publisher}/{hedge_model}")
+                    pending.add(send(client, publisher, hedge_model))
+                pending |= done
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    # Both may finish in the same round; the first to finish wins
+                    finished_at = {record[0]: record[4] or time.monotonic() for record in sent}
+                    task = min(succeeded, key=finished_at.get)
+                    for loser in pending:
+                        loser.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    winner.append(task)
+                    return task.result()
+                error = next(task.exception() for task in done)
+            raise error
+
+        try:
+            return run_async(run())
+        finally:
+            if attempts is not None and len(sent) > 1:
+                for task, publisher, target_model, started, finished in sent:
+                    if task in winner:
+                        status = 'won'
+                    elif task.cancelled():
+                        status = 'cancelled'
+                    elif task.done() and task.exception() is None:
+                        status = 'lost'  # answered too, just after the winner
+                    else:
+                        status = 'failed'
+                    attempts.append({'publisher': publisher, 'model': target_model, 'status': status,
+                                     'latency': (finished or time.monotonic()) - started})
+
+    def generate_many(self, requests: List[Dict[str, Any]], max_in_flight: Optional[int] = None, **defaults) -> List[Any]:
+        """Run many generate() calls concurrently from synchronous code.
+
+        Each request is a dict of generate() arguments; `defaults` fill in the
+        rest. Returns one completion per request in input order, or the
+        exception for requests that failed. Not for use inside a running event
+        loop; use AsyncLLMClient there. The connection pool is kept for later
+        calls (see run_async()).
+        """
+        async_client = AsyncLLMClient(self.publisher, self.api_key, self.base_url, max_in_flight)
+        return run_async(async_client.generate_many(requests, **defaults))
+
+
+    def generate_stream(
+        self,
+        prompt_content: str,
+        system_content: str = '你是一個傻瓜Agent',
+        temperature: float = 0,
+        top_p: float = 0.5,
+        model: str = 'gpt-4o-mini',
+        **kwargs
+    ) -> CompletionStream:
+        """Like generate(), but returns a CompletionStream that yields text deltas as they arrive.
+
+        Nothing is sent until the stream is iterated. Usage totals are asked
+        for with stream_options (pass stream_options=None for providers that
+        reject it). A cached response comes back as a single delta.
+        """
+        messages = build_messages(prompt_content, system_content)
+        kwargs.setdefault('stream_options', {'include_usage': True})
+        if kwargs['stream_options'] is None:
+            del kwargs['stream_options']
+        stream = CompletionStream(self.publisher, model)
+        stream._deltas = self._stream_deltas(stream, messages, model, temperature, top_p, kwargs)
+        return stream
+
+    def _stream_deltas(self, stream: CompletionStream, messages: List[Dict[str, str]], model: str,
+                       temperature: float, top_p: float, kwargs: Dict[str, Any]):
+        request = PreparedRequest(self.publisher, model, messages, temperature, top_p, kwargs)
+        cached = request.lookup()
+        if cached is not None:
+            content = stream.replay(cached)
+            if content:
+                yield content
+            return
+
+        request.begin()
+        try:
+            request.acquire()
+            stream._started = request.start()
+            chunks = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                top_p=top_p,
+                stream=True,
+                **kwargs
+            )
+            for chunk in chunks:
+                delta = stream.add_chunk(chunk)
+                if delta:
+                    yield delta
+        except BaseException as e:
+            # Also reached when the caller stops iterating early
+            raise request.failed(e)
+        request.succeeded()
+        request.store(stream.finish())
+
+    def generate_batch(self, requests: Dict[str, Dict[str, Any]], state_dir: str,
+                       poll_interval: float = 30, **defaults) -> Dict[str, Any]:
+        """Run many requests as one provider batch job (OpenAI-compatible /v1/batches).
+
+        `requests` maps a custom id to generate() arguments; `defaults` fill in
+        the rest. The requests are written to <state_dir>/requests.jsonl and
+        submitted, and the job is polled every `poll_interval` seconds until it
+        ends. The job id is kept in <state_dir>/batch.json, so a rerun with the
+        same requests picks up the running job instead of paying twice.
+
+        Returns {custom_id: completion}, with an exception in place of
+        requests that failed. Cached responses are used and new ones stored,
+        as generate() does; batch jobs do not count against the rate limits.
+        """
+        from openai.types.chat import ChatCompletion
+
+        if self.publisher not in BATCH_PUBLISHERS:
+            raise ValueError(f"{self.publisher} has no batch endpoint. Use one of {', '.join(sorted(BATCH_PUBLISHERS))}")
+
+        cache = get_response_cache()
+        results, bodies, cache_keys = {}, {}, {}
+        for custom_id, request in requests.items():
+            request = {**defaults, **request}
+            messages = build_messages(request.pop('prompt_content'), request.pop('system_content', '你是一個傻瓜Agent'))
+            body = request_body(request.pop('model', 'gpt-4o-mini'), messages,
+                                request.pop('temperature', 0), request.pop('top_p', 0.5), **request)
+            if cache is not None:
+                options = {name: value for name, value in body.items() if name not in ('model', 'messages')}
+                cache_keys[custom_id] = ResponseCache.make_key(self.publisher, body['model'], messages, options)
+                cached = cache.get(cache_keys[custom_id])
+                if cached is not None:
+                    results[custom_id] = cached
+                    continue
+            bodies[custom_id] = body
+        if not bodies:
+            return results
+
+        os.makedirs(state_dir, exist_ok=True)
+        input_path = os.path.join(state_dir, 'requests.jsonl')
+        state_path = os.path.join(state_dir, 'batch.json')
+        lines = [
+            json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': body},
+                       ensure_ascii=False, default=str)
+            for custom_id, body in bodies.items()
+        ]
+        input_hash = hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+        batch = None
+        if os.path.exists(state_path):
+            with open(state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('input_hash') == input_hash:
+                batch = self.client.batches.retrieve(state['batch_id'])
+                if batch.status in ('failed', 'expired', 'cancelled'):
+                    batch = None
+                else:
+                    print(f"Resuming {self.publisher} batch {batch.id} ({batch.status})")
+        if batch is None:
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            with open(input_path, 'rb') as f:
+                input_file = self.client.files.create(file=f, purpose='batch')
+            batch = self.client.batches.create(
+                input_file_id=input_file.id, endpoint=BATCH_ENDPOINT, completion_window='24h'
+            )
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump({'batch_id': batch.id, 'input_hash': input_hash}, f)
+            print(f"Submitted {len(lines)} requests to {self.publisher} as batch {batch.id}")
+
+        while batch.status not in BATCH_FINAL_STATES:
+            counts = batch.request_counts
+            progress = f" {counts.completed}/{counts.total}" if counts else ""
+            print(f"Batch {batch.id}: {batch.status}{progress}", flush=True)
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        if batch.status != 'completed':
+            raise BatchFailed(f"{self.publisher} batch {batch.id} ended {batch.status}: {batch.errors}")
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                custom_id = record.get('custom_id')
+                if custom_id not in bodies:
+                    continue
+                response = record.get('response') or {}
+                if record.get('error') or response.get('status_code', 200) >= 400:
+                    error = record.get('error') or response.get('body')
+                    results[custom_id] = RuntimeError(f"Error generating response from {self.publisher}: {error}")
+                    continue
+                completion = ChatCompletion.model_validate(response['body'])
+                results[custom_id] = completion
+                if cache is not None:
+                    cache.put(cache_keys[custom_id], completion)
+        for custom_id in bodies:
+            results.setdefault(custom_id, RuntimeError(f"No result for {custom_id} in {self.publisher} batch {batch.id}"))
+        return results
+
+
+class AsyncLLMClient(LLMClient):
+    """Async counterpart of LLMClient.
+
+    Clients of the same provider with the same `max_in_flight` share one
+    pooled HTTP client, and at most `max_in_flight` of their requests run at a
+    time (per event loop). A client with another limit gets its own pool, so
+    it never waits on a semaphore sized by someone else. The synchronous
+    paths inherited from LLMClient (`client`, generate_batch()) still work.
+    """
+
+    def __init__(self, publisher: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 max_in_flight: Optional[int] = None):
+        super().__init__(publisher, api_key, base_url)
+        self.max_in_flight = max_in_flight or get_max_in_flight(self.publisher)
+
+    def _pool(self):
+        pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+        key = (self.publisher, self.base_url, self.api_key, self.max_in_flight)
+        if key not in pools:
+            from openai import AsyncOpenAI
+
+            client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=300)
+            pools[key] = (client, asyncio.Semaphore(self.max_in_flight))
+        return pools[key]
+
+    async def generate(
+        self,
+        prompt_content: str,
+        system_content: str = '你是一個傻瓜Agent',
+        temperature: float = 0,
+        top_p: float = 0.5,
+        model: str = 'gpt-4o-mini',
+        **kwargs
+    ):
+        messages = build_messages(prompt_content, system_content)
+        request = PreparedRequest(self.publisher, model, messages, temperature, top_p, kwargs)
+        cached = request.lookup()
+        if cached is not None:
+            return cached
+
+        client, in_flight = self._pool()
+        async with in_flight:
+            request.begin()
+            try:
+                if request.rate_limiter is not None:
+                    await asyncio.to_thread(request.acquire)
+                request.start()
+                completion = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    top_p=top_p,
+                    **kwargs
+                )
+            except BaseException as e:
+                raise request.failed(e)
+            request.succeeded()
+        await asyncio.to_thread(request.store, completion)
+        return completion
+
+    def generate_stream(
+        self,
+        prompt_content: str,
+        system_content: str = '你是一個傻瓜Agent',
+        temperature: float = 0,
+        top_p: float = 0.5,
+        model: str = 'gpt-4o-mini',
+        **kwargs
+    ) -> CompletionStream:
+        """Async variant of LLMClient.generate_stream(); use `async for delta in stream`."""
+        messages = build_messages(prompt_content, system_content)
+        kwargs.setdefault('stream_options', {'include_usage': True})
+        if kwargs['stream_options'] is None:
+            del kwargs['stream_options']
+        stream = CompletionStream(self.publisher, model)
+        stream._deltas = self._stream_deltas(stream, messages, model, temperature, top_p, kwargs)
+        return stream
+
+    async def _stream_deltas(self, stream: CompletionStream, messages: List[Dict[str, str]], model: str,
+                             temperature: float, top_p: float, kwargs: Dict[str, Any]):
+        request = PreparedRequest(self.publisher, model, messages, temperature, top_p, kwargs)
+        cached = request.lookup()
+        if cached is not None:
+            content = stream.replay(cached)
+            if content:
+                yield content
+            return
+
+        client, in_flight = self._pool()
+        async with in_flight:
+            request.begin()
+            try:
+                if request.rate_limiter is not None:
+                    await asyncio.to_thread(request.acquire)
+                stream._started = request.start()
+                chunks = await client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    top_p=top_p,
+                    stream=True,
+                    **kwargs
+                )
+                async for chunk in chunks:
+                    delta = stream.add_chunk(chunk)
+                    if delta:
+                        yield delta
+            except BaseException as e:
+                # Also reached when the caller stops iterating early
+                raise request.failed(e)
+            request.succeeded()
+        await asyncio.to_thread(request.store, stream.finish())
+
+    async def generate_many(self, requests: List[Dict[str, Any]], **defaults) -> List[Any]:
+        """Send all requests concurrently; results in input order, exceptions in place of failures."""
+        async def run(request):
+            try:
+                return await self.generate(**{**defaults, **request})
+            except Exception as e:
+                return e
+
+        return await asyncio.gather(*(run(request) for request in requests))
+
+
+
+# One LLMClient per publisher and process, built the first time a stage asks
+# for it. A missing API key only fails the stages that use that provider.
+_clients: Dict[str, LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(publisher: str) -> LLMClient:
+    """Return this process's shared LLMClient for `publisher`, creating it on first use."""
+    publisher = publisher.upper()
+    with _clients_lock:
+        if publisher not in _clients:
+            _clients[publisher] = LLMClient(publisher=publisher)
+        return _clients[publisher]
+
+
+# The module-level names older code imports (`from llm_client import alibaba_client`).
+_CLIENT_ALIASES = {
+    'openai_client': 'OPENAI',
+    'perplexity_client': 'PERPLEXITY',
+    'alibaba_client': 'ALIBABA',
+    'gemini_client': 'GEMINI',
+}
+
+
+def __getattr__(name: str):
+    if name in _CLIENT_ALIASES:
+        return get_client(_CLIENT_ALIASES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
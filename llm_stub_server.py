@@ -0,0 +1,337 @@
+"""A local stand-in for an OpenAI-compatible LLM provider.
+
+    python llm_stub_server.py --port 8765 --content '{"summary": "", "events": []}'
+    ALIBABA_BASE_URL=http://127.0.0.1:8765/v1 python card/event/process.py --date 2025-06-21 --batch
+
+It answers /v1/chat/completions with a fixed message and implements enough of
+/v1/files and /v1/batches for LLMClient.generate_batch(): a batch completes
+`--batch-delay` seconds after it was created, with one answer per request.
+Nothing leaves the machine and no API key is checked.
+
+To replay real traffic, record it first with LLM_RECORD_CASSETTE=<file> (see
+llm_client.CassetteRecorder), then serve it:
+
+    python llm_stub_server.py --cassette data/pipeline/cassettes/2025-06-21.jsonl \
+        --replay-latency --error-rate 0.02
+
+Requests are matched by llm_client.request_hash() of their body. --latency,
+--replay-latency and --error-rate add synthetic delay and 429/5xx errors to
+chat completions for load tests.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_client import load_cassette, request_hash
+
+
+def completion_body(model: str, content: str, messages: list) -> Dict[str, Any]:
+    prompt_tokens = sum(len(str(message.get('content', ''))) for message in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        'id': f'chatcmpl-{uuid.uuid4().hex}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'logprobs': None,
+            'message': {'role': 'assistant', 'content': content},
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        },
+    }
+
+
+STREAM_WORDS_PER_CHUNK = 3
+
+
+class StubState:
+    """Recorded responses, uploaded files and batch jobs, kept in memory."""
+
+    def __init__(self, content: str, batch_delay: float, cassette: Optional[Dict[str, Dict[str, Any]]] = None,
+                 on_miss: str = 'content', latency: float = 0.0, latency_jitter: float = 0.0,
+                 replay_latency: bool = False, latency_scale: float = 1.0,
+                 error_rate: float = 0.0, error_status: int = 503):
+        self.content = content
+        self.batch_delay = batch_delay
+        self.cassette = cassette or {}
+        self.on_miss = on_miss
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.replay_latency = replay_latency
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'errors': 0}
+        self.lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] += 1
+
+    def delay_for(self, entry: Optional[Dict[str, Any]]) -> float:
+        delay = self.latency + random.uniform(0, self.latency_jitter)
+        if self.replay_latency and entry is not None:
+            delay += entry.get('latency', 0.0) * self.latency_scale
+        return delay
+
+    def complete(self, request: Dict[str, Any]) -> tuple:
+        """(HTTP status, JSON body) for one chat completion request, after the synthetic delay."""
+        self.count('requests')
+        entry = self.cassette.get(request_hash(request))
+        time.sleep(self.delay_for(entry))
+        if self.error_rate and random.random() < self.error_rate:
+            self.count('errors')
+            return self.error_status, {'error': {
+                'message': f'Injected error {self.error_status} (service unavailable)',
+                'type': 'server_error' if self.error_status >= 500 else 'rate_limit_error',
+            }}
+        if entry is not None:
+            self.count('hits')
+            return 200, entry['response']
+        self.count('misses')
+        if self.on_miss == 'error' and self.cassette:
+            return 404, {'error': {'message': 'Request not in cassette', 'type': 'invalid_request_error'}}
+        return 200, completion_body(request.get('model', ''), self.content, request.get('messages', []))
+
+    def add_file(self, data: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        file_id = f'file-{uuid.uuid4().hex}'
+        meta = {
+            'id': file_id,
+            'object': 'file',
+            'bytes': len(data),
+            'created_at': int(time.time()),
+            'filename': filename,
+            'purpose': purpose,
+            'status': 'processed',
+        }
+        with self.lock:
+            self.files[file_id] = {'meta': meta, 'data': data}
+        return meta
+
+    def create_batch(self, input_file_id: str, endpoint: str, completion_window: str) -> Dict[str, Any]:
+        with self.lock:
+            lines = [line for line in self.files[input_file_id]['data'].decode('utf-8').splitlines() if line.strip()]
+        batch = {
+            'id': f'batch_{uuid.uuid4().hex}',
+            'object': 'batch',
+            'endpoint': endpoint,
+            'input_file_id': input_file_id,
+            'completion_window': completion_window,
+            'status': 'in_progress',
+            'created_at': int(time.time()),
+            'output_file_id': None,
+            'error_file_id': None,
+            'request_counts': {'total': len(lines), 'completed': 0, 'failed': 0},
+        }
+        with self.lock:
+            self.batches[batch['id']] = batch
+        return batch
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        if batch['status'] == 'in_progress' and time.time() - batch['created_at'] >= self.batch_delay:
+            self._complete(batch)
+        return batch
+
+    def _complete(self, batch: Dict[str, Any]) -> None:
+        with self.lock:
+            lines = self.files[batch['input_file_id']]['data'].decode('utf-8').splitlines()
+        output = []
+        for line in lines:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request['body']
+            entry = self.cassette.get(request_hash(body))
+            output.append(json.dumps({
+                'id': f'batch_req_{uuid.uuid4().hex}',
+                'custom_id': request['custom_id'],
+                'response': {
+                    'status_code': 200,
+                    'request_id': uuid.uuid4().hex,
+                    'body': entry['response'] if entry else
+                    completion_body(body.get('model', ''), self.content, body.get('messages', [])),
+                },
+                'error': None,
+            }))
+        output_file = self.add_file(('\n'.join(output) + '\n').encode('utf-8'), 'batch_output.jsonl', 'batch_output')
+        with self.lock:
+            batch['output_file_id'] = output_file['id']
+            batch['status'] = 'completed'
+            batch['completed_at'] = int(time.time())
+            batch['request_counts']['completed'] = len(output)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    state: StubState = None
+
+    def _route(self) -> str:
+        # Accept both http://host/v1/... and deeper base URLs such as /compatible-mode/v1/...
+        path = self.path.split('?', 1)[0]
+        return path[path.index('/v1/') + 3:] if '/v1/' in path else path
+
+    def _send_json(self, data: Any, status: int = 200) -> None:
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, completion: Dict[str, Any], include_usage: bool) -> None:
+        """Send a completion as server-sent chat.completion.chunk events, a few words per chunk."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        def send(chunk: Dict[str, Any]) -> None:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        choice = completion['choices'][0]
+        content = choice['message'].get('content') or ''
+        words = content.split(' ')
+        pieces = [' '.join(words[i:i + STREAM_WORDS_PER_CHUNK]) for i in range(0, len(words), STREAM_WORDS_PER_CHUNK)]
+        base = {'id': completion['id'], 'object': 'chat.completion.chunk',
+                'created': completion['created'], 'model': completion['model']}
+        for i, piece in enumerate(pieces):
+            text = piece if i == 0 else ' ' + piece
+            delta = {'role': 'assistant', 'content': text} if i == 0 else {'content': text}
+            send({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})
+        send({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': choice.get('finish_reason') or 'stop'}]})
+        if include_usage and completion.get('usage'):
+            send({**base, 'choices': [], 'usage': completion['usage']})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_not_found(self) -> None:
+        self._send_json({'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}}, 404)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_POST(self) -> None:
+        route = self._route()
+        if route == '/chat/completions':
+            request = json.loads(self._body())
+            status, body = self.state.complete(request)
+            if status == 200 and request.get('stream'):
+                include_usage = bool((request.get('stream_options') or {}).get('include_usage'))
+                self._send_stream(body, include_usage)
+            else:
+                self._send_json(body, status)
+        elif route == '/files':
+            header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8')
+            message = BytesParser(policy=HTTP).parsebytes(header + self._body())
+            fields = {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+            file_part = fields['file']
+            purpose = fields['purpose'].get_payload(decode=True).decode('utf-8')
+            self._send_json(self.state.add_file(
+                file_part.get_payload(decode=True), file_part.get_filename() or 'upload.jsonl', purpose
+            ))
+        elif route == '/batches':
+            request = json.loads(self._body())
+            self._send_json(self.state.create_batch(
+                request['input_file_id'], request['endpoint'], request.get('completion_window', '24h')
+            ))
+        else:
+            self._send_not_found()
+
+    def do_GET(self) -> None:
+        route = self._route()
+        parts = route.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'batches':
+            batch = self.state.get_batch(parts[1])
+            self._send_json(batch) if batch else self._send_not_found()
+        elif len(parts) == 3 and parts[0] == 'files' and parts[2] == 'content' and parts[1] in self.state.files:
+            data = self.state.files[parts[1]]['data']
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_not_found()
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def make_server(host: str = '127.0.0.1', port: int = 8765, content: str = '{}', batch_delay: float = 1.0,
+                cassettes: Optional[List[str]] = None, **options) -> ThreadingHTTPServer:
+    """Build a stub server; call serve_forever() on it (e.g. in a thread) and shutdown() when done.
+
+    `options` are StubState's latency, error and on_miss settings.
+    """
+    cassette = {}
+    for path in cassettes or []:
+        cassette.update(load_cassette(path))
+    state = StubState(content, batch_delay, cassette=cassette, **options)
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.state = state
+    return server
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for an OpenAI-compatible LLM API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--content', default='{}', help='Message content every completion returns')
+    parser.add_argument('--batch-delay', type=float, default=1.0, help='Seconds until a batch job completes')
+    parser.add_argument('--cassette', action='append', default=[],
+                        help='Replay responses recorded with LLM_RECORD_CASSETTE (repeatable)')
+    parser.add_argument('--on-miss', choices=['content', 'error'], default='content',
+                        help="Answer requests missing from the cassettes with --content or a 404 (default: content)")
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every completion')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Up to this many extra random seconds')
+    parser.add_argument('--replay-latency', action='store_true', help='Also wait as long as the recorded request took')
+    parser.add_argument('--latency-scale', type=float, default=1.0, help='Multiplier for --replay-latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of completions answered with an error')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of injected errors (e.g. 429)')
+    args = parser.parse_args(argv)
+
+    server = make_server(
+        args.host, args.port, args.content, args.batch_delay, cassettes=args.cassette,
+        on_miss=args.on_miss, latency=args.latency, latency_jitter=args.latency_jitter,
+        replay_latency=args.replay_latency, latency_scale=args.latency_scale,
+        error_rate=args.error_rate, error_status=args.error_status,
+    )
+    print(f"LLM stub server on http://{args.host}:{server.server_address[1]}/v1 "
+          f"({len(server.state.cassette)} recorded responses)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.state.stats
+        print(f"{stats['requests']} requests: {stats['hits']} replayed, {stats['misses']} not recorded, "
+              f"{stats['errors']} injected errors")
+
+
+if __name__ == '__main__':
+    main()
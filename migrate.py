@@ -93,7 +93,7 @@ def copy_single_file(source_file, dest_file, file_type):
         return 0
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Migrate files from data/output to apps/static directories"
     )
@@ -108,7 +108,7 @@ def main():
         help="Show what would be copied without actually copying files"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Validate date format
     if not validate_date(args.date):
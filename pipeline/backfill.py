@@ -0,0 +1,201 @@
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+BACKFILL_DIR = ROOT_DIR / "data" / "pipeline" / "backfill"
+RATE_LIMIT_DB = ROOT_DIR / "data" / "pipeline" / "llm_rate_limit.sqlite"
+
+# These steps write to paths without a date in them (deployment/summary/resource,
+# data/output/knowledge_graph), so parallel dates would overwrite each other.
+# A backfill runs them once, for the last date, after every date has finished.
+SHARED_OUTPUT_STEPS = ["summary", "knowledge-graph"]
+
+
+def parse_date_range(raw_range: str) -> list[str]:
+    start_text, separator, end_text = raw_range.partition(":")
+    if not separator:
+        raise ValueError("--date-range must look like START:END, e.g. 2025-06-01:2025-06-14")
+    start = datetime.strptime(start_text.strip(), "%Y-%m-%d")
+    end = datetime.strptime(end_text.strip(), "%Y-%m-%d")
+    if end < start:
+        raise ValueError(f"--date-range end {end_text} is before start {start_text}")
+    return [
+        (start + timedelta(days=offset)).strftime("%Y-%m-%d")
+        for offset in range((end - start).days + 1)
+    ]
+
+
+def run_date(
+    date: str,
+    steps: list[str],
+    jobs: int,
+    forced: set[str],
+    log_path: str,
+    mode: str = "subprocess",
+) -> dict:
+    """Run one date's pipeline in a worker process, with its output in its own log file.
+
+    In inprocess mode the worker keeps the stage modules it loaded, so the
+    dates it picks up later reuse the warm models.
+    """
+    try:
+        from pipeline.run import run_pipeline
+    except ModuleNotFoundError:
+        from run import run_pipeline
+
+    started = time.monotonic()
+    record = {"date": date, "log": log_path}
+
+    log_file_path = ROOT_DIR / log_path
+    log_file_path.parent.mkdir(parents=True, exist_ok=True)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = os.dup(1), os.dup(2)
+    with open(log_file_path, "a", encoding="utf-8") as log_file:
+        # Redirect the file descriptors, not just sys.stdout, so the stage
+        # subprocesses write into the log as well.
+        os.dup2(log_file.fileno(), 1)
+        os.dup2(log_file.fileno(), 2)
+        try:
+            record["tasks"] = run_pipeline(date=date, steps=steps, jobs=jobs, forced=forced, mode=mode)
+            record["status"] = "success"
+        except Exception as e:
+            traceback.print_exc()
+            record["status"] = "failed"
+            record["error"] = str(e)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_fds[0], 1)
+            os.dup2(saved_fds[1], 2)
+            os.close(saved_fds[0])
+            os.close(saved_fds[1])
+
+    record["duration_seconds"] = round(time.monotonic() - started, 1)
+    return record
+
+
+def run_backfill(
+    dates: list[str],
+    steps: list[str],
+    parallel_dates: int = 1,
+    jobs: int = 1,
+    forced: Optional[set[str]] = None,
+    rate_limits: Optional[str] = None,
+    mode: str = "subprocess",
+) -> dict:
+    """Run the pipeline for every date, `parallel_dates` dates at a time.
+
+    All workers share llm_client's token buckets in LLM_RATE_LIMIT_DB, so more
+    parallel dates do not mean more requests or tokens per minute per provider.
+    """
+    try:
+        from pipeline.run import run_pipeline
+    except ModuleNotFoundError:
+        from run import run_pipeline
+
+    forced = forced or set()
+    per_date_steps = [step for step in steps if step not in SHARED_OUTPUT_STEPS]
+    shared_steps = [step for step in steps if step in SHARED_OUTPUT_STEPS]
+
+    RATE_LIMIT_DB.parent.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("LLM_RATE_LIMIT_DB", str(RATE_LIMIT_DB))
+    if rate_limits:
+        os.environ["LLM_RATE_LIMITS"] = rate_limits
+
+    run_id = f"{dates[0]}_to_{dates[-1]}"
+    log_dir = BACKFILL_DIR / run_id
+    started_at = datetime.now().isoformat(timespec="seconds")
+    print(f"Backfill {dates[0]} to {dates[-1]}: {len(dates)} dates, {parallel_dates} at a time")
+    print(f"Per-date steps: {', '.join(per_date_steps)}")
+    print(f"Logs: {log_dir.relative_to(ROOT_DIR)}")
+
+    records = []
+    with ProcessPoolExecutor(max_workers=parallel_dates) as pool:
+        futures = {
+            pool.submit(
+                run_date,
+                date,
+                per_date_steps,
+                jobs,
+                forced,
+                str((log_dir / f"{date}.log").relative_to(ROOT_DIR)),
+                mode,
+            ): date
+            for date in dates
+        }
+        for future in as_completed(futures):
+            date = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {"date": date, "status": "failed", "error": f"worker crashed: {e}"}
+            records.append(record)
+            print(
+                f"[{len(records):>3}/{len(dates)}] {record['status']:<7} {date}"
+                + (f" in {record['duration_seconds']}s" if "duration_seconds" in record else "")
+                + (f": {record['error']}" if record.get("error") else ""),
+                flush=True,
+            )
+
+    records.sort(key=lambda record: record["date"])
+
+    if shared_steps:
+        if all(record["status"] == "success" for record in records):
+            print(f"\nShared-output steps for {dates[-1]}: {', '.join(shared_steps)}")
+            started = time.monotonic()
+            shared = {"date": dates[-1], "steps": shared_steps}
+            try:
+                shared["tasks"] = run_pipeline(
+                    date=dates[-1], steps=shared_steps, jobs=jobs, forced=forced, mode=mode
+                )
+                shared["status"] = "success"
+            except Exception as e:
+                shared["status"] = "failed"
+                shared["error"] = str(e)
+            shared["duration_seconds"] = round(time.monotonic() - started, 1)
+        else:
+            shared = {"date": dates[-1], "steps": shared_steps, "status": "not started"}
+    else:
+        shared = None
+
+    report = {
+        "start": dates[0],
+        "end": dates[-1],
+        "steps": steps,
+        "parallel_dates": parallel_dates,
+        "jobs": jobs,
+        "mode": mode,
+        "started_at": started_at,
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "dates": records,
+        "shared_steps": shared,
+    }
+    report_path = BACKFILL_DIR / f"{run_id}.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("\nBackfill status:")
+    for record in records:
+        duration = record.get("duration_seconds", "-")
+        print(f"  {record['date']}  {record['status']:<7}  {duration}s  {record.get('error', '')}")
+    if shared is not None:
+        print(f"  shared      {shared['status']:<7}  {', '.join(shared_steps)}  {shared.get('error', '')}")
+    print(f"Report saved to {report_path.relative_to(ROOT_DIR)}")
+    return report
+
+
+def backfill_succeeded(report: dict) -> bool:
+    shared = report["shared_steps"]
+    return all(record["status"] == "success" for record in report["dates"]) and (
+        shared is None or shared["status"] == "success"
+    )
@@ -0,0 +1,67 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from types import ModuleType
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+_stage_modules: dict[str, ModuleType] = {}
+_stage_modules_lock = threading.Lock()
+
+
+def load_stage(script: str) -> ModuleType:
+    """Import a stage script once per process and keep it.
+
+    Module-level work (library imports, NLTK downloads, the GLiNER model in
+    card/statement/process.py) then happens once for every step and date the
+    worker runs. The script's folder is put on sys.path, as `python script.py`
+    would do, so sibling imports such as `from tts import ...` keep working.
+    """
+    with _stage_modules_lock:
+        if script in _stage_modules:
+            return _stage_modules[script]
+
+        path = ROOT_DIR / script
+        script_dir = str(path.parent)
+        if script_dir not in sys.path:
+            sys.path.append(script_dir)
+
+        module_name = "pipeline_stage_" + script[:-3].replace("/", "_")
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+        _stage_modules[script] = module
+        return module
+
+
+def run_stage_in_process(command: list[str]) -> None:
+    """Run `python <script> <args...>` by calling the script's main(argv) directly.
+
+    A non-zero return value or SystemExit code fails the same way a failed
+    subprocess does.
+    """
+    script, argv = command[1], command[2:]
+    print(f"Calling: {script} main({' '.join(argv)})", flush=True)
+    # The stage scripts use paths relative to the project root.
+    os.chdir(ROOT_DIR)
+    module = load_stage(script)
+
+    try:
+        result = module.main(argv)
+    except SystemExit as e:
+        result = e.code
+
+    if result not in (None, 0):
+        if not isinstance(result, int):
+            print(result)
+            result = 1
+        raise subprocess.CalledProcessError(result, command)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from pipeline.scheduler import PipelineTask
+except ModuleNotFoundError:
+    from scheduler import PipelineTask
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+MANIFEST_DIR = ROOT_DIR / "data" / "pipeline" / "manifest"
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expand_patterns(patterns: tuple[str, ...], date: str) -> list[Path]:
+    """Resolve `{date}` glob patterns relative to the project root."""
+    paths = set()
+    for pattern in patterns:
+        paths.update(path for path in ROOT_DIR.glob(pattern.format(date=date)) if path.is_file())
+    return sorted(paths)
+
+
+def hash_patterns(patterns: tuple[str, ...], date: str) -> dict[str, str]:
+    return {
+        str(path.relative_to(ROOT_DIR)): hash_file(path)
+        for path in expand_patterns(patterns, date)
+    }
+
+
+def task_code_patterns(task: PipelineTask) -> tuple[str, ...]:
+    scripts = tuple(item for item in task.command if item.endswith(".py"))
+    return scripts + task.code
+
+
+def task_params(task: PipelineTask, command: list[str]) -> list[str]:
+    """The command line followed by NAME=value of each of the task's env variables that is set."""
+    return list(command) + [f"{name}={os.environ[name]}" for name in task.env if os.environ.get(name)]
+
+
+def compute_fingerprint(task: PipelineTask, date: str, command: list[str]) -> dict:
+    """Hash everything a task's result depends on: input files, parameters and code."""
+    fingerprint = {
+        "inputs": hash_patterns(task.inputs, date),
+        "params": task_params(task, command),
+        "code": hash_patterns(task_code_patterns(task), date),
+    }
+    canonical = json.dumps(fingerprint, sort_keys=True).encode("utf-8")
+    fingerprint["fingerprint"] = hashlib.sha256(canonical).hexdigest()
+    return fingerprint
+
+
+def manifest_path(date: str, task_name: str) -> Path:
+    return MANIFEST_DIR / date / f"{task_name}.json"
+
+
+def load_manifest(date: str, task_name: str) -> Optional[dict]:
+    path = manifest_path(date, task_name)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: Could not read manifest {path}: {e}")
+        return None
+
+
+def write_manifest(date: str, task: PipelineTask, fingerprint: dict) -> None:
+    """Record a successful run. Written after the task so in-place edits are captured."""
+    path = manifest_path(date, task.name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    manifest = {
+        "task": task.name,
+        "step": task.step,
+        "date": date,
+        "completed_at": datetime.now().isoformat(timespec="seconds"),
+        **fingerprint,
+    }
+    temp_path = path.with_suffix(".json.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    temp_path.replace(path)
+
+
+def diff_files(previous: dict[str, str], current: dict[str, str]) -> list[str]:
+    changes = []
+    for path in sorted(set(previous) | set(current)):
+        if path not in current:
+            changes.append(f"{path} removed")
+        elif path not in previous:
+            changes.append(f"{path} added")
+        elif previous[path] != current[path]:
+            changes.append(f"{path} changed")
+    return changes
+
+
+def rerun_reason(task: PipelineTask, date: str, command: list[str], forced: bool = False) -> Optional[str]:
+    """Return why a task has to run, or None when its last successful run is still valid."""
+    if forced:
+        return "forced"
+    if not task.inputs:
+        return "no declared inputs, always runs"
+
+    previous = load_manifest(date, task.name)
+    if previous is None:
+        return "no previous successful run"
+
+    missing_outputs = [pattern for pattern in task.outputs if not expand_patterns((pattern,), date)]
+    if missing_outputs:
+        return "missing output " + ", ".join(pattern.format(date=date) for pattern in missing_outputs)
+
+    current = compute_fingerprint(task, date, command)
+    if current["fingerprint"] == previous.get("fingerprint"):
+        return None
+
+    reasons = []
+    input_changes = diff_files(previous.get("inputs", {}), current["inputs"])
+    if input_changes:
+        reasons.append("inputs: " + ", ".join(input_changes))
+    if previous.get("params") != current["params"]:
+        reasons.append("parameters changed")
+    code_changes = diff_files(previous.get("code", {}), current["code"])
+    if code_changes:
+        reasons.append("code: " + ", ".join(code_changes))
+    return "; ".join(reasons) or "fingerprint changed"
@@ -1,43 +1,169 @@
 import argparse
+import os
 import subprocess
+import threading
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 
 try:
+    from pipeline.inprocess import run_stage_in_process
+    from pipeline.backfill import SHARED_OUTPUT_STEPS, backfill_succeeded, parse_date_range, run_backfill
+    from pipeline.manifest import compute_fingerprint, load_manifest, rerun_reason, write_manifest
     from pipeline.run_video import run_video_pipeline
+    from pipeline.scheduler import PipelineTask, run_graph, select_tasks
+    from pipeline.telemetry import InProcessUsage, RunTelemetry, wait_with_usage
 except ModuleNotFoundError:
+    from inprocess import run_stage_in_process
+    from backfill import SHARED_OUTPUT_STEPS, backfill_succeeded, parse_date_range, run_backfill
+    from manifest import compute_fingerprint, load_manifest, rerun_reason, write_manifest
     from run_video import run_video_pipeline
+    from scheduler import PipelineTask, run_graph, select_tasks
+    from telemetry import InProcessUsage, RunTelemetry, wait_with_usage
 
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
+LLM_CACHE_DB = ROOT_DIR / "data" / "pipeline" / "llm_cache.sqlite"
 
-PIPELINE_STEPS = {
-    "scrape": [
-        ["python", "scrapers/fundus/scraper.py", "--date"],
-        ["python", "scrapers/reddit/scraper.py"],
-    ],
-    "cards": [
-        ["python", "card/event/process.py", "--date"],
-        ["python", "card/statement/process.py", "--date"],
-    ],
-    "cluster": [
-        ["python", "cluster/group_content.py", "--date"],
-        ["python", "cluster/regroup_with_size_limits.py", "--date"],
-    ],
-    "generate": [
-        ["python", "generate_article/generate_article.py", "--date"],
-        ["python", "generate_article/gather_resource.py", "--date"],
-        ["python", "generate_article/category_arrange.py", "--date"],
-    ],
-    "audio": [
-        ["python", "deployment/audio/main.py", "--date"],
-    ],
-    "image": [
-        ["python", "deployment/image/main.py", "--date"],
-    ],
-    "summary": [
-        ["python", "deployment/summary/generate_summary.py", "--date"],
-        [
+FUNDUS_INPUTS = ("data/raw/fundus/*/{date}.csv",)
+CARD_INPUTS = (
+    "data/card/event_card/{date}.csv",
+    "data/card/statement_card/posts/{date}.csv",
+    "data/card/statement_card/comments/{date}.csv",
+    "data/card/event_card/articles/{date}.csv",
+)
+ARTICLE_INPUTS = ("data/output/article/{date}/group_*.json",)
+# Variables (set by this script's flags or by hand) that change what an LLM
+# stage writes, so a change reruns it instead of skipping it as up to date.
+LLM_ENV = ("LLM_CACHE_MODE", "LLM_FALLBACKS", "LLM_HEDGE_PERCENTILE", "LLM_HEDGE_MAX_FRACTION")
+
+# Declared in today's sequential order; `needs` lists the tasks whose outputs a
+# task reads, so independent tasks can run side by side with --jobs > 1.
+# Tasks without `inputs` (scrapers, non-dated outputs) are never skipped.
+PIPELINE_TASKS = [
+    PipelineTask(
+        "scrape-fundus",
+        "scrape",
+        ("python", "scrapers/fundus/scraper.py", "--date"),
+        # Its per-publisher timeout uses SIGALRM, which needs the main thread.
+        in_process=False,
+    ),
+    PipelineTask(
+        "scrape-reddit",
+        "scrape",
+        ("python", "scrapers/reddit/scraper.py"),
+    ),
+    PipelineTask(
+        "cards-event",
+        "cards",
+        ("python", "card/event/process.py", "--date"),
+        needs=("scrape-fundus",),
+        inputs=FUNDUS_INPUTS + (
+            "data/raw/trust_score/*.csv",
+            "classifier/fake_news/models/results/*.joblib",
+        ),
+        outputs=("data/card/event_card/{date}.csv", "data/card/event_card/articles/{date}.csv"),
+        code=(
+            "card/event/prompt.py",
+            "card/event/features.py",
+            "card/event/cards.py",
+            "card/event/trust_scores.py",
+            "card/event/publisher_index.py",
+            "card/event/near_duplicates.py",
+            "llm_client.py",
+            "classifier/fake_news/**/*.py",
+        ),
+        env=LLM_ENV + ("EVENT_CARD_BATCH", "EVENT_CARD_PACK_TOKENS", "EVENT_CARD_DEDUP_THRESHOLD"),
+    ),
+    PipelineTask(
+        "cards-statement",
+        "cards",
+        ("python", "card/statement/process.py", "--date"),
+        needs=("scrape-reddit",),
+        inputs=(
+            "data/raw/reddit/{date}/posts/*.csv",
+            "data/raw/reddit/{date}/comments/*.csv",
+            "classifier/fake_news/models/results/*.joblib",
+        ),
+        outputs=("data/card/statement_card/posts/{date}.csv",),
+        code=("card/statement/entities.py", "card/statement/geocode.py", "classifier/fake_news/**/*.py"),
+        env=("GEOCODE_GAZETTEER",),
+    ),
+    PipelineTask(
+        "cluster-group",
+        "cluster",
+        ("python", "cluster/group_content.py", "--date"),
+        needs=("cards-event", "cards-statement"),
+        inputs=CARD_INPUTS[:2] + FUNDUS_INPUTS,
+        outputs=("data/group/{date}/group_result.csv",),
+    ),
+    PipelineTask(
+        "cluster-regroup",
+        "cluster",
+        ("python", "cluster/regroup_with_size_limits.py", "--date"),
+        needs=("cluster-group",),
+        inputs=("data/group/{date}/group_result.csv",) + CARD_INPUTS[:2],
+        outputs=("data/group/{date}/group_result.csv",),
+        code=("cluster/group_content.py",),
+    ),
+    PipelineTask(
+        "generate-article",
+        "generate",
+        ("python", "generate_article/generate_article.py", "--date"),
+        needs=("cluster-regroup",),
+        inputs=("data/group/{date}/group_result.csv",) + CARD_INPUTS + FUNDUS_INPUTS,
+        outputs=ARTICLE_INPUTS,
+        code=("generate_article/prompt.py", "generate_article/config/*.py", "llm_client.py"),
+        env=LLM_ENV,
+    ),
+    PipelineTask(
+        "generate-resource",
+        "generate",
+        ("python", "generate_article/gather_resource.py", "--date"),
+        needs=("cluster-regroup",),
+        inputs=("data/group/{date}/group_result.csv",) + CARD_INPUTS + FUNDUS_INPUTS,
+        outputs=("data/output/resource/{date}/group_*.json",),
+    ),
+    PipelineTask(
+        "generate-category",
+        "generate",
+        ("python", "generate_article/category_arrange.py", "--date"),
+        needs=("generate-article",),
+        inputs=ARTICLE_INPUTS + ("classifier/category/models/best_models/*.joblib",),
+        outputs=("data/output/article/{date}/group_categories.json",),
+        code=("classifier/category/predict.py",),
+    ),
+    PipelineTask(
+        "audio",
+        "audio",
+        ("python", "deployment/audio/main.py", "--date"),
+        needs=("generate-article",),
+        inputs=ARTICLE_INPUTS,
+        outputs=("data/output/audio/{date}/group_*.mp3",),
+        code=("deployment/audio/tts.py",),
+    ),
+    PipelineTask(
+        "image",
+        "image",
+        ("python", "deployment/image/main.py", "--date"),
+        needs=("generate-article",),
+        inputs=ARTICLE_INPUTS,
+        outputs=("data/output/image/{date}/group_*.jpg",),
+        code=("deployment/image/sd.py",),
+    ),
+    # generate_summary.py reads every JSON file in the article folder,
+    # including group_categories.json. Both summary tasks write to a single
+    # non-dated folder, so they always run.
+    PipelineTask(
+        "summary-text",
+        "summary",
+        ("python", "deployment/summary/generate_summary.py", "--date"),
+        needs=("generate-article", "generate-category"),
+    ),
+    PipelineTask(
+        "summary-audio",
+        "summary",
+        (
             "python",
             "deployment/audio/tts.py",
             "--speech",
@@ -46,21 +172,53 @@ PIPELINE_STEPS = {
             "deployment/summary/resource/summary.mp3",
             "--voice",
             "us",
-        ],
-    ],
-    "migrate": [
-        ["python", "migrate.py", "--date"],
-    ],
-    "evaluate": [
-        ["python", "evaluate/evaluate.py", "--date"],
-    ],
-    "knowledge-graph": [
-        ["python", "data/output/generate_kg.py"],
-    ],
+        ),
+        needs=("summary-text",),
+    ),
+    PipelineTask(
+        "migrate",
+        "migrate",
+        ("python", "migrate.py", "--date"),
+        needs=(
+            "generate-article",
+            "generate-resource",
+            "generate-category",
+            "audio",
+            "image",
+            "summary-audio",
+        ),
+    ),
+    PipelineTask(
+        "evaluate",
+        "evaluate",
+        ("python", "evaluate/evaluate.py", "--date"),
+        needs=("generate-article", "generate-resource"),
+        inputs=ARTICLE_INPUTS + ("data/output/resource/{date}/group_*.json",),
+        outputs=("data/eval/{date}/eval.csv",),
+        code=("evaluate/prompt.py", "llm_client.py"),
+        env=LLM_ENV,
+    ),
+    PipelineTask(
+        "knowledge-graph",
+        "knowledge-graph",
+        ("python", "data/output/generate_kg.py"),
+        needs=("generate-article", "generate-resource"),
+        inputs=("data/output/article/*/group_*.json", "data/output/resource/*/group_*.json"),
+        outputs=("data/output/knowledge_graph/knowledge_graph.xlsx",),
+        in_process=False,
+    ),
+]
+
+PIPELINE_STEPS = {
+    task.step: [list(other.command) for other in PIPELINE_TASKS if other.step == task.step]
+    for task in PIPELINE_TASKS
 }
 
 DEFAULT_STEPS = ["scrape", "cards", "cluster", "generate", "audio", "image", "summary"]
 
+_running_processes: set[subprocess.Popen] = set()
+_running_processes_lock = threading.Lock()
+
 
 def expand_command(command: list[str], date: str) -> list[str]:
     expanded = []
@@ -71,10 +229,53 @@ def expand_command(command: list[str], date: str) -> list[str]:
     return expanded
 
 
-def run_command(command: list[str]) -> None:
+def run_command(command: list[str], prefix: Optional[str] = None, usage: Optional[dict] = None) -> None:
+    """Run one command from the project root.
+
+    With a prefix, the command's output is captured and every line is tagged
+    with it, so parallel tasks stay readable. If `usage` is given it is filled
+    with the command's exit code, CPU time, peak RSS and bytes read/written.
+    """
     command_text = " ".join(command)
-    print(f"Running: {command_text}")
-    subprocess.run(command, cwd=ROOT_DIR, check=True)
+    print(f"Running: {command_text}", flush=True)
+    if prefix is None:
+        process = subprocess.Popen(command, cwd=ROOT_DIR)
+    else:
+        process = subprocess.Popen(
+            command,
+            cwd=ROOT_DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+
+    with _running_processes_lock:
+        _running_processes.add(process)
+    try:
+        if prefix is not None:
+            for line in process.stdout:
+                print(f"[{prefix}] {line}", end="", flush=True)
+        process_usage = wait_with_usage(process)
+        returncode = process_usage["exit_code"]
+        if usage is not None:
+            usage.update(process_usage)
+    finally:
+        with _running_processes_lock:
+            _running_processes.discard(process)
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+def terminate_running_commands() -> None:
+    with _running_processes_lock:
+        processes = list(_running_processes)
+    for process in processes:
+        if process.poll() is None:
+            print(f"Stopping: {' '.join(process.args)}", flush=True)
+            process.terminate()
 
 
 def parse_steps(raw_steps: str) -> list[str]:
@@ -95,20 +296,103 @@ def parse_steps(raw_steps: str) -> list[str]:
     return steps
 
 
-def run_pipeline(date: str, steps: list[str], include_video: bool = False) -> None:
+def parse_force(raw_force: list[str]) -> set[str]:
+    """Expand --force values (step names, task names or 'all') into task names."""
+    names = [name.strip() for value in raw_force for name in value.split(",") if name.strip()]
+    if "all" in names:
+        return {task.name for task in PIPELINE_TASKS}
+
+    forced = set()
+    for name in names:
+        matches = [task.name for task in PIPELINE_TASKS if name in (task.step, task.name)]
+        if not matches:
+            available = dict.fromkeys([*PIPELINE_STEPS, *(task.name for task in PIPELINE_TASKS)])
+            raise ValueError(
+                f"Unknown step or task for --force: {name}. Available: " + ", ".join(available)
+            )
+        forced.update(matches)
+    return forced
+
+
+def explain_pipeline(date: str, tasks: list[PipelineTask], forced: set[str]) -> None:
+    """Print whether each task would run and why, without running anything."""
+    print(f"Explain plan for {date}:")
+    will_run = set()
+    for task in tasks:
+        command = expand_command(list(task.command), date)
+        reason = rerun_reason(task, date, command, forced=task.name in forced)
+        if reason is None:
+            upstream = [name for name in task.needs if name in will_run]
+            if upstream:
+                reason = "upstream " + ", ".join(upstream) + " will run, inputs may change"
+        if reason is None:
+            completed_at = load_manifest(date, task.name).get("completed_at", "unknown")
+            print(f"  skip  {task.name}: up to date (last successful run {completed_at})")
+        else:
+            will_run.add(task.name)
+            print(f"  run   {task.name}: {reason}")
+
+
+def run_pipeline(
+    date: str,
+    steps: list[str],
+    include_video: bool = False,
+    jobs: int = 1,
+    forced: Optional[set[str]] = None,
+    explain: bool = False,
+    mode: str = "subprocess",
+) -> dict[str, str]:
+    forced = forced or set()
+    tasks = select_tasks(PIPELINE_TASKS, steps)
+    if explain:
+        explain_pipeline(date, tasks, forced)
+        return {}
+
     print(f"Process date: {date}")
     print(f"Pipeline steps: {', '.join(steps)}")
+    print(f"Parallel jobs: {jobs}")
+    print(f"Mode: {mode}")
+    telemetry = RunTelemetry(date, steps, jobs, mode)
+
+    def run_task(task: PipelineTask) -> Optional[str]:
+        command = expand_command(list(task.command), date)
+        reason = rerun_reason(task, date, command, forced=task.name in forced)
+        if reason is None:
+            print(f"Skipping {task.name}: inputs, parameters and code unchanged since last run")
+            telemetry.skipped(task.name, task.step)
+            return "skipped"
+
+        print(f"Task {task.name} will run: {reason}")
+        in_process = mode == "inprocess" and task.in_process
+        record = telemetry.start(task.name, task.step, command, "inprocess" if in_process else "subprocess")
+        usage = {}
+        try:
+            if in_process:
+                with InProcessUsage() as measured:
+                    usage = measured.usage
+                    run_stage_in_process(command)
+            else:
+                run_command(command, prefix=task.name if jobs > 1 else None, usage=usage)
+        except BaseException:
+            telemetry.finish_task(record, "failed", usage)
+            raise
+        telemetry.finish_task(record, "done", usage)
+        if task.inputs:
+            write_manifest(date, task, compute_fingerprint(task, date, command))
+        return None
 
-    for step in steps:
-        print(f"\nStep: {step}")
-        for command in PIPELINE_STEPS[step]:
-            run_command(expand_command(command, date))
+    try:
+        states = run_graph(tasks, run_task, jobs=jobs, on_abort=terminate_running_commands)
+    finally:
+        telemetry.finish()
 
     if include_video:
         print("\nStep: video")
         run_video_pipeline(date=date)
+        states["video"] = "done"
 
     print(f"\nPipeline completed at {datetime.now().isoformat(timespec='seconds')}")
+    return states
 
 
 def parse_args() -> argparse.Namespace:
@@ -128,13 +412,179 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Run the optional Wav2Lip video pipeline after the selected steps.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Maximum number of tasks to run at the same time. Tasks start as soon as "
+            "the tasks they depend on finish. The default of 1 keeps the sequential order."
+        ),
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        help=(
+            "Rerun a step or task even if its inputs, parameters and code are unchanged "
+            "since its last successful run. Repeat or comma-separate; 'all' forces everything."
+        ),
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print which tasks would run or be skipped, and why, then exit.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["subprocess", "inprocess"],
+        default="subprocess",
+        help=(
+            "'subprocess' starts a new Python process per task. 'inprocess' calls each "
+            "stage's main() in the runner, so imports and models load once and stay warm "
+            "across steps and backfill dates."
+        ),
+    )
+    parser.add_argument(
+        "--date-range",
+        help=(
+            "Backfill every date from START to END inclusive, e.g. 2025-06-01:2025-06-14. "
+            "Overrides --date. The "
+            + " and ".join(SHARED_OUTPUT_STEPS)
+            + " steps run once, for the last date."
+        ),
+    )
+    parser.add_argument(
+        "--parallel-dates",
+        type=int,
+        default=1,
+        help="Number of dates a --date-range backfill runs at the same time, each in its own process.",
+    )
+    parser.add_argument(
+        "--llm-rate-limits",
+        help=(
+            "LLM rate limits shared by every stage and backfill worker, as "
+            "PUBLISHER[/MODEL]=REQUESTS_PER_MINUTE[:TOKENS_PER_MINUTE], e.g. "
+            "ALIBABA=60:1000000,GEMINI/gemini-2.5-pro=5. Overrides llm_client.DEFAULT_RATE_LIMITS."
+        ),
+    )
+    parser.add_argument(
+        "--llm-fallbacks",
+        help=(
+            "Providers to try when one fails or its circuit breaker is open, as "
+            "PUBLISHER/MODEL=PUBLISHER/MODEL>PUBLISHER/MODEL, e.g. "
+            "ALIBABA/qwen-plus=GEMINI/gemini-2.0-flash. Sets LLM_FALLBACKS."
+        ),
+    )
+    parser.add_argument(
+        "--llm-hedge-percentile",
+        type=float,
+        help=(
+            "Send a duplicate of an article-generation LLM call that is slower than this percentile "
+            "of recent calls (e.g. 95) and keep the first answer. At most LLM_HEDGE_MAX_FRACTION "
+            "(default 5%%) of calls are hedged. Sets LLM_HEDGE_PERCENTILE."
+        ),
+    )
+    parser.add_argument(
+        "--event-card-batch",
+        action="store_true",
+        help=(
+            "Send the event-card prompts as one provider batch job instead of one request per "
+            "article: cheaper and not rate limited, but it can take hours. Sets EVENT_CARD_BATCH."
+        ),
+    )
+    parser.add_argument(
+        "--event-card-pack-tokens",
+        type=int,
+        help=(
+            "Pack short articles into shared event-card requests of up to this many prompt tokens "
+            "(e.g. 6000), cutting per-request overhead; articles whose part of the answer does not "
+            "parse are retried alone. Sets EVENT_CARD_PACK_TOKENS."
+        ),
+    )
+    parser.add_argument(
+        "--event-card-dedup-threshold",
+        type=float,
+        help=(
+            "Shingle Jaccard similarity at which fundus articles count as near-duplicates (syndicated "
+            "copies) and share one event-card LLM call (default 0.8; 0 turns it off). "
+            "Sets EVENT_CARD_DEDUP_THRESHOLD."
+        ),
+    )
+    parser.add_argument(
+        "--llm-record",
+        metavar="CASSETTE",
+        help=(
+            "Append every LLM request and response of the run to this JSONL cassette, for "
+            "llm_stub_server.py --cassette to replay offline. Sets LLM_RECORD_CASSETTE."
+        ),
+    )
+    parser.add_argument(
+        "--llm-cache",
+        choices=["off", "readwrite", "readonly", "replay"],
+        default="off",
+        help=(
+            "Cache LLM responses on disk (LLM_CACHE_DB, default data/pipeline/llm_cache.sqlite) so "
+            "reruns with identical prompts are free. 'readonly' never writes; 'replay' fails on a miss "
+            "instead of calling the provider."
+        ),
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     args = parse_args()
     steps = parse_steps(args.steps)
-    run_pipeline(date=args.date, steps=steps, include_video=args.include_video)
+    forced = parse_force(args.force)
+    if args.llm_cache != "off":
+        # Stage processes inherit these and llm_client picks them up.
+        os.environ.setdefault("LLM_CACHE_DB", str(LLM_CACHE_DB))
+        os.environ["LLM_CACHE_MODE"] = args.llm_cache
+    if args.llm_rate_limits:
+        os.environ["LLM_RATE_LIMITS"] = args.llm_rate_limits
+    if args.llm_fallbacks:
+        os.environ["LLM_FALLBACKS"] = args.llm_fallbacks
+    if args.llm_record:
+        os.environ["LLM_RECORD_CASSETTE"] = str(Path(args.llm_record).resolve())
+    if args.event_card_batch:
+        os.environ["EVENT_CARD_BATCH"] = "1"
+    if args.event_card_pack_tokens:
+        os.environ["EVENT_CARD_PACK_TOKENS"] = str(args.event_card_pack_tokens)
+    if args.event_card_dedup_threshold is not None:
+        os.environ["EVENT_CARD_DEDUP_THRESHOLD"] = str(args.event_card_dedup_threshold)
+    if args.llm_hedge_percentile:
+        os.environ["LLM_HEDGE_PERCENTILE"] = str(args.llm_hedge_percentile)
+
+    if args.date_range:
+        if args.include_video:
+            raise ValueError("--include-video is not supported with --date-range")
+        dates = parse_date_range(args.date_range)
+        if args.explain:
+            for date in dates:
+                run_pipeline(date=date, steps=steps, forced=forced, explain=True)
+            return
+        report = run_backfill(
+            dates,
+            steps,
+            parallel_dates=args.parallel_dates,
+            jobs=args.jobs,
+            forced=forced,
+            rate_limits=args.llm_rate_limits,
+            mode=args.mode,
+        )
+        if not backfill_succeeded(report):
+            raise SystemExit(1)
+        return
+
+    run_pipeline(
+        date=args.date,
+        steps=steps,
+        include_video=args.include_video,
+        jobs=args.jobs,
+        forced=forced,
+        explain=args.explain,
+        mode=args.mode,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+
+
+@dataclass(frozen=True)
+class PipelineTask:
+    name: str
+    step: str
+    command: tuple[str, ...]
+    needs: tuple[str, ...] = ()
+    # Glob patterns relative to the project root; `{date}` is filled in.
+    inputs: tuple[str, ...] = ()
+    outputs: tuple[str, ...] = ()
+    code: tuple[str, ...] = ()
+    # Environment variables that change the task's output (run.py's flags set
+    # several); their values count as parameters, like the command line.
+    env: tuple[str, ...] = ()
+    # Whether --mode inprocess may call the script's main(argv) in the runner
+    # process instead of starting a new Python interpreter.
+    in_process: bool = True
+
+
+def select_tasks(tasks: list[PipelineTask], steps: list[str]) -> list[PipelineTask]:
+    """Keep the tasks of the selected steps, in step order.
+
+    Dependencies on tasks outside the selection are dropped: their outputs are
+    expected to exist from an earlier run.
+    """
+    selected = [task for step in steps for task in tasks if task.step == step]
+    selected_names = {task.name for task in selected}
+    return [
+        replace(task, needs=tuple(name for name in task.needs if name in selected_names))
+        for task in selected
+    ]
+
+
+def validate_graph(tasks: list[PipelineTask]) -> None:
+    names = [task.name for task in tasks]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError("Duplicate pipeline task(s): " + ", ".join(duplicates))
+
+    known = set(names)
+    for task in tasks:
+        unknown = [name for name in task.needs if name not in known]
+        if unknown:
+            raise ValueError(f"Task '{task.name}' depends on unknown task(s): " + ", ".join(unknown))
+
+    done: set[str] = set()
+    remaining = list(tasks)
+    while remaining:
+        ready = [task for task in remaining if set(task.needs) <= done]
+        if not ready:
+            raise ValueError(
+                "Dependency cycle between pipeline tasks: "
+                + ", ".join(task.name for task in remaining)
+            )
+        for task in ready:
+            done.add(task.name)
+            remaining.remove(task)
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def run_graph(
+    tasks: list[PipelineTask],
+    run_task: Callable[[PipelineTask], Optional[str]],
+    jobs: int = 1,
+    on_abort: Optional[Callable[[], None]] = None,
+    heartbeat: float = 30.0,
+) -> dict[str, str]:
+    """Run tasks as soon as their dependencies finish, at most `jobs` at a time.
+
+    Ready tasks are started in list order, so `jobs=1` runs the list exactly in
+    order. `run_task` may return a short state such as "skipped"; the final
+    state of every finished task is returned.
+    On the first failure no new task is started, `on_abort` is called to stop
+    the running ones and the original exception is re-raised.
+    """
+    if jobs < 1:
+        raise ValueError("jobs must be at least 1")
+    validate_graph(tasks)
+
+    total = len(tasks)
+    pending = list(tasks)
+    done: set[str] = set()
+    states: dict[str, str] = {}
+    running = {}
+    failure: Optional[BaseException] = None
+
+    def log(state: str, message: str) -> None:
+        print(f"[{len(done):>2}/{total}] {state:<7} {message}", flush=True)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            if failure is None:
+                for task in [task for task in pending if set(task.needs) <= done]:
+                    if len(running) >= jobs:
+                        break
+                    pending.remove(task)
+                    log("start", task.name)
+                    running[pool.submit(run_task, task)] = (task, time.monotonic())
+
+            if not running:
+                break
+
+            finished, _ = wait(running, timeout=heartbeat, return_when=FIRST_COMPLETED)
+            if not finished:
+                now = time.monotonic()
+                log(
+                    "running",
+                    ", ".join(
+                        f"{task.name} ({format_duration(now - started)})"
+                        for task, started in running.values()
+                    ),
+                )
+                continue
+
+            for future in finished:
+                task, started = running.pop(future)
+                elapsed = format_duration(time.monotonic() - started)
+                error = future.exception()
+                if error is None:
+                    done.add(task.name)
+                    states[task.name] = future.result() or "done"
+                    log(states[task.name], f"{task.name} in {elapsed}")
+                    continue
+
+                states[task.name] = "failed"
+                log("failed", f"{task.name} after {elapsed}: {error}")
+                if failure is None:
+                    failure = error
+                    if on_abort is not None:
+                        on_abort()
+
+    if failure is not None:
+        if pending:
+            print("Not started: " + ", ".join(task.name for task in pending))
+        raise failure
+    return states
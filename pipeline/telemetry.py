@@ -0,0 +1,295 @@
+import fcntl
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+TELEMETRY_DIR = ROOT_DIR / "data" / "pipeline" / "telemetry"
+# Last successful measurement of every task, used as the regression baseline.
+BASELINE_PATH = TELEMETRY_DIR / "latest.json"
+# Held while latest.json is read, merged and replaced, so pipelines running
+# side by side (--date-range) do not drop each other's baselines.
+BASELINE_LOCK_PATH = TELEMETRY_DIR / "latest.json.lock"
+
+# A task is flagged when it is this much slower / larger than its previous
+# run, and the difference is above the absolute floor (to ignore noise on
+# tasks that take a second).
+REGRESSION_RATIO = 1.25
+MIN_WALL_REGRESSION_SECONDS = 5.0
+MIN_RSS_REGRESSION_MB = 100.0
+
+
+@contextmanager
+def baseline_lock():
+    """Hold an exclusive lock on the baseline file across processes."""
+    TELEMETRY_DIR.mkdir(parents=True, exist_ok=True)
+    with open(BASELINE_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_baseline() -> dict:
+    if not BASELINE_PATH.exists():
+        return {}
+    with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_proc_io(pid: str = "self") -> dict[str, int]:
+    """Bytes read and written through syscalls, from /proc/<pid>/io (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/io", "r", encoding="utf-8") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines() if ": " in line)
+    except OSError:
+        return {}
+    return {"read_bytes": int(fields["rchar"]), "written_bytes": int(fields["wchar"])}
+
+
+def wait_with_usage(process: subprocess.Popen) -> dict:
+    """Wait for a child process and return its resource usage.
+
+    The child is first waited for without being reaped, so its /proc io
+    counters are still readable, then reaped with wait4 for CPU time and peak
+    RSS. Both include any processes the child started and waited for.
+    """
+    usage = {}
+    try:
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        usage.update(read_proc_io(str(process.pid)))
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped elsewhere (e.g. poll() while stopping on failure).
+        process.wait()
+        usage["exit_code"] = process.returncode
+        return usage
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    usage["exit_code"] = process.returncode
+    usage["cpu_seconds"] = round(rusage.ru_utime + rusage.ru_stime, 3)
+    # ru_maxrss is in kilobytes on Linux.
+    usage["peak_rss_mb"] = round(rusage.ru_maxrss / 1024, 1)
+    return usage
+
+
+class InProcessUsage:
+    """Resource usage of a stage run inside the runner process.
+
+    CPU time is the calling thread's. Peak RSS is the runner's peak so far and
+    I/O is process-wide, so with --jobs > 1 they include concurrent tasks.
+    """
+
+    def __enter__(self) -> "InProcessUsage":
+        self.usage = {}
+        self._cpu = time.thread_time()
+        self._io = read_proc_io()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.usage["cpu_seconds"] = round(time.thread_time() - self._cpu, 3)
+        self.usage["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        io = read_proc_io()
+        for key in io:
+            self.usage[key] = io[key] - self._io.get(key, 0)
+        if exc_type is None:
+            self.usage["exit_code"] = 0
+        elif isinstance(exc, subprocess.CalledProcessError):
+            self.usage["exit_code"] = exc.returncode
+        else:
+            self.usage["exit_code"] = 1
+
+
+def format_bytes(count: Optional[int]) -> str:
+    if count is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if count < 1024 or unit == "GB":
+            return f"{count:.0f}{unit}" if unit == "B" else f"{count:.1f}{unit}"
+        count /= 1024
+
+
+def find_regressions(record: dict, previous: Optional[dict]) -> list[str]:
+    if not previous:
+        return []
+    regressions = []
+    checks = (
+        ("wall_seconds", "wall time", MIN_WALL_REGRESSION_SECONDS, "s"),
+        ("peak_rss_mb", "peak RSS", MIN_RSS_REGRESSION_MB, "MB"),
+    )
+    for key, label, floor, unit in checks:
+        before, after = previous.get(key), record.get(key)
+        if before is None or after is None:
+            continue
+        if after > before * REGRESSION_RATIO and after - before > floor:
+            regressions.append(f"{label} {before}{unit} -> {after}{unit}")
+    return regressions
+
+
+class RunTelemetry:
+    """Collects per-task measurements for one pipeline run.
+
+    finish() writes data/pipeline/telemetry/<date>/<run id>.json and a
+    .trace.json next to it that opens in chrome://tracing or ui.perfetto.dev.
+    """
+
+    def __init__(self, date: str, steps: list[str], jobs: int, mode: str):
+        self.date = date
+        self.steps = steps
+        self.jobs = jobs
+        self.mode = mode
+        self.started_at = datetime.now()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._lanes: dict[int, int] = {}
+        self.records: list[dict] = []
+
+    def _lane(self) -> int:
+        # One trace row per scheduler worker thread.
+        thread_id = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(thread_id, len(self._lanes) + 1)
+
+    def start(self, task_name: str, step: str, command: list[str], mode: str) -> dict:
+        return {
+            "task": task_name,
+            "step": step,
+            "command": " ".join(command),
+            "mode": mode,
+            "lane": self._lane(),
+            "start_seconds": round(time.monotonic() - self._started, 3),
+            "status": "running",
+        }
+
+    def finish_task(self, record: dict, status: str, usage: Optional[dict] = None) -> None:
+        end = time.monotonic() - self._started
+        record["wall_seconds"] = round(end - record["start_seconds"], 3)
+        record["status"] = status
+        record.update(usage or {})
+        with self._lock:
+            self.records.append(record)
+
+    def skipped(self, task_name: str, step: str) -> None:
+        with self._lock:
+            self.records.append({"task": task_name, "step": step, "status": "skipped"})
+
+    def finish(self) -> Optional[Path]:
+        measured = [record for record in self.records if "wall_seconds" in record]
+        if not measured:
+            return None
+
+        with baseline_lock():
+            baseline = load_baseline()
+
+        for record in measured:
+            previous = baseline.get(record["task"])
+            record["regressions"] = find_regressions(record, previous)
+            if previous:
+                record["previous"] = {
+                    "date": previous.get("date"),
+                    "wall_seconds": previous.get("wall_seconds"),
+                    "peak_rss_mb": previous.get("peak_rss_mb"),
+                }
+
+        run_id = self.started_at.strftime("%Y%m%dT%H%M%S")
+        output_dir = TELEMETRY_DIR / self.date
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = output_dir / f"{run_id}.json"
+        trace_path = output_dir / f"{run_id}.trace.json"
+
+        report = {
+            "date": self.date,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "steps": self.steps,
+            "jobs": self.jobs,
+            "mode": self.mode,
+            "wall_seconds": round(time.monotonic() - self._started, 3),
+            "tasks": sorted(self.records, key=lambda record: record.get("start_seconds", -1)),
+        }
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(measured), f)
+
+        # Re-read under the lock: other pipelines may have updated it since.
+        with baseline_lock():
+            baseline = load_baseline()
+            for record in measured:
+                if record["status"] == "done":
+                    baseline[record["task"]] = {
+                        "date": self.date,
+                        "run": run_id,
+                        "wall_seconds": record["wall_seconds"],
+                        "cpu_seconds": record.get("cpu_seconds"),
+                        "peak_rss_mb": record.get("peak_rss_mb"),
+                    }
+            tmp_path = BASELINE_PATH.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, BASELINE_PATH)
+
+        self.print_summary(measured)
+        print(f"Telemetry: {report_path.relative_to(ROOT_DIR)}")
+        print(f"Timeline:  {trace_path.relative_to(ROOT_DIR)} (open in ui.perfetto.dev)")
+        return report_path
+
+    def chrome_trace(self, measured: list[dict]) -> dict:
+        events = [
+            {"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"pipeline {self.date}"}},
+        ]
+        for lane in sorted({record["lane"] for record in measured}):
+            events.append(
+                {"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": f"worker {lane}"}}
+            )
+        for record in measured:
+            events.append(
+                {
+                    "name": record["task"],
+                    "cat": record["step"],
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": record["lane"],
+                    "ts": int(record["start_seconds"] * 1_000_000),
+                    "dur": int(record["wall_seconds"] * 1_000_000),
+                    "args": {
+                        key: record[key]
+                        for key in (
+                            "command", "mode", "status", "exit_code", "cpu_seconds",
+                            "peak_rss_mb", "read_bytes", "written_bytes", "regressions",
+                        )
+                        if key in record
+                    },
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def print_summary(self, measured: list[dict]) -> None:
+        print("\nTask resources:")
+        print(f"  {'task':<18} {'status':<7} {'wall':>9} {'cpu':>9} {'peak rss':>10} {'read':>9} {'written':>9}")
+        for record in measured:
+            cpu = record.get("cpu_seconds")
+            rss = record.get("peak_rss_mb")
+            print(
+                f"  {record['task']:<18} {record['status']:<7} "
+                f"{record['wall_seconds']:>8.1f}s "
+                f"{(f'{cpu:.1f}s' if cpu is not None else '-'):>9} "
+                f"{(f'{rss:.0f}MB' if rss is not None else '-'):>10} "
+                f"{format_bytes(record.get('read_bytes')):>9} "
+                f"{format_bytes(record.get('written_bytes')):>9}"
+            )
+
+        regressed = [record for record in measured if record["regressions"]]
+        if regressed:
+            print("\nRegressions vs previous run:")
+            for record in regressed:
+                previous_date = record["previous"].get("date")
+                print(f"  {record['task']} (previous run {previous_date}): " + "; ".join(record["regressions"]))
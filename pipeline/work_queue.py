@@ -0,0 +1,369 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+QUEUE_DIR = ROOT_DIR / "data" / "pipeline" / "queue"
+
+DEFAULT_LEASE_SECONDS = 600.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    queue TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_token TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (queue, key)
+)
+"""
+
+
+def queue_path(stage: str, name: str) -> Path:
+    """data/pipeline/queue/<stage>/<name>.sqlite, e.g. ("generate_article", "2025-06-14")."""
+    return QUEUE_DIR / stage / f"{name}.sqlite"
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def temp_path_for(path: Union[str, Path]) -> Path:
+    """A hidden per-process sibling of `path` with the same extension.
+
+    Write there and os.replace() it onto `path`, so readers (and globs such as
+    group_*.json) only ever see complete files, even with several writers.
+    """
+    path = Path(path)
+    return path.with_name(f".{path.stem}.{os.getpid()}.tmp{path.suffix}")
+
+
+def atomic_write_json(path: Union[str, Path], data: Any, **json_kwargs) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **json_kwargs)
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    key: str
+    payload: Any
+    attempts: int
+    lease_token: str
+
+
+class WorkQueue:
+    """A durable queue of work items in one SQLite file.
+
+    Items are leased by one worker at a time and acknowledged with their
+    result, so a crash or Ctrl-C resumes with only the unfinished items, and
+    several processes can drain the same queue. A lease that is not
+    acknowledged before it expires (the worker died) goes back to the queue;
+    after `max_attempts` leases the item is marked failed instead.
+
+    Results are stored with the item, so a stage builds its output from
+    results() once everything is done instead of keeping temp files.
+
+    The file may live on a directory shared by several machines as long as it
+    supports file locking; it uses SQLite's default rollback journal (WAL does
+    not work across hosts), and lease expiry assumes roughly synced clocks.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        name: str = "default",
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.path = Path(path)
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.owner = worker_id()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(SCHEMA)
+        self._release_dead_local_leases()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.isolation_level = None
+        return conn
+
+    def _release_dead_local_leases(self) -> None:
+        # Leases held by a process on this machine that no longer exists can
+        # go back to the queue right away instead of waiting for expiry.
+        host = socket.gethostname()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT key, lease_owner FROM items WHERE queue = ? AND status = 'leased'",
+                (self.name,),
+            ).fetchall()
+            for key, owner in rows:
+                owner_host, _, pid = (owner or "").rpartition(":")
+                if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+                    conn.execute(
+                        "UPDATE items SET status = 'pending', lease_owner = NULL, lease_token = NULL, "
+                        "lease_expires = NULL, attempts = MAX(attempts - 1, 0), updated_at = ? "
+                        "WHERE queue = ? AND key = ? AND status = 'leased' AND lease_owner = ?",
+                        (time.time(), self.name, key, owner),
+                    )
+
+    def counts(self) -> dict[str, int]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM items WHERE queue = ? GROUP BY status", (self.name,)
+            ).fetchall()
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def is_finished(self) -> bool:
+        counts = self.counts()
+        return counts["pending"] == 0 and counts["leased"] == 0
+
+    def clear(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM items WHERE queue = ?", (self.name,))
+
+    def enqueue(self, items: Iterable[tuple[str, Any]]) -> int:
+        """Add (key, payload) pairs; keys already in the queue are left as they are."""
+        added = 0
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) + 1 FROM items WHERE queue = ?", (self.name,)
+            ).fetchone()[0]
+            now = time.time()
+            for key, payload in items:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO items (queue, key, seq, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.name, str(key), seq, json.dumps(payload, default=str), now),
+                )
+                if cursor.rowcount:
+                    added += 1
+                    seq += 1
+            conn.execute("COMMIT")
+        return added
+
+    def retry_failed(self) -> int:
+        """Put failed items back to pending with fresh attempts; returns how many."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE items SET status = 'pending', attempts = 0, result = NULL, error = NULL, updated_at = ? "
+                "WHERE queue = ? AND status = 'failed'",
+                (time.time(), self.name),
+            )
+            return cursor.rowcount
+
+    def start(
+        self, items: Iterable[tuple[str, Any]], restart: bool = False, retry_failed: bool = False
+    ) -> dict[str, int]:
+        """Begin or resume a run over `items`.
+
+        Items already in the queue keep their state and result, finished or
+        not, so a rerun only works on the keys it has not seen before; only
+        `restart` clears the queue first. With `retry_failed` the failed items
+        of an earlier run go back to the queue as well, so a rerun keeps the
+        done results and only repeats the failures.
+        """
+        if restart:
+            self.clear()
+        elif retry_failed:
+            self.retry_failed()
+        self.enqueue(items)
+        counts = self.counts()
+        if counts["done"] or counts["failed"]:
+            print(
+                f"Resuming queue '{self.name}' ({self.path.name}): "
+                f"{counts['done']} done, {counts['failed']} failed, "
+                f"{counts['pending'] + counts['leased']} left"
+            )
+        return counts
+
+    def lease(self) -> Optional[WorkItem]:
+        """Take the next pending item (or one whose lease expired), or None when nothing is left."""
+        with closing(self._connect()) as conn:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                row = conn.execute(
+                    "SELECT key, payload, attempts FROM items WHERE queue = ? AND "
+                    "(status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+                    "ORDER BY seq LIMIT 1",
+                    (self.name, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+
+                key, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE items SET status = 'failed', error = ?, lease_owner = NULL, "
+                        "lease_token = NULL, lease_expires = NULL, updated_at = ? WHERE queue = ? AND key = ?",
+                        (f"lease expired {attempts} times without an ack", now, self.name, key),
+                    )
+                    conn.execute("COMMIT")
+                    continue
+
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE items SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_token = ?, lease_expires = ?, updated_at = ? WHERE queue = ? AND key = ?",
+                    (self.owner, token, now + self.lease_seconds, now, self.name, key),
+                )
+                conn.execute("COMMIT")
+                return WorkItem(key, json.loads(payload), attempts + 1, token)
+
+    def _finish(self, item: WorkItem, status: str, result: Any = None, error: Optional[str] = None) -> bool:
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE items SET status = ?, result = ?, error = ?, lease_owner = NULL, lease_token = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE queue = ? AND key = ? AND lease_token = ?",
+                (
+                    status,
+                    None if result is None else json.dumps(result, default=str),
+                    error,
+                    time.time(),
+                    self.name,
+                    item.key,
+                    item.lease_token,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def ack(self, item: WorkItem, result: Any = None) -> bool:
+        """Mark the item done with its result. False if the lease was lost to another worker."""
+        return self._finish(item, "done", result=result)
+
+    def fail(self, item: WorkItem, error: str, result: Any = None) -> bool:
+        """Mark the item failed; it is not retried until the queue is restarted."""
+        return self._finish(item, "failed", result=result, error=error)
+
+    def release(self, item: WorkItem) -> bool:
+        """Give the item back to the queue without counting the attempt (e.g. on Ctrl-C)."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE items SET status = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                "lease_token = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE queue = ? AND key = ? AND lease_token = ?",
+                (time.time(), self.name, item.key, item.lease_token),
+            )
+            return cursor.rowcount == 1
+
+    def heartbeat(self, item: WorkItem) -> bool:
+        """Extend the item's lease. False if the lease already expired and was taken."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE items SET lease_expires = ?, updated_at = ? "
+                "WHERE queue = ? AND key = ? AND lease_token = ? AND status = 'leased'",
+                (time.time() + self.lease_seconds, time.time(), self.name, item.key, item.lease_token),
+            )
+            return cursor.rowcount == 1
+
+    @contextmanager
+    def keep_alive(self, item: WorkItem):
+        """Renew the item's lease in the background while the block runs."""
+        stop = threading.Event()
+
+        def renew() -> None:
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.heartbeat(item):
+                    print(f"Lease on item {item.key} in queue '{self.name}' was lost")
+                    return
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def results(self, status: str = "done") -> Iterator[tuple[str, Any]]:
+        """(key, result) of finished items in the order they were enqueued."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT key, result FROM items WHERE queue = ? AND status = ? ORDER BY seq",
+                (self.name, status),
+            ).fetchall()
+        for key, result in rows:
+            yield key, None if result is None else json.loads(result)
+
+    def process(self, handler: Callable[[WorkItem], Any], workers: int = 1) -> int:
+        """Lease and handle items until none are left; returns how many this worker handled.
+
+        The handler's return value is stored as the result. The lease is renewed
+        while the handler runs. An exception marks the item failed and moves on;
+        Ctrl-C puts the current item back and stops.
+
+        With workers > 1 that many threads lease and handle items side by side,
+        for handlers that mostly wait (e.g. on LLM requests). results() keeps
+        the enqueue order either way. On Ctrl-C the threads finish the item
+        they are on and stop.
+        """
+        if workers <= 1:
+            return self._process_items(handler)
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._process_items, handler, stop) for _ in range(workers)]
+            try:
+                return sum(future.result() for future in futures)
+            except BaseException:
+                stop.set()
+                raise
+
+    def _process_items(self, handler: Callable[[WorkItem], Any], stop: Optional[threading.Event] = None) -> int:
+        handled = 0
+        while stop is None or not stop.is_set():
+            item = self.lease()
+            if item is None:
+                return handled
+            try:
+                with self.keep_alive(item):
+                    result = handler(item)
+            except Exception as e:
+                print(f"Item {item.key} in queue '{self.name}' failed: {e}")
+                self.fail(item, str(e))
+            except BaseException:
+                self.release(item)
+                raise
+            else:
+                if not self.ack(item, result):
+                    print(f"Lease on item {item.key} in queue '{self.name}' was lost, result discarded")
+            handled += 1
+        return handled
@@ -0,0 +1,213 @@
+"""Process one date's per-group stages together with other workers.
+
+Start the same command on every machine that shares the project's data/
+directory (or several times on one machine):
+
+    python pipeline/worker.py --date 2025-06-14 --stages article,resource,audio,image
+
+Each stage's groups are queued in data/pipeline/queue/worker/<date>.sqlite.
+A worker leases one group at a time, renews the lease while it works, and
+publishes the group's output with an atomic rename. Groups held by a worker
+that stops renewing (crashed machine) are picked up again after the lease
+expires. Stages run in order: a worker moves on only when every group of the
+current stage is finished, because e.g. audio reads the published articles.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+try:
+    from pipeline.inprocess import load_stage
+    from pipeline.work_queue import WorkQueue, atomic_write_json, queue_path, worker_id
+except ModuleNotFoundError:
+    from inprocess import load_stage
+    from work_queue import WorkQueue, atomic_write_json, queue_path, worker_id
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_LEASE_SECONDS = 120.0
+POLL_SECONDS = 5.0
+
+
+def group_result_ids(date: str) -> list[str]:
+    group_df = pd.read_csv(ROOT_DIR / f"data/group/{date}/group_result.csv")
+    return [str(group_id) for group_id in group_df["group_id"]]
+
+
+def article_ids(date: str) -> list[str]:
+    article_dir = ROOT_DIR / f"data/output/article/{date}"
+    return sorted(
+        path.stem.replace("group_", "")
+        for path in article_dir.glob("group_*.json")
+        if path.name != "group_categories.json"
+    )
+
+
+def run_article(date: str, group_id: str) -> None:
+    module = load_stage("generate_article/generate_article.py")
+    group_df = pd.read_csv(f"data/group/{date}/group_result.csv")
+    module.generate_group_article(date, int(group_id), group_df)
+
+
+def run_resource(date: str, group_id: str) -> None:
+    module = load_stage("generate_article/gather_resource.py")
+    group_df = pd.read_csv(f"data/group/{date}/group_result.csv")
+    row = group_df[group_df["group_id"] == int(group_id)].iloc[0]
+    content = module.gather_resources_for_group(int(group_id), row, date)
+    if content is None:
+        raise RuntimeError(f"failed to gather resources for group {group_id}")
+    atomic_write_json(
+        f"data/output/resource/{date}/group_{group_id}.json",
+        content,
+        indent=2,
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+_tts = None
+_image_generator = None
+
+
+def run_audio(date: str, group_id: str) -> None:
+    global _tts
+    module = load_stage("deployment/audio/main.py")
+    if _tts is None:
+        _tts = module.SimpleNewsTTS()
+    audio_dir = Path(f"data/output/audio/{date}")
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    json_file = Path(f"data/output/article/{date}/group_{group_id}.json")
+    asyncio.run(module.generate_group_audio(_tts, json_file, audio_dir))
+
+
+def run_image(date: str, group_id: str) -> None:
+    global _image_generator
+    module = load_stage("deployment/image/main.py")
+    if _image_generator is None:
+        _image_generator = module.StableDiffusionGenerator(api_url="http://127.0.0.1:7860")
+        if not _image_generator.check_api_connection():
+            _image_generator = None
+            raise RuntimeError("cannot connect to Stable Diffusion WebUI API at http://127.0.0.1:7860")
+    image_dir = f"data/output/image/{date}"
+    module.ensure_directory_exists(image_dir)
+    if not module.generate_group_image(
+        _image_generator, f"data/output/article/{date}", f"group_{group_id}.json", image_dir
+    ):
+        raise RuntimeError(f"image generation failed for group {group_id}")
+
+
+# stage -> (groups to queue, published output, run one group)
+GROUP_STAGES: dict[str, tuple[Callable[[str], list[str]], str, Callable[[str, str], None]]] = {
+    "article": (group_result_ids, "data/output/article/{date}/group_{group_id}.json", run_article),
+    "resource": (group_result_ids, "data/output/resource/{date}/group_{group_id}.json", run_resource),
+    "audio": (article_ids, "data/output/audio/{date}/group_{group_id}.mp3", run_audio),
+    "image": (article_ids, "data/output/image/{date}/group_{group_id}.jpg", run_image),
+}
+
+
+def parse_stages(raw_stages: str) -> list[str]:
+    stages = [stage.strip() for stage in raw_stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in GROUP_STAGES]
+    if unknown:
+        raise ValueError(
+            "Unknown per-group stage(s): " + ", ".join(unknown) + ". Available: " + ", ".join(GROUP_STAGES)
+        )
+    return stages
+
+
+def run_stage(date: str, stage: str, lease_seconds: float, restart: bool = False) -> dict[str, int]:
+    """Work on `stage` until all of its groups are done or failed, by any worker.
+
+    Groups that failed in an earlier run are retried; done groups are kept
+    unless `restart` clears the whole queue.
+    """
+    list_groups, output_pattern, run_group = GROUP_STAGES[stage]
+    queue = WorkQueue(queue_path("worker", date), name=stage, lease_seconds=lease_seconds)
+    if restart:
+        queue.clear()
+    else:
+        retried = queue.retry_failed()
+        if retried:
+            print(f"[{stage}] retrying {retried} failed group(s)", flush=True)
+    # Every worker enqueues the same groups; existing ones are left alone, so
+    # workers that join late do not reset the others' progress.
+    queue.enqueue((group_id, None) for group_id in list_groups(date))
+
+    def handle(item) -> dict:
+        output = ROOT_DIR / output_pattern.format(date=date, group_id=item.key)
+        if output.exists():
+            return {"worker": queue.owner, "skipped": "output exists"}
+        print(f"[{stage}] group {item.key} (attempt {item.attempts})", flush=True)
+        started = time.monotonic()
+        run_group(date, item.key)
+        return {"worker": queue.owner, "seconds": round(time.monotonic() - started, 1)}
+
+    handled = 0
+    while True:
+        handled += queue.process(handle)
+        if queue.is_finished():
+            break
+        counts = queue.counts()
+        print(f"[{stage}] waiting for {counts['leased']} group(s) leased by other workers", flush=True)
+        time.sleep(POLL_SECONDS)
+
+    counts = queue.counts()
+    print(
+        f"[{stage}] finished: {counts['done']} done, {counts['failed']} failed, "
+        f"{handled} handled by this worker",
+        flush=True,
+    )
+    return counts
+
+
+def run_worker(date: str, stages: list[str], lease_seconds: float, restart: bool = False) -> bool:
+    os.chdir(ROOT_DIR)
+    print(f"Worker {worker_id()} on {date}: {', '.join(stages)}")
+    failed = 0
+    for stage in stages:
+        failed += run_stage(date, stage, lease_seconds, restart=restart)["failed"]
+    return failed == 0
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Process per-group stages together with other workers.")
+    parser.add_argument("--date", required=True, help="Date in YYYY-MM-DD format")
+    parser.add_argument(
+        "--stages",
+        default="article,resource",
+        help="Comma-separated per-group stages, run in order. Available: " + ", ".join(GROUP_STAGES),
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=DEFAULT_LEASE_SECONDS,
+        help=(
+            "How long a group stays claimed without a heartbeat. Workers renew every third "
+            "of this; a crashed worker's groups are picked up again after it."
+        ),
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help=(
+            "Clear the stages' queues for this date first, done groups included (a plain rerun "
+            "only retries failed groups). Use on one worker before starting the others."
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    if not run_worker(args.date, parse_stages(args.stages), args.lease_seconds, restart=args.restart):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
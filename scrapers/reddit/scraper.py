@@ -16,8 +16,9 @@ Output:
     - data/raw/reddit/extract_date/comments/publish_date_time.csv
 
 Usage:
-    if there is unfortunate interruption, you can resume the scraping by using the --mode 1 argument.
-    python scrapers/reddit/scraper.py --mode 1
+    if there is unfortunate interruption, running the scraper again resumes where it stopped
+    (progress is kept in data/pipeline/queue/reddit/scraper.sqlite). To start over instead:
+    python scrapers/reddit/scraper.py --restart
 """
 
 SLEEP_TIME_LONG = 2
@@ -37,223 +38,162 @@ from tqdm import tqdm
 
 import praw
 
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(project_root)
+
+from pipeline.work_queue import WorkQueue, queue_path
+
+QUEUE_PATH = queue_path('reddit', 'scraper')
+
 def detect_language(text):
     try:
         return detect(text) if text else 'unknown'
     except:
         return 'unknown'
 
-# temp_comments is for resuming the scraping !
-def resume_scraping(reddit, max_comments):
-    if not (os.path.exists('temp_posts.csv') and os.path.exists('temp_comments.csv')):
-        return None, None, "No temporary files found to resume from"
-
-    try:
-        posts_df = pd.read_csv('temp_posts.csv')
-        posts_df['publish_time_utc'] = pd.to_datetime(posts_df['publish_time_utc'])
-        posts_df['publish_date_utc'] = posts_df['publish_time_utc'].dt.date
+def collect_posts(reddit, subreddit_name, max_posts):
+    posts = []
+    subreddit = reddit.subreddit(subreddit_name)
+    for post in subreddit.hot(limit=max_posts):
         
-        all_comments = pd.read_csv('temp_comments.csv')
+        time.sleep(SLEEP_TIME_LONG)
         
-        processed_post_ids = set(all_comments['post_id'].unique())
-        id_list = list(posts_df['post_id'])
-        date_list = list(posts_df['publish_date_utc'])
+        temp_time = datetime.fromtimestamp(post.created_utc)
+        author_name = post.author.name if post.author else "[deleted]"
+        author_id = getattr(post.author, 'id', None) if post.author else None
         
-        remaining_posts = [(i, post_id, date) for i, (post_id, date) in enumerate(zip(id_list, date_list)) 
-                          if post_id not in processed_post_ids]
+        try:
+            author_post_karma = post.author.link_karma if post.author else None
+        except:
+            author_post_karma = None
         
-        if not remaining_posts:
-            return posts_df, all_comments, "All posts have been processed"
-            
-        for i, post_id, temp_date in tqdm(remaining_posts, desc="Resuming comment collection"):
-            time.sleep(SLEEP_TIME_LONG) 
-            submission = reddit.submission(post_id)
-            all_comments_for_post = submission.comments.list()
-            
-            comments_data = []
-            for comment in all_comments_for_post[:max_comments]:
-                time.sleep(SLEEP_TIME_SHORT)
-                
-                author = comment.author
-                author_name = author.name if author else "[deleted]"
-                author_id = getattr(author, 'id', None) if author else None
-                
-                try:
-                    author_post_karma = comment.author.link_karma if comment.author else None
-                except:
-                    author_post_karma = None
-                try:
-                    author_comment_karma = comment.author.comment_karma if comment.author else None
-                except:
-                    author_comment_karma = None
-
-                if author_name and not author_post_karma:
-                    try:
-                        author_post_karma = reddit.redditor(author_name).link_karma
-                        author_comment_karma = reddit.redditor(author_name).comment_karma
-                    except:
-                        pass
-
-                comment_body = comment.body
-                media_links = []
-                if "http" in comment_body:
-                    media_links = re.findall(r'(https?://[^\s]+)', comment_body)
-
-                comments_data.append({
-                    "post_id": post_id,
-                    "comment_id": comment.id,
-                    "extract_time": datetime.now(timezone.utc).isoformat(),
-                    "comment_body": comment_body,
-                    "category": "",
-                    "language": detect_language(comment_body),
-                    "comment_created_utc": datetime.fromtimestamp(comment.created_utc).isoformat(),
-                    "comment_permalink": f"https://reddit.com{comment.permalink}",
-                    "media_links": media_links,
-                    "comment_ups": comment.ups,
-                    "comment_score": comment.score,
-                    "location": "",
-                    "commenter_name": author_name,
-                    "commenter_id": author_id,
-                    "commenter_post_karma": author_post_karma,
-                    "commenter_comment_karma": author_comment_karma,    
-                    "comment_parent_id": comment.parent_id,
-                    "publish_date_utc": temp_date
-                })
-            
-            df_comments = pd.DataFrame(comments_data)
-            all_comments = pd.concat([all_comments, df_comments], ignore_index=True)
-            all_comments.to_csv('temp_comments.csv', index=False)
+        try:
+            author_comment_karma = post.author.comment_karma if post.author else None
+        except:
+            author_comment_karma = None
         
-        return posts_df, all_comments, f"Successfully resumed scraping for {len(remaining_posts)} posts"
-    except Exception as e:
-        return None, None, f"Error during resume: {str(e)}"
-
-def get_reddit_data(subreddit_list, max_posts, max_comments, reddit, resume_mode=False):
-    if resume_mode:
-        posts_df, all_comments, message = resume_scraping(reddit, max_comments)
-        if posts_df is None:
-            print(message)
-            return message
-    else:
-        extract_time = datetime.now(timezone.utc)
-        extract_date = extract_time.strftime('%Y-%m-%d')
-        posts = []
-
-    if not resume_mode:
-        for item in tqdm(subreddit_list, desc=f"Collecting posts from Subreddits List, {max_posts} posts / subreddits"):
-            subreddit = reddit.subreddit(item)
-            for post in subreddit.hot(limit=max_posts):
-                
-                time.sleep(SLEEP_TIME_LONG)
-                
-                temp_time = datetime.fromtimestamp(post.created_utc)
-                author_name = post.author.name if post.author else "[deleted]"
-                author_id = getattr(post.author, 'id', None) if post.author else None
-                
-                try:
-                    author_post_karma = post.author.link_karma if post.author else None
-                except:
-                    author_post_karma = None
-                
-                try:
-                    author_comment_karma = post.author.comment_karma if post.author else None
-                except:
-                    author_comment_karma = None
-                
-                post_json = {
-                    'post_id': post.id,
-                    'extract_time': datetime.now(timezone.utc).isoformat(),
-                    'source': 'Reddit',
-                    'topic/subreddit': str(post.subreddit),
-                    'title': post.title,
-                    'content': post.selftext,
-                    'category': '',
-                    'language': detect_language(post.title + ' ' + post.selftext),
-                    'publish_time_utc': temp_time.isoformat(),
-                    'link': f"https://reddit.com{post.permalink}",
-                    'image/video': post.url,
-                    'ups': post.ups,
-                    'upvote_ratio': post.upvote_ratio,
-                    'score': post.score,
-                    'location': '',
-                    'num_comments': post.num_comments,
-                    'author_id': author_id,
-                    'author_name': author_name,
-                    'author_post_karma': author_post_karma,
-                    'author_comment_karma': author_comment_karma
-                }
-                posts.append(post_json)
+        post_json = {
+            'post_id': post.id,
+            'extract_time': datetime.now(timezone.utc).isoformat(),
+            'source': 'Reddit',
+            'topic/subreddit': str(post.subreddit),
+            'title': post.title,
+            'content': post.selftext,
+            'category': '',
+            'language': detect_language(post.title + ' ' + post.selftext),
+            'publish_time_utc': temp_time.isoformat(),
+            'link': f"https://reddit.com{post.permalink}",
+            'image/video': post.url,
+            'ups': post.ups,
+            'upvote_ratio': post.upvote_ratio,
+            'score': post.score,
+            'location': '',
+            'num_comments': post.num_comments,
+            'author_id': author_id,
+            'author_name': author_name,
+            'author_post_karma': author_post_karma,
+            'author_comment_karma': author_comment_karma
+        }
+        posts.append(post_json)
+    return posts
+
+def collect_comments(reddit, post_id, publish_date, max_comments):
+    time.sleep(SLEEP_TIME_LONG)  
+    submission = reddit.submission(post_id)
+    all_comments_for_post = submission.comments.list()
+
+    comments_data = []
+    for comment in all_comments_for_post[:max_comments]:
         
-        posts_df = pd.DataFrame(posts)
-        posts_df['publish_time_utc'] = pd.to_datetime(posts_df['publish_time_utc'])
-        posts_df['publish_date_utc'] = posts_df['publish_time_utc'].dt.date
-
-        posts_df.to_csv('temp_posts.csv', index=False)
-
-        all_comments = pd.DataFrame()
-        id_list = list(posts_df['post_id'])
-        date_list = list(posts_df['publish_date_utc'])
-
-
-        for i, post_id in tqdm(enumerate(id_list), total=len(id_list), desc="Collecting comments"):
-            time.sleep(SLEEP_TIME_LONG)  
-            temp_date = date_list[i]  
-            submission = reddit.submission(post_id)
-            all_comments_for_post = submission.comments.list()
+        time.sleep(SLEEP_TIME_SHORT)
+        author = comment.author
+        author_name = author.name if author else "[deleted]"
+        author_id = getattr(author, 'id', None) if author else None
         
-            comments_data = []
-            for comment in all_comments_for_post[:max_comments]:
-                
-                time.sleep(SLEEP_TIME_SHORT)
-                author = comment.author
-                author_name = author.name if author else "[deleted]"
-                author_id = getattr(author, 'id', None) if author else None
-                
-                try:
-                    author_post_karma = comment.author.link_karma if comment.author else None
-                except:
-                    author_post_karma = None
-                try:
-                    author_comment_karma = comment.author.comment_karma if comment.author else None
-                except:
-                    author_comment_karma = None
-
-                if author_name and not author_post_karma:
-                    try:
-                        author_post_karma = reddit.redditor(author_name).link_karma
-                        author_comment_karma = reddit.redditor(author_name).comment_karma
-                    except:
-                        pass
-
-                comment_body = comment.body
-                media_links = []
-                if "http" in comment_body:
-                    media_links = re.findall(r'(https?://[^\s]+)', comment_body)
-
-                comments_data.append({
-                    "post_id": post_id,
-                    "comment_id": comment.id,
-                    "extract_time": datetime.now(timezone.utc).isoformat(),
-                    "comment_body": comment_body,
-                    "category": "",
-                    "language": detect_language(comment_body),
-                    "comment_created_utc": datetime.fromtimestamp(comment.created_utc).isoformat(),
-                    "comment_permalink": f"https://reddit.com{comment.permalink}",
-                    "media_links": media_links,
-                    "comment_ups": comment.ups,
-                    "comment_score": comment.score,
-                    "location": "",
-                    "commenter_name": author_name,
-                    "commenter_id": author_id,
-                    "commenter_post_karma": author_post_karma,
-                    "commenter_comment_karma": author_comment_karma,    
-                    "comment_parent_id": comment.parent_id,
-                    "publish_date_utc": temp_date
-                })
-            
-            df_comments = pd.DataFrame(comments_data)
-            all_comments = pd.concat([all_comments, df_comments], ignore_index=True)
-            all_comments.to_csv('temp_comments.csv', index=False)
+        try:
+            author_post_karma = comment.author.link_karma if comment.author else None
+        except:
+            author_post_karma = None
+        try:
+            author_comment_karma = comment.author.comment_karma if comment.author else None
+        except:
+            author_comment_karma = None
+
+        if author_name and not author_post_karma:
+            try:
+                author_post_karma = reddit.redditor(author_name).link_karma
+                author_comment_karma = reddit.redditor(author_name).comment_karma
+            except:
+                pass
+
+        comment_body = comment.body
+        media_links = []
+        if "http" in comment_body:
+            media_links = re.findall(r'(https?://[^\s]+)', comment_body)
+
+        comments_data.append({
+            "post_id": post_id,
+            "comment_id": comment.id,
+            "extract_time": datetime.now(timezone.utc).isoformat(),
+            "comment_body": comment_body,
+            "category": "",
+            "language": detect_language(comment_body),
+            "comment_created_utc": datetime.fromtimestamp(comment.created_utc).isoformat(),
+            "comment_permalink": f"https://reddit.com{comment.permalink}",
+            "media_links": media_links,
+            "comment_ups": comment.ups,
+            "comment_score": comment.score,
+            "location": "",
+            "commenter_name": author_name,
+            "commenter_id": author_id,
+            "commenter_post_karma": author_post_karma,
+            "commenter_comment_karma": author_comment_karma,    
+            "comment_parent_id": comment.parent_id,
+            "publish_date_utc": publish_date
+        })
+    return comments_data
+
+def get_reddit_data(subreddit_list, max_posts, max_comments, reddit, restart=False):
+    # Subreddits and then posts are queued in QUEUE_PATH with their scraped
+    # rows as results, so an interrupted run continues where it stopped.
+    subreddit_queue = WorkQueue(QUEUE_PATH, name='subreddits')
+    comment_queue = WorkQueue(QUEUE_PATH, name='comments')
+    if restart or (subreddit_queue.is_finished() and comment_queue.is_finished()):
+        subreddit_queue.clear()
+        comment_queue.clear()
+
+    subreddit_queue.enqueue((item, None) for item in subreddit_list)
+    if subreddit_queue.counts()['done']:
+        print(f"Resuming interrupted scrape from {QUEUE_PATH}")
+    remaining = subreddit_queue.counts()['pending']
+    with tqdm(total=remaining, desc=f"Collecting posts from Subreddits List, {max_posts} posts / subreddits") as bar:
+        def handle_subreddit(item):
+            posts = collect_posts(reddit, item.key, max_posts)
+            bar.update(1)
+            return posts
+        subreddit_queue.process(handle_subreddit)
+
+    posts = [post for _, subreddit_posts in subreddit_queue.results() for post in subreddit_posts]
+    if not posts:
+        return "No posts collected"
+    posts_df = pd.DataFrame(posts)
+    posts_df['publish_time_utc'] = pd.to_datetime(posts_df['publish_time_utc'])
+    posts_df['publish_date_utc'] = posts_df['publish_time_utc'].dt.date
+
+    comment_queue.enqueue(zip(posts_df['post_id'], posts_df['publish_date_utc'].astype(str)))
+    remaining = comment_queue.counts()['pending']
+    with tqdm(total=remaining, desc="Collecting comments") as bar:
+        def handle_post(item):
+            comments = collect_comments(reddit, item.key, item.payload, max_comments)
+            bar.update(1)
+            return comments
+        comment_queue.process(handle_post)
+
+    if not (subreddit_queue.is_finished() and comment_queue.is_finished()):
+        return "Other workers are still scraping; the last one saves the files"
+    all_comments = pd.DataFrame(
+        [comment for _, post_comments in comment_queue.results() for comment in post_comments]
+    )
         
     # Move file saving logic outside the if/else block
     extract_date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
@@ -269,23 +209,23 @@ def get_reddit_data(subreddit_list, max_posts, max_comments, reddit, resume_mode
             posts_path = os.path.join(posts_dir, f'{timestamp}.csv')
             group.to_csv(posts_path, index=False)
 
-        for date, group in all_comments.groupby('publish_date_utc'):
-            timestamp = pd.to_datetime(date).strftime('%Y-%m-%d-%H%M')
-            comments_path = os.path.join(comments_dir, f'{timestamp}.csv')
-            group.to_csv(comments_path, index=False)
-        
-        os.remove('temp_posts.csv')
-        os.remove('temp_comments.csv')
+        if not all_comments.empty:
+            for date, group in all_comments.groupby('publish_date_utc'):
+                timestamp = pd.to_datetime(date).strftime('%Y-%m-%d-%H%M')
+                comments_path = os.path.join(comments_dir, f'{timestamp}.csv')
+                group.to_csv(comments_path, index=False)
         
         return f'Files saved to {posts_dir} and {comments_dir}'
     except Exception as e:
         return f"Error saving files: {str(e)}"
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Reddit Data Scraper')
     parser.add_argument('--mode', type=int, default=0, choices=[0, 1],
-                      help='Mode: 0 for new scraping, 1 for resume scraping')
-    args = parser.parse_args()
+                      help='Kept for compatibility: an interrupted run is always resumed')
+    parser.add_argument('--restart', action='store_true',
+                      help='Discard an interrupted run and start a new one')
+    args = parser.parse_args(argv)
 
     sys.path.append('../..')
     load_dotenv()
@@ -303,7 +243,7 @@ def main():
         max_posts=REDDIT_MAX_POST,
         max_comments=REDDIT_MAX_COMMENT,
         reddit=reddit,
-        resume_mode=args.mode == 1
+        restart=args.restart
     )
     
     print(message)
@@ -1,5 +1,8 @@
 import requests
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 def main():
     url = 'https://rsf.org/sites/default/files/import_classement/2025.csv'
@@ -9,5 +12,8 @@ def main():
     with open(output_path, 'wb') as f:
         f.write(response.content)
 
+    from scrapers.trust_score.publishers_bias_scraper import refresh_trust_scores
+    refresh_trust_scores()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,10 +3,12 @@ Usage: python  scrapers/trust_score/publishers_bias_scraper.py
 
 Input: None
 
-Output: data/raw/trust_score/publishers_bias.csv
+Output: data/raw/trust_score/publishers_bias.csv (and a rebuilt data/pipeline/trust_scores.pkl)
 """
 import sys
+import os
 sys.path.append('../..')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 import pandas as pd
 import requests
@@ -53,6 +55,14 @@ def save_data(df, filename='data/raw/trust_score/publishers_bias.csv'):
     df.to_csv(filename, index=False)
     print(f"Data saved to {filename}")
 
+def refresh_trust_scores():
+    """Recompile the trust score table card/event/process.py loads"""
+    from card.event.trust_scores import build_trust_scores
+    try:
+        build_trust_scores()
+    except FileNotFoundError as e:
+        print(f"Trust score table not rebuilt, missing source data: {e}")
+
 def test_news_url(url: str, df='data/raw/trust_score/publishers_bias.csv'):
     df = ''
     matches = df[df['Source URL'] == url]
@@ -75,6 +85,7 @@ def main():
     raw_data = fetch_bias_data(api_key)   
     df = process_bias_data(raw_data)
     save_data(df)
+    refresh_trust_scores()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from card.statement.geocode import GeocodeError, Geocoder
+
+
+class FlakyBackend:
+    """Fails for every place until `up` is set"""
+    name = 'flaky'
+
+    def __init__(self):
+        self.up = False
+        self.calls = 0
+
+    def geocode(self, place):
+        self.calls += 1
+        if not self.up:
+            raise GeocodeError('timeout')
+        return {'address': place, 'latitude': 1.0, 'longitude': 2.0}
+
+
+def test_failed_lookup_is_not_repeated_within_a_run():
+    backend = FlakyBackend()
+    geocoder = Geocoder(backend)
+    assert geocoder.resolve(['Berlin']) == {}
+    assert geocoder.resolve(['Berlin']) == {}
+    assert backend.calls == 1
+
+
+def test_failed_lookup_is_retried_in_the_next_run():
+    backend = FlakyBackend()
+    geocoder = Geocoder(backend)
+    geocoder.resolve(['Berlin'])
+    backend.up = True
+    geocoder.start_run()
+    assert geocoder.resolve(['Berlin'])['Berlin']['latitude'] == 1.0
+    assert backend.calls == 2
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client
+from llm_client import SharedRateLimiter
+
+
+class FakeClock:
+    """time.time / time.sleep stand-ins; sleeping advances the clock instead of waiting."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make_limiter(tmp_path, monkeypatch, limits=None):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_client.time, 'time', clock.time)
+    monkeypatch.setattr(llm_client.time, 'sleep', clock.sleep)
+    return SharedRateLimiter(str(tmp_path / 'rate_limit.sqlite'), limits or {}), clock
+
+
+def test_unlimited_provider_does_not_wait(tmp_path, monkeypatch):
+    limiter, clock = make_limiter(tmp_path, monkeypatch)
+    limiter.acquire('OPENAI', 'gpt-4o-mini', 1000)
+    assert clock.slept == []
+
+
+def test_back_off_applies_to_unlimited_provider(tmp_path, monkeypatch):
+    limiter, clock = make_limiter(tmp_path, monkeypatch)
+    limiter.back_off('OPENAI', 'gpt-4o-mini', 30)
+    limiter.acquire('OPENAI', 'gpt-4o-mini', 1000)
+    assert sum(clock.slept) >= 30
+    # Once the back-off has passed requests go straight through again
+    clock.slept.clear()
+    limiter.acquire('OPENAI', 'gpt-4o-mini', 1000)
+    assert clock.slept == []
+
+
+def test_back_off_applies_to_limited_provider(tmp_path, monkeypatch):
+    limiter, clock = make_limiter(tmp_path, monkeypatch, {'ALIBABA': (60, None)})
+    limiter.back_off('ALIBABA', 'qwen-plus', 10)
+    limiter.acquire('ALIBABA', 'qwen-plus', 10)
+    assert sum(clock.slept) >= 10
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.work_queue import WorkQueue
+
+
+def drain(queue):
+    handled = []
+    queue.process(lambda item: handled.append(item.key) or item.key)
+    return handled
+
+
+def test_rerun_keeps_done_items_and_only_sends_new_keys(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite')
+    queue.start([('a', None), ('b', None)])
+    assert drain(queue) == ['a', 'b']
+
+    queue.start([('a', None), ('b', None), ('c', None)])
+    assert drain(queue) == ['c']
+    assert [key for key, _ in queue.results()] == ['a', 'b', 'c']
+
+
+def test_rerun_of_finished_queue_sends_nothing(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite')
+    queue.start([('a', None)])
+    drain(queue)
+    queue.start([('a', None)], retry_failed=True)
+    assert drain(queue) == []
+
+
+def test_retry_failed_and_restart(tmp_path):
+    queue = WorkQueue(tmp_path / 'queue.sqlite')
+    queue.start([('a', None), ('b', None)])
+
+    def handler(item):
+        if item.key == 'b':
+            raise RuntimeError('boom')
+        return item.key
+
+    queue.process(handler)
+    queue.start([('a', None), ('b', None)], retry_failed=True)
+    assert drain(queue) == ['b']
+
+    queue.start([('a', None), ('b', None)], restart=True)
+    assert drain(queue) == ['a', 'b']